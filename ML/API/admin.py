@@ -0,0 +1,42 @@
+from fastapi import APIRouter, Depends, Header, HTTPException
+from fastapi.responses import PlainTextResponse
+from typing import Optional
+
+from ML import profiling
+
+router = APIRouter(prefix="/admin/profile", tags=["admin"])
+
+
+def require_token(x_profile_token: Optional[str] = Header(None)):
+    """Every profiling route needs the same token as the per-request trigger."""
+    if not profiling.check_token(x_profile_token):
+        raise HTTPException(403, "Profiling token missing or invalid")
+
+
+@router.post("/start", dependencies=[Depends(require_token)])
+def start_profile(seconds: float = 10):
+    profile_id = profiling.start_window(seconds)
+    if profile_id is None:
+        raise HTTPException(409, "A profile capture is already running")
+    return {
+        "profile_id": profile_id,
+        "seconds": min(seconds, profiling.MAX_WINDOW_SECONDS),
+        "result": f"/admin/profile/{profile_id}",
+    }
+
+
+@router.get("/", dependencies=[Depends(require_token)])
+def list_profiles():
+    return profiling.list_profiles()
+
+
+@router.get("/{profile_id}", dependencies=[Depends(require_token)])
+def get_profile(profile_id: str):
+    """Collapsed stacks ("a;b;c count" per line), ready for flamegraph.pl or speedscope."""
+    profile = profiling.get_profile(profile_id)
+    if profile is None:
+        raise HTTPException(404, f"Profile '{profile_id}' not found (still running or expired)")
+    return PlainTextResponse(profile["collapsed"], headers={
+        "X-Profile-Samples": str(profile["samples"]),
+        "X-Profile-Duration": str(profile["duration_s"]),
+    })
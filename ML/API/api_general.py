@@ -1,34 +1,14 @@
-from fastapi import FastAPI, HTTPException
+from fastapi import APIRouter, HTTPException
 from pydantic import BaseModel
 import os
-import pandas as pd
+import threading
 import traceback
-from fastapi.middleware.cors import CORSMiddleware
-
-# ---- Import your recommender ----
-# This assumes your repo structure is:
-#   API/api_general.py
-#   ML/Model/general_recommendation.py  (class: ContentBasedRecommender)
-import sys
-sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "../ML")))
-from ML.Model.general_recommendation import ContentBasedRecommender  # noqa: E402
-
-app = FastAPI(title="Canteen General Recommendation API")
-
-
-app.add_middleware(
-    CORSMiddleware,
-    allow_origins=[
-        "http://localhost:5173",
-        "http://localhost:3000",
-        "https://canteenoweb.vercel.app/"
-    ],
-    allow_credentials=True,
-    allow_methods=["*"],
-    allow_headers=["*"],
-)
 
+from ML.Data import columnar_cache
+from ML.Model.general_recommendation import ContentBasedRecommender
+from ML.singleflight import SingleFlight
 
+router = APIRouter(tags=["general"])
 
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 
@@ -36,30 +16,38 @@ BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 DATA_PATH = os.path.join(BASE_DIR, "Data", "raw", "canteen_recommendation_dataset.csv")
 
 
-MODEL_PATH = os.path.abspath(os.path.join(BASE_DIR, "ML", "Model", "item_similarity.pkl"))
+MODEL_PATH = os.path.join(BASE_DIR, "Model", "item_similarity.npy")
+
+# matrix | exact | lsh | auto: how /recommend/similar finds neighbours. "auto"
+# keeps the precomputed matrix for small menus and switches to an index
+# (persisted next to MODEL_PATH) as the catalogue grows.
+NEIGHBOR_BACKEND = os.getenv("CANTEEN_NEIGHBOR_BACKEND", "auto")
 
 
-if not os.path.exists(DATA_PATH):
-    raise FileNotFoundError(f"Dataset not found at {DATA_PATH}")
+_recommender = None
+_recommender_lock = threading.Lock()
 
+# Identical concurrent /recommend/similar lookups share one computation.
+_similar_flight = SingleFlight("similar")
 
-recommender = ContentBasedRecommender(DATA_PATH)
 
-try:
-    if os.path.exists(MODEL_PATH):
-        recommender.load_model(MODEL_PATH)
-        print("✅ Loaded existing similarity model.")
-    else:
-        print("⚠️ No pre-trained model found. Building new one...")
-        recommender.build_similarity_matrix()
-        
-        os.makedirs(os.path.dirname(MODEL_PATH), exist_ok=True)
-        recommender.save_model(MODEL_PATH)
-except Exception:
-    print("\n\n ERROR while preparing model ")
-    traceback.print_exc()
-    print("END \n\n")
-    
+def get_recommender():
+    """Build (or load) the content-based model on first use instead of at import."""
+    global _recommender
+    if _recommender is None:
+        with _recommender_lock:
+            if _recommender is None:
+                recommender = ContentBasedRecommender(DATA_PATH, neighbor_backend=NEIGHBOR_BACKEND)
+                try:
+                    # Only one worker builds; the rest wait on the lock and mmap the result.
+                    recommender.load_or_build(MODEL_PATH)
+                    print("✅ Loaded similarity model.")
+                except Exception:
+                    print("\n\n ERROR while preparing model ")
+                    traceback.print_exc()
+                    print("END \n\n")
+                _recommender = recommender
+    return _recommender
 
 
 class ItemRequest(BaseModel):
@@ -67,46 +55,33 @@ class ItemRequest(BaseModel):
     n: int = 5
 
 
-@app.get("/")
-def root():
-    return {"message": "Canteen General Recommendation API is running!"}
-
-@app.get("/healthz")
+@router.get("/healthz")
 def health():
     return {"status": "ok"}
 
 
-@app.get("/menu")
+@router.get("/menu")
 def get_menu():
-    
-    try:
-        menu_path = os.path.join(BASE_DIR, "Data", "raw", "menu.csv")
-        if not os.path.exists(menu_path):
-            raise FileNotFoundError(f"menu.csv not found at {menu_path}")
 
-        df = pd.read_csv(menu_path)
-        return df.to_dict(orient="records")
+    try:
+        return columnar_cache.load_menu().to_dict(orient="records")
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"/menu error: {e}")
 
 # ---------- Recommendation endpoints ----------
-@app.get("/recommend/popular")
-def get_popular_items(limit: int = 10):
-    try:
-        popular_items = recommender.get_popular_items(n=limit)
-        return popular_items.to_dict(orient="records")
-    except Exception as e:
-        print("\n\nERROR TRACEBACK")
-        traceback.print_exc()
-        print(" END TRACEBACK \n\n")
-        raise HTTPException(status_code=500, detail=str(e))
+# /recommend/popular is served by ML.API.recommend_api.
 
-@app.get("/recommend/similar")
+@router.get("/recommend/similar")
 def get_similar_items(item_name: str, limit: int = 5):
     try:
         normalized_name = item_name.strip().lower()
-        similar_items = recommender.recommend_items(item_name=normalized_name, n=limit)
-        return similar_items.to_dict(orient="records")
+        return _similar_flight.do(
+            (normalized_name, limit),
+            lambda: get_recommender().recommend_items(
+                item_name=normalized_name, n=limit).to_dict(orient="records"),
+            metric_key="/recommend/similar")
+    except ValueError as e:
+        raise HTTPException(status_code=404, detail=str(e))
     except Exception as e:
         print(f"❌ Error in similar items: {e}")
         raise HTTPException(status_code=500, detail=str(e))
@@ -0,0 +1,148 @@
+import asyncio
+import os
+import time
+import traceback
+from contextlib import asynccontextmanager
+
+from fastapi import FastAPI, Request
+from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import Response
+
+from ML import admission, metrics, profiling
+from ML.API import admin, api_general, personal, recommend_api
+from ML.Data import mongo_store
+from ML.chat_api_service import router as chat_router
+
+# Set CANTEEN_LAZY_STARTUP=1 to skip warm-up and build everything on first use
+# (fast reloads in development); by default the lifespan warms the caches so
+# the first request does not pay for them.
+LAZY_STARTUP = os.getenv("CANTEEN_LAZY_STARTUP", "0") == "1"
+
+
+def prepare_artifacts():
+    """
+    Build the on-disk caches (Feather tables, popularity .npz, similarity .npy) once.
+
+    Run in the gunicorn master (see gunicorn.conf.py) or at image build time so
+    workers only memory-map finished files and never race to write them.
+    """
+    t0 = time.perf_counter()
+    recommend_api.load_dataset()
+    recommend_api.load_menu()
+    recommend_api.load_popularity()
+    api_general.get_recommender()
+    print(f"✅ Artifacts ready in {time.perf_counter() - t0:.2f}s")
+
+
+def _warm(timings, name, fn):
+    t0 = time.perf_counter()
+    try:
+        fn()
+        timings[name] = round(time.perf_counter() - t0, 4)
+    except Exception as e:
+        timings[name] = f"failed: {e}"
+        traceback.print_exc()
+
+
+async def _ping_mongo(timings):
+    t0 = time.perf_counter()
+    await personal.ping_mongo()
+    timings["mongo_ping"] = round(time.perf_counter() - t0, 4)
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    timings = app.state.startup_timings
+    if not LAZY_STARTUP:
+        t0 = time.perf_counter()
+        # Order matters: later components reuse the dataset loaded first.
+        _warm(timings, "dataset", recommend_api.load_dataset)
+        _warm(timings, "menu", recommend_api.load_menu)
+        _warm(timings, "popularity", recommend_api.load_popularity)
+        _warm(timings, "live_counters", recommend_api.get_live_counters)
+        _warm(timings, "contextual_model", recommend_api.get_contextual_model)
+        _warm(timings, "content_model", api_general.get_recommender)
+        _warm(timings, "hybrid_model", personal.get_hybrid)
+        timings["total"] = round(time.perf_counter() - t0, 4)
+        print(f"✅ Startup warm-up done: {timings}")
+    # The Mongo round-trip must not hold up startup when the database is down.
+    ping = asyncio.create_task(_ping_mongo(timings))
+    yield
+    ping.cancel()
+    recommend_api.snapshot_live_counters()
+    mongo_store.close_client()
+
+
+def create_app():
+    app = FastAPI(
+        title="Canteen Management System API",
+        description="AI-powered chatbot and recommendation system for college canteen",
+        version="1.0.0",
+        lifespan=lifespan,
+    )
+    app.state.startup_timings = {}
+
+    # Inside the metrics middleware, so shed requests still show up as 503s.
+    if admission.ENABLED:
+        app.add_middleware(admission.AdmissionMiddleware)
+    if metrics.ENABLED:
+        app.add_middleware(metrics.MetricsMiddleware)
+    # Profiling only exists when CANTEEN_PROFILING_TOKEN is set.
+    if profiling.ENABLED:
+        app.add_middleware(profiling.ProfilingMiddleware)
+        app.include_router(admin.router)
+    # Added last, so outermost: 503s from admission control carry CORS headers
+    # too and browsers can read them.
+    app.add_middleware(
+        CORSMiddleware,
+        allow_origins=["*"],
+        allow_credentials=True,
+        allow_methods=["*"],
+        allow_headers=["*"],
+    )
+
+    app.include_router(recommend_api.router)
+    app.include_router(api_general.router)
+    app.include_router(chat_router)
+    app.include_router(personal.router)
+
+    @app.get("/")
+    def home():
+        return {
+            "status": "running",
+            "message": "Canteen Management System API",
+            "endpoints": {
+                "chat": "/chat/chat",
+                "menu": "/recommend/menu",
+                "popular": "/recommend/popular",
+                "now": "/recommend/now",
+                "orders": "/recommend/orders",
+                "highest_rated": "/recommend/highest-rated",
+                "spicy": "/recommend/spicy",
+                "category": "/recommend/category/{category}",
+                "search": "/recommend/search/{query}",
+                "item": "/recommend/item/{item_name}",
+                "similar": "/recommend/similar?item_name=",
+                "personal": "/personal/recommend",
+                "hybrid": "/personal/hybrid",
+                "metrics": "/metrics",
+            }
+        }
+
+    @app.get("/health")
+    def health_check(request: Request):
+        return {
+            "status": "healthy",
+            "service": "canteen-api",
+            "startup_seconds": request.app.state.startup_timings,
+        }
+
+    @app.get("/metrics", include_in_schema=False)
+    def prometheus_metrics():
+        return Response(metrics.render(), media_type=metrics.CONTENT_TYPE)
+
+    return app
+
+
+if __name__ == "__main__":
+    prepare_artifacts()
@@ -0,0 +1,100 @@
+"""
+Offset pagination and field projection shared by the list routes.
+
+Routes keep returning a plain JSON list; paging metadata travels in headers
+(`X-Total-Count` when known, and an RFC 8288 `Link` with relative rel="next"
+and rel="prev" URLs), so existing clients that ignore them see no change. Routes that used to return
+everything (menu, search) still do when no `limit` is given.
+"""
+
+from fastapi import HTTPException, Request
+
+MAX_PAGE_SIZE = 500
+
+_LEN = object()
+
+
+def _link(request, **params):
+    """
+    Path and query of the request URL with `params` replaced. Relative, so a
+    cached page (and its ETag) is the same whichever Host it was fetched by.
+    """
+    url = request.url.include_query_params(**params)
+    return f"{url.path}?{url.query}"
+
+
+class Page:
+    """
+    One slice of a result list plus what is needed to link its neighbours.
+    `limit=None` means the rest of the list from `offset`.
+    """
+
+    def __init__(self, items, offset, limit, total=None):
+        self.items = items
+        self.offset = offset
+        self.limit = limit
+        self.total = total
+
+    @property
+    def has_next(self):
+        if self.limit is None:
+            return False
+        if self.total is not None:
+            return self.offset + len(self.items) < self.total
+        return len(self.items) == self.limit
+
+    def headers(self, request: Request):
+        headers = {}
+        if self.total is not None:
+            headers["X-Total-Count"] = str(self.total)
+
+        links = []
+        if self.has_next:
+            url = _link(request, offset=self.offset + self.limit, limit=self.limit)
+            links.append(f'<{url}>; rel="next"')
+        if self.offset > 0 and self.limit is None:
+            url = _link(request, offset=0)
+            links.append(f'<{url}>; rel="prev"')
+        elif self.offset > 0:
+            url = _link(request, offset=max(self.offset - self.limit, 0), limit=self.limit)
+            links.append(f'<{url}>; rel="prev"')
+        if links:
+            headers["Link"] = ", ".join(links)
+        return headers
+
+
+def resolve_limit(limit, top_n, default):
+    """`limit` is the canonical name; `top_n` is still accepted on ranking routes."""
+    if limit is not None:
+        return limit
+    if top_n is not None:
+        return top_n
+    return default
+
+
+def parse_fields(fields, allowed):
+    """Turn `fields=a,b` into a tuple of column names, rejecting unknown ones."""
+    if not fields:
+        return None
+    wanted = tuple(dict.fromkeys(f.strip() for f in fields.split(",") if f.strip()))
+    unknown = [f for f in wanted if f not in allowed]
+    if unknown:
+        raise HTTPException(400, f"Unknown field(s) {unknown}; available: {list(allowed)}")
+    return wanted or None
+
+
+def paginate(records, offset, limit, fields=None, total=_LEN):
+    """
+    Slice `records` (any sequence of dicts) and project the page onto `fields`.
+    With `limit=None` the page runs to the end of `records`.
+
+    Only the page itself is copied, so callers can pass a shared, precomputed
+    list or index. `total` defaults to `len(records)`; pass None when records
+    is itself a truncated ranking and the full size is unknown.
+    """
+    if total is _LEN:
+        total = len(records)
+    items = records[offset:] if limit is None else records[offset:offset + limit]
+    if fields:
+        items = [{f: item[f] for f in fields} for item in items]
+    return Page(list(items), offset, limit, total)
@@ -1,60 +1,206 @@
-from fastapi import FastAPI, HTTPException
-from pydantic import BaseModel
-from typing import List
-import motor.motor_asyncio
+from fastapi import APIRouter, HTTPException
+from pydantic import BaseModel, Field
+from typing import Dict, List, Optional
+import asyncio
 import os
-import sys
-from dotenv import load_dotenv
-from ML.Model.personalized_recommendation import PersonalizedRecommender
+import threading
+from ML.API.pagination import MAX_PAGE_SIZE
+from ML.Data import columnar_cache, mongo_store
+from ML.Model import hybrid_recommendation
+from ML.Model.general_recommendation import DATA_PATH
+from ML.Model.personalized_recommendation import MODEL_PATH, PersonalizedRecommender
+from ML.Model.training_jobs import TrainingJobRunner
 
-ROOT_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), "../.."))
-if ROOT_DIR not in sys.path:
-    sys.path.insert(0, ROOT_DIR)
-print("✅ Added to sys.path:", ROOT_DIR)
+router = APIRouter(prefix="/personal", tags=["personal"])
 
-load_dotenv()
+# Longest a request waits for purchase history before ranking without it. The
+# fetch runs as its own task in the history's single-flight, so it keeps
+# running after the timeout and fills the cache for the next request.
+HISTORY_TIMEOUT = float(os.getenv("CANTEEN_HISTORY_TIMEOUT", "0.5"))
 
-app = FastAPI(title="Personalized Recommendation API")
+_recommender = None
+_recommender_version = None
+_recommender_lock = threading.Lock()
+_training_jobs = TrainingJobRunner()
+_hybrid = None
+_hybrid_lock = threading.Lock()
 
-# MongoDB Setup
-MONGO_URI = os.getenv("MONGO_URI", "mongodb://localhost:27017")
-mongo_client = motor.motor_asyncio.AsyncIOMotorClient(MONGO_URI)
 
-recommender = PersonalizedRecommender(mongo_client)
+def _model_version():
+    """(inode, mtime) of MODEL_PATH; training replaces the file, changing both."""
+    try:
+        st = os.stat(MODEL_PATH)
+    except FileNotFoundError:
+        return None
+    return st.st_ino, st.st_mtime_ns
+
+
+def model_changed():
+    return _recommender is None or _model_version() != _recommender_version
+
+
+def get_recommender():
+    """
+    Serving model, loaded from disk and replaced whole whenever MODEL_PATH
+    changes, including when another worker trained it.
+    """
+    global _recommender, _recommender_version
+    if model_changed():
+        with _recommender_lock:
+            version = _model_version()
+            if _recommender is None or version != _recommender_version:
+                recommender = PersonalizedRecommender()
+                if version is not None:
+                    recommender.load_model(MODEL_PATH)
+                _recommender, _recommender_version = recommender, version
+    return _recommender
+
+
+async def swap_model(path):
+    """Load the freshly trained model off the loop, then swap it in atomically."""
+    await asyncio.to_thread(get_recommender)
+
+
+def get_hybrid():
+    """
+    Hybrid ranker from ML/Model/hybrid_model.npz (written by
+    train_personalized.py), or fitted on the canteen dataset if there is none.
+    Warmed at startup; async routes call it through a thread until then.
+    """
+    global _hybrid
+    if _hybrid is None:
+        with _hybrid_lock:
+            if _hybrid is None:
+                model = hybrid_recommendation.PersonalizedHybridRecommender()
+                if os.path.exists(model.model_path):
+                    model.load()
+                else:
+                    model = hybrid_recommendation.PersonalizedHybridRecommender.from_dataset(
+                        columnar_cache.load_csv(DATA_PATH))
+                _hybrid = model
+    return _hybrid
 
-@app.on_event("startup")
-async def startup_event():
+
+async def recent_items(user_ids):
+    """
+    {user_id: recently ordered item ids} from the cached purchase history, or
+    {} if Mongo does not answer within HISTORY_TIMEOUT.
+    """
+    history = mongo_store.get_purchase_history()
+    try:
+        return await asyncio.wait_for(history.recent_items_many(user_ids), HISTORY_TIMEOUT)
+    except Exception as e:
+        print(f"⚠️ Purchase history unavailable ({type(e).__name__}: {e}); ranking without it")
+        return {}
+
+
+async def ping_mongo():
     try:
-        await mongo_client.admin.command('ping')
+        await mongo_store.ping()
         print("✅ MongoDB connected successfully!")
     except Exception as e:
         print("❌ MongoDB connection failed:", e)
 
+
 class UserRequest(BaseModel):
     user_id: str
     top_n: int = 5
 
-@app.post("/train")
+
+class HybridRequest(BaseModel):
+    user_id: Optional[str] = None
+    top_n: int = Field(5, ge=1, le=MAX_PAGE_SIZE)
+    # Per-request override of content/collaborative/popularity weights.
+    weights: Optional[Dict[str, float]] = None
+    # Item ids that steer the content score (e.g. what is in the cart).
+    seed_items: List[str] = []
+    # Also seed with the user's recent orders from Mongo (cached).
+    use_history: bool = False
+
+
+class HybridBatchRequest(BaseModel):
+    user_ids: List[str]
+    top_n: int = Field(5, ge=1, le=MAX_PAGE_SIZE)
+    weights: Optional[Dict[str, float]] = None
+    use_history: bool = False
+
+@router.post("/train", status_code=202)
 async def train_model():
-    """Train and save the personalized model."""
-    try:
-        await recommender.train_model()   # ✅ await here
-        recommender.save_model()
-        return {"message": "✅ Personalized model trained and saved successfully."}
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+    """Start training in the background; poll /personal/train/{job_id} for progress."""
+    fetcher = PersonalizedRecommender()
+    job = _training_jobs.submit(fetcher.fetch_data, MODEL_PATH, swap_model)
+    if job is None:
+        active = _training_jobs.active_job()
+        raise HTTPException(409, f"Training job {active.id} is already running")
+    return {**job.to_dict(), "status_url": f"/personal/train/{job.id}"}
+
+
+@router.get("/train")
+def list_training_jobs():
+    return [job.to_dict() for job in _training_jobs.all_jobs()]
+
+
+@router.get("/train/{job_id}")
+def training_status(job_id: str):
+    job = _training_jobs.get(job_id)
+    if job is None:
+        raise HTTPException(404, f"Training job '{job_id}' not found")
+    return job.to_dict()
+
 
+@router.delete("/train/{job_id}")
+def cancel_training(job_id: str):
+    job = _training_jobs.cancel(job_id)
+    if job is None:
+        raise HTTPException(404, f"Training job '{job_id}' not found")
+    return job.to_dict()
 
-@app.post("/recommend")
+
+@router.post("/recommend")
 async def recommend_items(request: UserRequest):
     """Fetch personalized recommendations for a user."""
     try:
-        recommender.load_model()
+        recommender = await asyncio.to_thread(get_recommender) if model_changed() else _recommender
         rec_items = recommender.recommend_for_user(request.user_id, n=request.top_n)
         return {"user_id": request.user_id, "recommended_items": rec_items}
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
-@app.get("/")
+@router.post("/hybrid")
+async def recommend_hybrid(request: HybridRequest):
+    """Blended content + collaborative + popularity ranking; works for unknown users too."""
+    seed_items = list(request.seed_items)
+    if request.use_history and request.user_id:
+        seed_items += (await recent_items([request.user_id])).get(request.user_id, [])
+    # Loading (or fitting) the model blocks, so it must not happen on the loop.
+    model = _hybrid if _hybrid is not None else await asyncio.to_thread(get_hybrid)
+    try:
+        items = model.recommend(request.user_id, n=request.top_n,
+                                weights=request.weights, seed_items=seed_items)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return {"user_id": request.user_id, "recommended_items": items}
+
+
+@router.post("/hybrid/batch")
+async def recommend_hybrid_batch(request: HybridBatchRequest):
+    """/personal/hybrid for many users; their histories come from one Mongo query."""
+    history = await recent_items(request.user_ids) if request.use_history else {}
+
+    def rank_all():
+        model = get_hybrid()
+        return [
+            {"user_id": user_id,
+             "recommended_items": model.recommend(user_id, n=request.top_n, weights=request.weights,
+                                                  seed_items=history.get(user_id, ()))}
+            for user_id in request.user_ids
+        ]
+
+    try:
+        return await asyncio.to_thread(rank_all)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+@router.get("/")
 def root():
     return {"message": "Personalized Recommendation API is running 🚀"}
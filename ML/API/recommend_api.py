@@ -1,16 +1,62 @@
-import pandas as pd
-from fastapi import APIRouter, HTTPException
+import os
+import threading
+import time
+from datetime import datetime
+from functools import lru_cache
+from typing import Optional
 
-router = APIRouter(prefix="/recommend", tags=["recommend"])
+from fastapi import APIRouter, HTTPException, Query, Request
+from pydantic import BaseModel
+
+from ML import metrics
+from ML.API.pagination import (
+    MAX_PAGE_SIZE,
+    paginate,
+    parse_fields,
+    resolve_limit,
+)
+from ML.API.responses import ORJSONResponse, cached_json
+from ML.Data import columnar_cache
+from ML.Data.menu_index import MenuIndex
+from ML.Model.contextual_recommendation import (
+    DAYS_OF_WEEK,
+    TIMES_OF_DAY,
+    ContextualPopularityRecommender,
+    time_of_day_for,
+)
+from ML.Model import popularity
+from ML.Model.live_popularity import LivePopularityCounters
+from ML.Model.order_log import OrderLog
+
+router = APIRouter(prefix="/recommend", tags=["recommend"],
+                   default_response_class=ORJSONResponse)
 
 DATA_PATH = "ML/Data/raw/canteen_recommendation_dataset.csv"
 MENU_PATH = "ML/Data/raw/menu.csv"
+LIVE_SNAPSHOT_PATH = os.getenv("CANTEEN_LIVE_SNAPSHOT", "ML/Model/live_popularity.npz")
+
+# Decayed popularity scores drift with the clock even without new orders, so
+# cached rankings are also keyed on this time bucket.
+POPULARITY_CACHE_SECONDS = 60
+
+# Cache-Control max-age (seconds) handed to clients per data source.
+MENU_MAX_AGE = 30
+DATASET_MAX_AGE = 300
+POPULARITY_MAX_AGE = 10
+
+# Default page size of the ranking routes. Menu and search return every match
+# unless a `limit` is given, as they did before pagination.
+DEFAULT_TOP_N = 10
+
+# Fields each ranking route can project onto.
+LIVE_FIELDS = ("item_name", "popularity_score", "purchase_count", "category", "price")
+RATED_FIELDS = ("item_name", "rating")
+SPICY_FIELDS = ("item_name", "spicy_level")
+CONTEXTUAL_FIELDS = ("item_name", "category", "price", "score")
 
 def load_dataset():
     try:
-        df = pd.read_csv(DATA_PATH)
-        df.columns = df.columns.str.strip()
-        return df
+        return columnar_cache.load_csv(DATA_PATH)
     except FileNotFoundError:
         raise HTTPException(404, "Recommendation dataset file not found")
     except Exception as e:
@@ -18,36 +64,134 @@ def load_dataset():
 
 def load_menu():
     try:
-        df = pd.read_csv(MENU_PATH)
-        df.columns = df.columns.str.strip()
-        return df
+        return columnar_cache.load_csv(MENU_PATH)
     except FileNotFoundError:
         raise HTTPException(404, "Menu file not found")
     except Exception as e:
         raise HTTPException(500, f"Error loading menu: {str(e)}")
 
-@router.get("/menu")
-def get_menu():
-    menu_df = load_menu()
-    return menu_df.to_dict(orient="records")
+# Orders from POST /recommend/orders go through this journal so that every
+# worker (and every restart) applies all of them, not just the ones it received.
+order_log = OrderLog()
+_catch_up_lock = threading.Lock()
 
-@router.get("/popular")
-def get_popular(top_n: int = 10):
-    df = load_dataset()
-    
-    if "popularity_score" not in df.columns:
-        raise HTTPException(400, "Dataset missing popularity_score column")
-    
-    if "item_name" not in df.columns:
-        raise HTTPException(400, "Dataset missing item_name column")
-    
-    popular_df = df.groupby("item_name", as_index=False)["popularity_score"].mean()
-    popular_df = popular_df.sort_values("popularity_score", ascending=False).head(top_n)
-    
-    return popular_df.to_dict(orient="records")
+def _catch_up(model):
+    """Fold the journal lines this worker has not applied yet into `model`."""
+    if order_log.size() != model.log_offset:
+        with _catch_up_lock:
+            if order_log.size() < model.log_offset:
+                model.log_offset = 0    # journal was rotated away
+            latest = datetime.fromisoformat(load_popularity().meta["latest_order"])
+            model.log_offset = order_log.replay(model, model.log_offset, after=latest)
+    return model
 
-@router.get("/highest-rated")
-def get_highest_rated(top_n: int = 10):
+_contextual_model = None
+_contextual_lock = threading.Lock()
+
+def get_contextual_model():
+    global _contextual_model
+    if _contextual_model is None:
+        with _contextual_lock:
+            if _contextual_model is None:
+                _contextual_model = ContextualPopularityRecommender().fit(load_dataset())
+    return _catch_up(_contextual_model)
+
+def load_popularity():
+    """Precomputed popularity rankings (ML.Model.popularity), loaded once."""
+    try:
+        return popularity.get_popularity(DATA_PATH)
+    except FileNotFoundError:
+        raise HTTPException(404, "Recommendation dataset file not found")
+
+_live_counters = None
+_live_lock = threading.Lock()
+
+def get_live_counters():
+    """
+    Live counters restored from LIVE_SNAPSHOT_PATH, or seeded afresh from the
+    popularity artifact when there is no snapshot or the artifact has been
+    rebuilt since the snapshot was seeded. Either way the orders in the
+    journal that the counters have not seen are replayed on top; after a
+    re-seed that is every journalled order newer than the artifact's latest,
+    so only orders the rebuilt artifact already counts are dropped.
+    """
+    global _live_counters
+    if _live_counters is None:
+        with _live_lock:
+            if _live_counters is None:
+                artifact = load_popularity()
+                counters = None
+                if os.path.exists(LIVE_SNAPSHOT_PATH):
+                    counters = LivePopularityCounters.load_snapshot(LIVE_SNAPSHOT_PATH)
+                    if counters.seeded_from != artifact.version:
+                        print(f"⚠️ Live snapshot was seeded from popularity artifact "
+                              f"{counters.seeded_from}, not {artifact.version}; re-seeding "
+                              f"and replaying orders after {artifact.meta['latest_order']}")
+                        counters = None
+                if counters is None:
+                    counters = LivePopularityCounters(snapshot_path=LIVE_SNAPSHOT_PATH)
+                    counters.seed(artifact)
+                _live_counters = counters
+
+    counters = _catch_up(_live_counters)
+    if counters.snapshot_due():
+        snapshot_live_counters()
+    return counters
+
+_menu_index = None
+_menu_index_lock = threading.Lock()
+
+def get_menu_index():
+    """Menu lookup index, rebuilt only when menu.csv changes."""
+    global _menu_index
+    version = columnar_cache.data_version(MENU_PATH)
+    if _menu_index is None or _menu_index[0] != version:
+        with _menu_index_lock:
+            if _menu_index is None or _menu_index[0] != version:
+                _menu_index = (version, MenuIndex(load_menu()))
+    return _menu_index[1]
+
+def snapshot_live_counters():
+    # Under the catch-up lock, so the saved journal offset matches the counts.
+    if _live_counters is not None:
+        with _catch_up_lock:
+            _live_counters.save_snapshot()
+
+def popularity_version():
+    return get_live_counters().version, int(time.time() // POPULARITY_CACHE_SECONDS)
+
+def file_cached_json(request, csv_path, max_age, build):
+    """cached_json keyed on a CSV's mtime, which also serves as Last-Modified."""
+    version = columnar_cache.data_version(csv_path)
+    last_modified = version / 1e9 if version is not None else None
+    return cached_json(request, version, build, last_modified=last_modified, max_age=max_age)
+
+def popularity_cached_json(request, build):
+    return cached_json(request, popularity_version(), build, max_age=POPULARITY_MAX_AGE)
+
+class OrderEvent(BaseModel):
+    item_name: str
+    quantity: int = 1
+    category: Optional[str] = None
+    price: Optional[float] = None
+    timestamp: Optional[datetime] = None
+
+# ---------- Data builders (also used by the chat service) ----------
+# Full rankings are computed once per data version; routes serve slices.
+
+def menu_records():
+    return get_menu_index().records
+
+def popular_records(top_n=10, hour=None):
+    return get_live_counters().top(top_n, hour=hour)
+
+def time_of_day_popular_records(top_n=5):
+    """{time of day: most ordered items then}, from the precomputed artifact."""
+    artifact = load_popularity()
+    return {tod: artifact.top(top_n, time_of_day=tod) for tod in artifact.time_windows()}
+
+@lru_cache(maxsize=2)
+def _highest_rated_ranking(version):
     df = load_dataset()
     
     if "rating" not in df.columns:
@@ -56,33 +200,20 @@ def get_highest_rated(top_n: int = 10):
     if "item_name" not in df.columns:
         raise HTTPException(400, "Dataset missing item_name column")
     
-    rated_df = df.groupby("item_name", as_index=False)["rating"].mean()
-    rated_df = rated_df.sort_values("rating", ascending=False).head(top_n)
+    with metrics.stage("groupby_rank"):
+        rated_df = df.groupby("item_name", as_index=False, observed=True)["rating"].mean()
+        rated_df = rated_df.sort_values("rating", ascending=False)
     
     return rated_df.to_dict(orient="records")
 
-@router.get("/category/{cat}")
-def find_by_category(cat: str, top_n: int = 10):
-    df = load_dataset()
-    
-    if "category" not in df.columns:
-        raise HTTPException(400, "Dataset missing category column")
-    
-    filtered_df = df[df["category"].str.lower().str.strip() == cat.lower().strip()]
-    
-    if filtered_df.empty:
-        return []
-    
-    if "popularity_score" in filtered_df.columns and "item_name" in filtered_df.columns:
-        result_df = filtered_df.groupby("item_name", as_index=False)["popularity_score"].mean()
-        result_df = result_df.sort_values("popularity_score", ascending=False).head(top_n)
-    else:
-        result_df = filtered_df[["item_name"]].drop_duplicates().head(top_n)
-    
-    return result_df.to_dict(orient="records")
+def highest_rated_records(top_n=10):
+    return _highest_rated_ranking(columnar_cache.data_version(DATA_PATH))[:top_n]
 
-@router.get("/spicy")
-def spicy_items():
+def category_records(cat, top_n=10):
+    return get_live_counters().top(top_n, category=cat)
+
+@lru_cache(maxsize=2)
+def _spicy_ranking(version):
     df = load_dataset()
     
     if "spicy_level" not in df.columns:
@@ -94,6 +225,8 @@ def spicy_items():
         'Spicy': 3
     }
     
+    # The loaded frame is shared across requests, so work on a narrow copy.
+    df = df[["item_name", "spicy_level"]].astype(str)
     df['spicy_level_numeric'] = df['spicy_level'].map(spicy_map)
     
     spicy_df = df[df['spicy_level_numeric'] >= 3].copy()
@@ -102,35 +235,168 @@ def spicy_items():
         return []
     
     if "item_name" in spicy_df.columns:
-        result_df = spicy_df.groupby("item_name", as_index=False)["spicy_level_numeric"].mean()
-        result_df = result_df.rename(columns={"spicy_level_numeric": "spicy_level"})
-        result_df = result_df.sort_values("spicy_level", ascending=False)
+        with metrics.stage("groupby_rank"):
+            result_df = spicy_df.groupby("item_name", as_index=False)["spicy_level_numeric"].mean()
+            result_df = result_df.rename(columns={"spicy_level_numeric": "spicy_level"})
+            result_df = result_df.sort_values("spicy_level", ascending=False)
         return result_df.to_dict(orient="records")
     
     return []
 
-@router.get("/search/{query}")
-def search_items(query: str):
-    menu_df = load_menu()
+def spicy_records():
+    return _spicy_ranking(columnar_cache.data_version(DATA_PATH))
+
+def search_records(query):
+    index = get_menu_index()
     
-    if "item_name" not in menu_df.columns:
+    if "item_name" not in index.columns:
         raise HTTPException(400, "Menu missing item_name column")
     
-    query_lower = query.lower().strip()
-    matches = menu_df[menu_df["item_name"].str.lower().str.contains(query_lower, na=False)]
-    
-    return matches.to_dict(orient="records")
+    return index.rows(index.search(query))
 
-@router.get("/item/{item_name}")
-def get_item_details(item_name: str):
-    menu_df = load_menu()
+def item_record(item_name):
+    index = get_menu_index()
     
-    if "item_name" not in menu_df.columns:
+    if "item_name" not in index.columns:
         raise HTTPException(400, "Menu missing item_name column")
     
-    item = menu_df[menu_df["item_name"].str.lower().str.strip() == item_name.lower().strip()]
+    item = index.find(item_name)
     
-    if item.empty:
+    if item is None:
         raise HTTPException(404, f"Item '{item_name}' not found in menu")
     
-    return item.to_dict(orient="records")[0]
\ No newline at end of file
+    return item
+
+# ---------- Routes ----------
+# Read routes return bytes cached per data version (see ML.API.responses) and
+# answer conditional requests with a 304 before any data is loaded. List routes
+# take `limit`/`offset`/`fields`; ranking routes also accept `top_n` as an
+# alias of `limit`. Paging metadata is sent in X-Total-Count and Link headers.
+
+@router.get("/menu")
+def get_menu(request: Request,
+        limit: Optional[int] = Query(None, ge=1, le=MAX_PAGE_SIZE),
+        offset: int = Query(0, ge=0), fields: Optional[str] = None):
+    def build():
+        index = get_menu_index()
+        return paginate(index.records, offset, limit, parse_fields(fields, index.columns))
+
+    return file_cached_json(request, MENU_PATH, MENU_MAX_AGE, build)
+
+@router.get("/popular")
+def get_popular(request: Request,
+        limit: Optional[int] = Query(None, ge=1, le=MAX_PAGE_SIZE),
+        top_n: Optional[int] = Query(None, ge=1, le=MAX_PAGE_SIZE),
+        offset: int = Query(0, ge=0), hour: Optional[int] = None,
+        fields: Optional[str] = None):
+    limit = resolve_limit(limit, top_n, DEFAULT_TOP_N)
+
+    if hour is not None and not 0 <= hour < 24:
+        raise HTTPException(400, "hour must be between 0 and 23")
+
+    def build():
+        counters = get_live_counters()
+        ranked = counters.top(offset + limit, hour=hour)
+        return paginate(ranked, offset, limit, parse_fields(fields, LIVE_FIELDS),
+                        total=len(counters))
+
+    return popularity_cached_json(request, build)
+
+@router.get("/highest-rated")
+def get_highest_rated(request: Request,
+        limit: Optional[int] = Query(None, ge=1, le=MAX_PAGE_SIZE),
+        top_n: Optional[int] = Query(None, ge=1, le=MAX_PAGE_SIZE),
+        offset: int = Query(0, ge=0), fields: Optional[str] = None):
+    limit = resolve_limit(limit, top_n, DEFAULT_TOP_N)
+
+    def build():
+        ranking = _highest_rated_ranking(columnar_cache.data_version(DATA_PATH))
+        return paginate(ranking, offset, limit, parse_fields(fields, RATED_FIELDS))
+
+    return file_cached_json(request, DATA_PATH, DATASET_MAX_AGE, build)
+
+@router.get("/category/{cat}")
+def find_by_category(request: Request, cat: str,
+        limit: Optional[int] = Query(None, ge=1, le=MAX_PAGE_SIZE),
+        top_n: Optional[int] = Query(None, ge=1, le=MAX_PAGE_SIZE),
+        offset: int = Query(0, ge=0), fields: Optional[str] = None):
+    limit = resolve_limit(limit, top_n, DEFAULT_TOP_N)
+
+    def build():
+        ranked = get_live_counters().top(offset + limit, category=cat)
+        # The category size is not tracked, so only a next link is offered.
+        return paginate(ranked, offset, limit, parse_fields(fields, LIVE_FIELDS),
+                        total=len(ranked) if len(ranked) < offset + limit else None)
+
+    return popularity_cached_json(request, build)
+
+@router.get("/spicy")
+def spicy_items(request: Request,
+        limit: Optional[int] = Query(None, ge=1, le=MAX_PAGE_SIZE),
+        top_n: Optional[int] = Query(None, ge=1, le=MAX_PAGE_SIZE),
+        offset: int = Query(0, ge=0), fields: Optional[str] = None):
+    limit = resolve_limit(limit, top_n, DEFAULT_TOP_N)
+
+    def build():
+        return paginate(spicy_records(), offset, limit, parse_fields(fields, SPICY_FIELDS))
+
+    return file_cached_json(request, DATA_PATH, DATASET_MAX_AGE, build)
+
+@router.get("/now")
+def recommend_now(request: Request,
+        limit: Optional[int] = Query(None, ge=1, le=MAX_PAGE_SIZE),
+        top_n: Optional[int] = Query(None, ge=1, le=MAX_PAGE_SIZE),
+        offset: int = Query(0, ge=0), category: Optional[str] = None,
+        time_of_day: Optional[str] = None, day_of_week: Optional[str] = None,
+        fields: Optional[str] = None):
+    limit = resolve_limit(limit, top_n, DEFAULT_TOP_N)
+    model = get_contextual_model()
+
+    now = datetime.now()
+    time_of_day = (time_of_day or time_of_day_for(now.hour)).strip().title()
+    day_of_week = (day_of_week or DAYS_OF_WEEK[now.weekday()]).strip().title()
+
+    if time_of_day not in TIMES_OF_DAY:
+        raise HTTPException(422, f"Unknown time_of_day '{time_of_day}'; expected one of {TIMES_OF_DAY}")
+    if day_of_week not in DAYS_OF_WEEK:
+        raise HTTPException(422, f"Unknown day_of_week '{day_of_week}'; expected one of {DAYS_OF_WEEK}")
+
+    ranked = model.recommend(time_of_day, day_of_week, category, offset + limit)
+    page = paginate(ranked, offset, limit, parse_fields(fields, CONTEXTUAL_FIELDS),
+                    total=len(ranked) if len(ranked) < offset + limit else None)
+    return ORJSONResponse(page.items, headers=page.headers(request))
+
+@router.post("/orders")
+def ingest_order(order: OrderEvent):
+    if order.quantity < 1:
+        raise HTTPException(400, "quantity must be at least 1")
+
+    order_log.append(
+        order.item_name,
+        quantity=order.quantity,
+        when=order.timestamp,
+        category=order.category,
+        price=order.price,
+    )
+    get_live_counters()
+    get_contextual_model()
+    return {"status": "accepted", "item_name": order.item_name}
+
+@router.get("/search/{query}")
+def search_items(request: Request, query: str,
+        limit: Optional[int] = Query(None, ge=1, le=MAX_PAGE_SIZE),
+        offset: int = Query(0, ge=0), fields: Optional[str] = None):
+    def build():
+        return paginate(search_records(query), offset, limit,
+                        parse_fields(fields, get_menu_index().columns))
+
+    return file_cached_json(request, MENU_PATH, MENU_MAX_AGE, build)
+
+@router.get("/item/{item_name}")
+def get_item_details(request: Request, item_name: str, fields: Optional[str] = None):
+    def build():
+        item = item_record(item_name)
+        selected = parse_fields(fields, get_menu_index().columns)
+        return {f: item[f] for f in selected} if selected else item
+
+    return file_cached_json(request, MENU_PATH, MENU_MAX_AGE, build)
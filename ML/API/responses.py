@@ -0,0 +1,244 @@
+"""
+Pre-serialized JSON responses for read-mostly endpoints.
+
+`cached_json()` serializes a route's payload with orjson once per data version
+and keeps the bytes; repeat calls return them as-is, skipping FastAPI's
+`jsonable_encoder` walk. Each entry carries an ETag hashed from its bytes
+(body and cached headers), so every worker process hands out the same ETag
+for the same body and never the same one for different bodies. A client
+sending a matching `If-None-Match` gets a 304 with no body; once the entry is
+cached, or with an `If-Modified-Since` no older than the data, the payload is
+not rebuilt either. Large bodies are also kept gzip- and, when the
+optional `brotli` package is installed, brotli-compressed. Concurrent misses
+for the same entry are coalesced: one thread builds it, the others wait.
+"""
+
+import gzip
+import hashlib
+import threading
+from collections import OrderedDict
+from email.utils import formatdate, parsedate_to_datetime
+
+import numpy as np
+import orjson
+import pandas as pd
+from fastapi import Request
+from fastapi.responses import Response
+
+from ML import metrics
+from ML.API.pagination import Page
+from ML.singleflight import SingleFlight
+
+try:
+    import brotli
+except ImportError:  # optional: gzip only
+    brotli = None
+
+ORJSON_OPTIONS = orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS
+
+# Bodies smaller than this are sent as-is; compressing them costs more than
+# it saves.
+COMPRESS_MIN_BYTES = 1024
+
+
+def _default(obj):
+    if isinstance(obj, pd.Timestamp):
+        return obj.isoformat()
+    if isinstance(obj, np.generic):
+        return obj.item()
+    if obj is pd.NA or obj is pd.NaT:
+        return None
+    raise TypeError(f"Type is not JSON serializable: {type(obj).__name__}")
+
+
+def dumps(payload):
+    with metrics.stage("serialization"):
+        return orjson.dumps(payload, default=_default, option=ORJSON_OPTIONS)
+
+
+class ORJSONResponse(Response):
+    """JSON response rendered by orjson, NumPy scalars and Timestamps included."""
+
+    media_type = "application/json"
+
+    def render(self, content):
+        return dumps(content)
+
+
+class ResponseCache:
+    """Small thread-safe LRU of serialized bodies keyed by (request, version)."""
+
+    def __init__(self, max_entries=512):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        with self._lock:
+            body = self._entries.get(key)
+            if body is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return body
+
+    def put(self, key, body):
+        with self._lock:
+            self._entries[key] = body
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+response_cache = ResponseCache()
+_builds = SingleFlight("response_cache")
+
+
+def route_label(request: Request):
+    """Route template (`/recommend/category/{cat}`) for low-cardinality labels."""
+    route = request.scope.get("route")
+    return getattr(route, "path", None) or request.url.path
+
+
+def request_key(request: Request):
+    return (request.url.path, tuple(sorted(request.query_params.multi_items())))
+
+
+def make_etag(body, headers=None):
+    digest = hashlib.blake2b(body, digest_size=12)
+    for name, value in sorted((headers or {}).items()):
+        digest.update(f"\n{name}: {value}".encode())
+    return f'"{digest.hexdigest()}"'
+
+
+def etag_matches(request: Request, etag):
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    if header.strip() == "*":
+        return True
+    # Weak validators compare equal to strong ones for GET (RFC 9110 13.1.2).
+    tags = {tag.strip().removeprefix("W/") for tag in header.split(",")}
+    return etag in tags
+
+
+def not_modified_since(request: Request, last_modified):
+    header = request.headers.get("if-modified-since")
+    if not header or last_modified is None:
+        return False
+    try:
+        since = parsedate_to_datetime(header).timestamp()
+    except (TypeError, ValueError):
+        return False
+    # HTTP dates have one-second resolution.
+    return int(last_modified) <= since
+
+
+def _accepted_encodings(header):
+    """{coding: q} from an Accept-Encoding header; q defaults to 1."""
+    accepted = {}
+    for part in header.split(","):
+        name, _, params = part.partition(";")
+        name = name.strip().lower()
+        if not name:
+            continue
+        q = 1.0
+        for param in params.split(";"):
+            key, _, value = param.partition("=")
+            if key.strip().lower() == "q":
+                try:
+                    q = float(value)
+                except ValueError:
+                    q = 0.0
+        accepted[name] = q
+    return accepted
+
+
+def _encodings(request: Request):
+    accepted = _accepted_encodings(request.headers.get("accept-encoding", ""))
+    default = accepted.get("*", 0.0)
+    # Prefer brotli, then gzip, among codings the client allows (q > 0).
+    if brotli is not None and accepted.get("br", default) > 0:
+        return "br"
+    if accepted.get("gzip", default) > 0:
+        return "gzip"
+    return "identity"
+
+
+def _compress(body, encoding):
+    if encoding == "br":
+        return brotli.compress(body, quality=5)
+    return gzip.compress(body, compresslevel=6)
+
+
+class CachedBody:
+    """Serialized body plus lazily built compressed variants."""
+
+    def __init__(self, body, headers=None):
+        self.variants = {"identity": body}
+        self.headers = headers or {}
+        self.etag = make_etag(body, self.headers)
+
+    def get(self, encoding):
+        if len(self.variants["identity"]) < COMPRESS_MIN_BYTES:
+            encoding = "identity"
+        if encoding not in self.variants:
+            self.variants[encoding] = _compress(self.variants["identity"], encoding)
+        return encoding, self.variants[encoding]
+
+
+def cached_json(request: Request, version, build, last_modified=None, max_age=0):
+    """
+    Return `build()` as JSON, cached per request and data `version`.
+
+    `version` must change whenever the data behind the route does: it keys
+    the cached bytes, whose hash is the ETag. `last_modified` (epoch seconds,
+    optional) answers If-Modified-Since without building anything. `max_age`
+    is sent as the Cache-Control lifetime. If `build()` returns a `Page`, its
+    items are the body and its paging headers are cached alongside.
+    """
+    key = request_key(request)
+    headers = {
+        "Cache-Control": f"public, max-age={max_age}",
+        "Vary": "Accept-Encoding",
+    }
+    if last_modified is not None:
+        headers["Last-Modified"] = formatdate(last_modified, usegmt=True)
+
+    # If-None-Match takes precedence; If-Modified-Since only applies without it.
+    if "if-none-match" not in request.headers and not_modified_since(request, last_modified):
+        metrics.cache_event("response", "not_modified")
+        return Response(status_code=304, headers=headers)
+
+    entry = response_cache.get((key, version))
+    metrics.cache_event("response", "miss" if entry is None else "hit")
+    if entry is None:
+        def build_entry():
+            payload = build()
+            if isinstance(payload, Page):
+                built = CachedBody(dumps(payload.items), payload.headers(request))
+            else:
+                built = CachedBody(dumps(payload))
+            # Stored before the flight ends, so later callers hit the cache.
+            response_cache.put((key, version), built)
+            return built
+
+        entry = _builds.do((key, version), build_entry, metric_key=route_label(request))
+
+    headers["ETag"] = entry.etag
+    if etag_matches(request, entry.etag):
+        metrics.cache_event("response", "not_modified")
+        return Response(status_code=304, headers=headers)
+
+    headers.update(entry.headers)
+    encoding, body = entry.get(_encodings(request))
+    if encoding != "identity":
+        headers["Content-Encoding"] = encoding
+    return Response(body, media_type="application/json", headers=headers)
@@ -0,0 +1,202 @@
+"""
+Typed columnar cache for the raw CSVs.
+
+`python -m ML.Data.columnar_cache` converts every known CSV in ML/Data/raw into
+an uncompressed Feather (Arrow IPC) file under ML/Data/cache, with categoricals
+stored as dictionaries, ids as ints and datetimes parsed once. Cache files are
+named by a hash of the CSV's absolute path and record that path, its size and
+its st_mtime_ns in the Arrow schema metadata; a cache whose record does not
+match the CSV exactly is rebuilt.
+
+Consumers call `load_csv(path)`, which returns the same DataFrame to every
+caller in the process. The file is memory-mapped and converted with one block
+per column, so numeric, datetime and dictionary-code columns are read-only
+NumPy views over the mapped pages: workers share them through the page cache
+instead of each holding a copy. Only dictionary values (the distinct labels)
+and untyped string columns are copied.
+
+The returned frames are shared: treat them as read-only.
+"""
+
+import hashlib
+import json
+import os
+import threading
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.feather as feather
+
+from ML import metrics
+from ML.Model.artifacts import atomic_write, file_lock
+
+DATA_DIR = os.path.dirname(os.path.abspath(__file__))
+RAW_DIR = os.path.join(DATA_DIR, "raw")
+CACHE_DIR = os.path.join(DATA_DIR, "cache")
+
+DATASET_CSV = os.path.join(RAW_DIR, "canteen_recommendation_dataset.csv")
+MENU_CSV = os.path.join(RAW_DIR, "menu.csv")
+
+# Column types per CSV, keyed by file stem. Unknown CSVs are cached with the
+# dtypes pandas infers. "int" columns become int32 only if every value is
+# whole; otherwise they stay float64 rather than losing the fraction.
+SCHEMAS = {
+    "canteen_recommendation_dataset": {
+        "category": ["user_id", "item_name", "category", "time_of_day", "day_of_week",
+                     "spicy_level", "user_age_group", "user_gender", "combo_preference"],
+        "int": ["item_id", "price", "rating", "calories", "popularity_score",
+                "purchase_count", "last_purchased_days_ago", "user_avg_spend"],
+        "datetime": ["datetime"],
+    },
+    "menu": {
+        "category": ["category"],
+        "int": ["price"],
+    },
+    "mock_canteen_orders": {
+        "category": ["user_id", "item_id", "item_name", "category"],
+        "int": ["order_id", "quantity", "total_price"],
+        "datetime": ["timestamp"],
+    },
+}
+
+# Schema metadata key holding the source CSV's path, size and mtime.
+SOURCE_KEY = b"canteen_source"
+
+_frames = {}
+_lock = threading.Lock()
+
+
+def cache_path_for(csv_path):
+    """ML/Data/cache/<stem>-<hash of the absolute path>.feather"""
+    csv_path = os.path.abspath(csv_path)
+    stem = os.path.splitext(os.path.basename(csv_path))[0]
+    digest = hashlib.sha1(csv_path.encode()).hexdigest()[:12]
+    return os.path.join(CACHE_DIR, f"{stem}-{digest}.feather")
+
+
+def source_info(csv_path):
+    st = os.stat(csv_path)
+    return {"path": os.path.abspath(csv_path), "size": st.st_size, "mtime_ns": st.st_mtime_ns}
+
+
+def _whole_int(series):
+    values = series.dropna()
+    if len(values) and not np.array_equal(values, np.floor(values)):
+        return series.astype("float64")
+    # Nullable ints only when the column actually has gaps.
+    return series.astype("int32" if len(values) == len(series) else "Int32")
+
+
+def read_typed_csv(csv_path, schema=None):
+    """Parse a CSV once with explicit dtypes instead of per-call inference."""
+    stem = os.path.splitext(os.path.basename(csv_path))[0]
+    schema = schema if schema is not None else SCHEMAS.get(stem, {})
+
+    df = pd.read_csv(
+        csv_path,
+        dtype={col: "category" for col in schema.get("category", [])},
+        parse_dates=schema.get("datetime", []) or False,
+    )
+    df.columns = df.columns.str.strip()
+
+    for col in schema.get("int", []):
+        if col in df.columns:
+            df[col] = _whole_int(df[col])
+    return df
+
+
+def build_cache(csv_path, out_path=None):
+    out_path = out_path or cache_path_for(csv_path)
+    os.makedirs(os.path.dirname(out_path), exist_ok=True)
+
+    # Stat before reading: a CSV rewritten mid-build then no longer matches.
+    source = source_info(csv_path)
+    table = pa.Table.from_pandas(read_typed_csv(csv_path))
+    table = table.replace_schema_metadata(
+        {**(table.schema.metadata or {}), SOURCE_KEY: json.dumps(source).encode()})
+    # Uncompressed, so reading maps the file instead of decompressing it.
+    with atomic_write(out_path) as f:
+        feather.write_feather(table, f, compression="uncompressed")
+    print(f"✅ Cached {table.num_rows} rows from {os.path.basename(csv_path)} -> {out_path}")
+    return out_path
+
+
+def _open_current(csv_path, cached):
+    """The mapped cache table if it was built from `csv_path` as it is now, else None."""
+    if not os.path.exists(cached):
+        return None
+    table = feather.read_table(cached, memory_map=True)
+    if not os.path.exists(csv_path):
+        # Without the CSV (e.g. a slim serving image) the cache is all there is.
+        return table
+    recorded = (table.schema.metadata or {}).get(SOURCE_KEY)
+    if recorded is None or json.loads(recorded) != source_info(csv_path):
+        return None
+    return table
+
+
+def to_frame(table):
+    """DataFrame over a mapped table; one block per column keeps the columns zero-copy."""
+    return table.to_pandas(split_blocks=True)
+
+
+def read_cache(path):
+    return to_frame(feather.read_table(path, memory_map=True))
+
+
+def load_csv(csv_path):
+    """Return the cached frame for `csv_path`, building the Feather file if needed."""
+    csv_path = os.path.abspath(csv_path)
+    cached = cache_path_for(csv_path)
+
+    with _lock:
+        entry = _frames.get(csv_path)
+        source = source_info(csv_path) if os.path.exists(csv_path) else None
+        if entry is not None and entry[0] == source:
+            metrics.cache_event("dataframe", "hit")
+            return entry[1]
+        metrics.cache_event("dataframe", "miss")
+
+        with metrics.stage("data_load"):
+            table = _open_current(csv_path, cached)
+            if table is None:
+                if source is None:
+                    raise FileNotFoundError(csv_path)
+                # Several workers may start at once: one builds, the rest wait.
+                with file_lock(cached):
+                    table = _open_current(csv_path, cached)
+                    if table is None:
+                        build_cache(csv_path, cached)
+                        table = feather.read_table(cached, memory_map=True)
+            df = to_frame(table)
+        _frames[csv_path] = (source, df)
+        return df
+
+
+def data_version(csv_path):
+    """Cheap change marker for `csv_path` (its mtime), usable as a cache key."""
+    try:
+        return os.stat(csv_path).st_mtime_ns
+    except FileNotFoundError:
+        return None
+
+
+def load_dataset():
+    return load_csv(DATASET_CSV)
+
+
+def load_menu():
+    return load_csv(MENU_CSV)
+
+
+def build_all():
+    for name in sorted(os.listdir(RAW_DIR)):
+        if name.endswith(".csv"):
+            csv_path = os.path.join(RAW_DIR, name)
+            with file_lock(cache_path_for(csv_path)):
+                build_cache(csv_path)
+
+
+if __name__ == "__main__":
+    build_all()
@@ -1,10 +1,29 @@
+"""
+Synthetic canteen order generator.
+
+    python ML/Data/generate_mock_data.py                      # 1,200 orders, as before
+    python ML/Data/generate_mock_data.py --orders 50000000 --users 200000 \
+        --items 5000 --format parquet --out /data/orders.parquet \
+        --menu-out /data/menu.csv --mongo-out /data/purchases.jsonl
+    python ML/Data/generate_mock_data.py --shape recommendation --orders 100000 \
+        --out /data/canteen_recommendation_dataset.csv
+
+Orders are drawn in NumPy chunks (item popularity follows a Zipf law over a
+shuffled item ranking) and streamed to disk chunk by chunk, so memory stays
+bounded by --chunk-size whatever --orders is. `--shape recommendation` writes
+the same orders in the layout of raw/canteen_recommendation_dataset.csv (item
+content features, time of day, user attributes); the benchmarks use that
+shape through `item_features()` and `recommendation_rows()`.
+"""
+
+import argparse
 import os
-import csv
-import random
-from datetime import datetime, timedelta
+import time
+
+import numpy as np
+import pandas as pd
 
 OUT_DIR = os.path.join(os.path.dirname(__file__), "raw")
-os.makedirs(OUT_DIR, exist_ok=True)
 OUT_CSV = os.path.join(OUT_DIR, "mock_canteen_orders.csv")
 
 items = [
@@ -20,33 +39,213 @@ items = [
     {"id": "D10", "name": "Shake", "category": "Beverage", "price": 70}
 ]
 
-users = [f"U{i:03}" for i in range(1, 201)]  
-start_date = datetime(2025, 10, 1)
-num_orders = 1200  
-
-with open(OUT_CSV, "w", newline="", encoding="utf-8") as f:
-    writer = csv.DictWriter(f, fieldnames=[
-        "order_id", "user_id", "item_id", "item_name",
-        "category", "quantity", "total_price", "timestamp"
-    ])
-    writer.writeheader()
-    for i in range(num_orders):
-        user = random.choice(users)
-        item = random.choices(items, weights=[10,15,20,9,8,7,6,11,5,4], k=1)[0]
-        qty = random.choices([1,1,1,2,3], weights=[60,20,15,4,1], k=1)[0]
-        date = start_date + timedelta(days=random.randint(0,34),
-                                      hours=random.randint(6,21),
-                                      minutes=random.randint(0,59))
-        total_price = item["price"] * qty
-        writer.writerow({
-            "order_id": i + 1,
-            "user_id": user,
-            "item_id": item["id"],
-            "item_name": item["name"],
-            "category": item["category"],
-            "quantity": qty,
-            "total_price": total_price,
-            "timestamp": date.strftime("%Y-%m-%d %H:%M:%S")
-        })
-
-print("Mock CSV created at:", OUT_CSV)
+QUANTITIES = np.array([1, 2, 3])
+QUANTITY_P = np.array([0.95, 0.04, 0.01])
+OPEN_HOUR, CLOSE_HOUR = 6, 21
+
+# Columns only the recommendation dataset has.
+SPICY_LEVELS = ["Mild", "Medium", "Spicy"]
+AGE_GROUPS = ["Teen", "20s", "30s"]
+COMBOS = ["Burger+Fries", "Chai+Samosa", "Lassi+RajmaChawal", "Maggi+Chai",
+          "Pizza+ColdDrink", "Sandwich+Coffee"]
+# Same buckets as ML.Model.contextual_recommendation.TIME_OF_DAY_BOUNDS (this
+# file also runs as a plain script, outside the ML package).
+TIME_OF_DAY_BOUNDS = [(11, "Breakfast"), (15, "Lunch"), (24, "Snacks")]
+
+
+def build_catalogue(n_items, rng):
+    """The ten classic items first, then synthetic dishes to reach n_items."""
+    base = items[:n_items]
+    extra = n_items - len(base)
+    categories = sorted({i["category"] for i in items})
+    catalogue = pd.DataFrame({
+        "item_id": [i["id"] for i in base] + [f"D{i:02d}" for i in range(len(base) + 1, n_items + 1)],
+        "item_name": [i["name"] for i in base] + [f"Dish {i}" for i in range(len(base) + 1, n_items + 1)],
+        "category": [i["category"] for i in base] + list(rng.choice(categories, extra)),
+        "price": np.concatenate([[i["price"] for i in base],
+                                 rng.integers(2, 30, extra) * 5]).astype(np.int64),
+    })
+    catalogue["rating"] = np.round(rng.uniform(3.5, 4.8, n_items), 1)
+    return catalogue
+
+
+def zipf_weights(n_items, skew, rng):
+    weights = np.arange(1, n_items + 1, dtype=np.float64) ** -skew
+    if n_items > len(items):
+        # Keep the classic items on top, shuffle who gets the long tail ranks.
+        weights[len(items):] = rng.permutation(weights[len(items):])
+    return weights / weights.sum()
+
+
+def generate_chunk(rng, catalogue, weights, n_users, start, span_minutes, first_order_id, size):
+    idx = rng.choice(len(catalogue), size, p=weights)
+    qty = rng.choice(QUANTITIES, size, p=QUANTITY_P)
+
+    days = rng.integers(0, max(span_minutes // 1440, 1), size)
+    minutes = days * 1440 + rng.integers(OPEN_HOUR, CLOSE_HOUR + 1, size) * 60 + rng.integers(0, 60, size)
+
+    chosen = catalogue.iloc[idx]
+    return pd.DataFrame({
+        "order_id": np.arange(first_order_id, first_order_id + size, dtype=np.int64),
+        "user_id": "U" + pd.Series(rng.integers(1, n_users + 1, size)).astype(str).str.zfill(3),
+        "item_id": chosen["item_id"].to_numpy(),
+        "item_name": chosen["item_name"].to_numpy(),
+        "category": chosen["category"].to_numpy(),
+        "quantity": qty,
+        "total_price": chosen["price"].to_numpy() * qty,
+        "timestamp": start + pd.to_timedelta(minutes, unit="m"),
+    })
+
+
+def item_features(catalogue, rng):
+    """The catalogue plus the content features the recommendation dataset carries."""
+    return catalogue.assign(
+        calories=rng.integers(50, 800, len(catalogue)),
+        spicy_level=rng.choice(SPICY_LEVELS, len(catalogue)),
+    )
+
+
+def recommendation_rows(chunk, catalogue, rng):
+    """
+    An order chunk laid out like raw/canteen_recommendation_dataset.csv, one row
+    per order. `catalogue` needs item_features(); item_id becomes the item's
+    1-based position in it, since that dataset uses integer ids.
+    """
+    pos = pd.Index(catalogue["item_id"]).get_indexer(chunk["item_id"])
+    chosen = catalogue.iloc[pos]
+    size = len(chunk)
+    hours = chunk["timestamp"].dt.hour.to_numpy()
+    time_of_day = np.select([hours < upper for upper, _ in TIME_OF_DAY_BOUNDS],
+                            [label for _, label in TIME_OF_DAY_BOUNDS])
+    return pd.DataFrame({
+        "user_id": chunk["user_id"].to_numpy(),
+        "item_id": (pos + 1).astype(np.int32),
+        "item_name": chunk["item_name"].to_numpy(),
+        "category": chunk["category"].to_numpy(),
+        "price": chosen["price"].to_numpy(),
+        "datetime": chunk["timestamp"].dt.strftime("%Y-%m-%d %H:%M:%S").to_numpy(),
+        "time_of_day": time_of_day,
+        "day_of_week": chunk["timestamp"].dt.day_name().to_numpy(),
+        "rating": rng.integers(1, 6, size),
+        "calories": chosen["calories"].to_numpy(),
+        "spicy_level": chosen["spicy_level"].to_numpy(),
+        "popularity_score": rng.integers(30, 100, size),
+        "purchase_count": rng.integers(1, 40, size),
+        "last_purchased_days_ago": rng.integers(0, 16, size),
+        "user_age_group": rng.choice(AGE_GROUPS, size),
+        "user_gender": rng.choice(["M", "F"], size),
+        "user_avg_spend": rng.integers(20, 120, size),
+        "combo_preference": rng.choice(COMBOS, size),
+    })
+
+
+class OrderWriter:
+    """Appends order chunks to a CSV or Parquet file without holding them all."""
+
+    def __init__(self, path, fmt):
+        self.path = path
+        self.fmt = fmt
+        self._writer = None
+        self._file = None
+
+    def write(self, chunk):
+        if self.fmt == "parquet":
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+
+            table = pa.Table.from_pandas(chunk, preserve_index=False)
+            if self._writer is None:
+                self._writer = pq.ParquetWriter(self.path, table.schema)
+            self._writer.write_table(table)
+        else:
+            if self._file is None:
+                self._file = open(self.path, "w", newline="", encoding="utf-8")
+                chunk.to_csv(self._file, index=False, date_format="%Y-%m-%d %H:%M:%S")
+            else:
+                chunk.to_csv(self._file, index=False, header=False, date_format="%Y-%m-%d %H:%M:%S")
+
+    def close(self):
+        if self._writer is not None:
+            self._writer.close()
+        if self._file is not None:
+            self._file.close()
+
+
+def write_mongo_purchases(f, chunk):
+    """One purchase document per order, in the shape PersonalizedRecommender reads."""
+    docs = (
+        '{"_id": "o' + chunk["order_id"].astype(str)
+        + '", "userId": "' + chunk["user_id"].astype(str)
+        + '", "items": [{"itemId": "' + chunk["item_id"].astype(str)
+        + '", "quantity": ' + chunk["quantity"].astype(str)
+        + ', "totalAmount": ' + chunk["total_price"].astype(str)
+        + '}], "createdAt": "' + chunk["timestamp"].dt.strftime("%Y-%m-%dT%H:%M:%S")
+        + '"}'
+    )
+    f.write("\n".join(docs))
+    f.write("\n")
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Generate synthetic canteen orders.")
+    parser.add_argument("--users", type=int, default=200)
+    parser.add_argument("--items", type=int, default=len(items))
+    parser.add_argument("--orders", type=int, default=1200)
+    parser.add_argument("--start", default="2025-10-01")
+    parser.add_argument("--end", default="2025-11-04", help="exclusive")
+    parser.add_argument("--zipf", type=float, default=1.1, help="item popularity skew")
+    parser.add_argument("--seed", type=int, default=None)
+    parser.add_argument("--chunk-size", type=int, default=1_000_000)
+    parser.add_argument("--shape", choices=["orders", "recommendation"], default="orders",
+                        help="recommendation: rows shaped like raw/canteen_recommendation_dataset.csv")
+    parser.add_argument("--format", choices=["csv", "parquet"], default=None,
+                        help="defaults to the --out extension")
+    parser.add_argument("--out", default=OUT_CSV)
+    parser.add_argument("--menu-out", default=None, help="also write a menu.csv for the catalogue")
+    parser.add_argument("--mongo-out", default=None, help="also write purchases as JSONL documents")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    fmt = args.format or ("parquet" if args.out.endswith(".parquet") else "csv")
+    rng = np.random.default_rng(args.seed)
+
+    start = pd.Timestamp(args.start)
+    span_minutes = int((pd.Timestamp(args.end) - start).total_seconds() // 60)
+    if span_minutes < 1440:
+        raise SystemExit("--end must be at least one day after --start")
+
+    catalogue = build_catalogue(args.items, rng)
+    weights = zipf_weights(args.items, args.zipf, rng)
+    if args.shape == "recommendation":
+        catalogue = item_features(catalogue, rng)
+
+    os.makedirs(os.path.dirname(os.path.abspath(args.out)), exist_ok=True)
+    writer = OrderWriter(args.out, fmt)
+    mongo = open(args.mongo_out, "w", encoding="utf-8") if args.mongo_out else None
+
+    t0 = time.perf_counter()
+    try:
+        for first in range(0, args.orders, args.chunk_size):
+            size = min(args.chunk_size, args.orders - first)
+            chunk = generate_chunk(rng, catalogue, weights, args.users, start,
+                                   span_minutes, first + 1, size)
+            writer.write(recommendation_rows(chunk, catalogue, rng)
+                         if args.shape == "recommendation" else chunk)
+            if mongo is not None:
+                write_mongo_purchases(mongo, chunk)
+    finally:
+        writer.close()
+        if mongo is not None:
+            mongo.close()
+
+    if args.menu_out:
+        catalogue[["item_name", "category", "price", "rating"]].to_csv(args.menu_out, index=False)
+
+    print(f"Mock {fmt.upper()} created at: {args.out} "
+          f"({args.orders} orders in {time.perf_counter() - t0:.1f}s)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,74 @@
+"""
+In-memory lookup structures over the menu.
+
+Built once per menu version from the columnar cache: the rows as ready-made
+records, a lowercase name array for substring search and a name -> row dict
+for exact lookups. Search results are kept as row positions, so serving a page
+is a slice of those positions rather than a filter and copy of the frame.
+"""
+
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+from ML import metrics
+
+SEARCH_CACHE_SIZE = 1024
+
+
+class MenuIndex:
+    def __init__(self, df):
+        self.columns = tuple(df.columns)
+        self.records = df.to_dict(orient="records")
+        self.names = np.array([str(r["item_name"]).lower() for r in self.records], dtype=str)
+
+        self.by_name = {}
+        for position, record in enumerate(self.records):
+            self.by_name.setdefault(str(record["item_name"]).strip().lower(), position)
+
+        self._searches = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.records)
+
+    def search(self, query):
+        """Positions of rows whose name contains `query` (case-insensitive)."""
+        query = query.lower().strip()
+        with self._lock:
+            positions = self._searches.get(query)
+            if positions is not None:
+                self._searches.move_to_end(query)
+                metrics.cache_event("menu_search", "hit")
+                return positions
+
+        metrics.cache_event("menu_search", "miss")
+        positions = np.flatnonzero(np.char.find(self.names, query) >= 0)
+        with self._lock:
+            self._searches[query] = positions
+            while len(self._searches) > SEARCH_CACHE_SIZE:
+                self._searches.popitem(last=False)
+        return positions
+
+    def find(self, item_name):
+        position = self.by_name.get(item_name.strip().lower())
+        return None if position is None else self.records[position]
+
+    def rows(self, positions):
+        """Lazy sequence view of `records` at `positions`; slicing it is cheap."""
+        return _Rows(self.records, positions)
+
+
+class _Rows:
+    def __init__(self, records, positions):
+        self.records = records
+        self.positions = positions
+
+    def __len__(self):
+        return len(self.positions)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self.records[i] for i in self.positions[index]]
+        return self.records[self.positions[index]]
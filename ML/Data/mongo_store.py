@@ -0,0 +1,224 @@
+"""
+Shared MongoDB access for the personalized features.
+
+One Motor client per process (`get_client()`), created lazily with a bounded
+connection pool, and one place that reads the connection settings:
+
+- URI: MONGODB_URI, falling back to the older MONGO_URI, then localhost
+- database: MONGODB_DB, falling back to MONGO_DB, then "canteen"
+
+`PurchaseHistory` answers "what did this user order recently" from the
+`purchases` collection, with the answers held in a small LRU + TTL cache
+(`RecentItemsCache`) so online personalization does not hit Mongo on every
+request. `recent_items_many()` serves cache hits and fetches all misses in a
+single aggregation that returns only the newest `limit` orders of each user.
+Misses are coalesced per user: a user whose history is already being fetched
+joins that query, and the fetch runs as its own task, so a caller that stops
+waiting does not cancel it.
+
+Anything with Motor's `client[db][collection].aggregate(pipeline)` surface
+can stand in for the client: pass it to `set_client()` (the benchmarks use
+benchmarks.synthetic.InMemoryMongo).
+"""
+
+import os
+import threading
+import time
+from collections import OrderedDict
+
+from dotenv import load_dotenv
+
+from ML import metrics
+from ML.singleflight import AsyncSingleFlight
+
+load_dotenv()
+
+MONGO_URI = os.getenv("MONGODB_URI") or os.getenv("MONGO_URI") or "mongodb://localhost:27017"
+MONGO_DB = os.getenv("MONGODB_DB") or os.getenv("MONGO_DB") or "canteen"
+POOL_SIZE = int(os.getenv("CANTEEN_MONGO_POOL_SIZE", "50"))
+# Fail fast when the database is down instead of Motor's 30 s default.
+SERVER_SELECTION_TIMEOUT_MS = int(os.getenv("CANTEEN_MONGO_TIMEOUT_MS", "5000"))
+
+PURCHASES = "purchases"
+RECENT_ITEMS = 20
+HISTORY_CACHE_USERS = int(os.getenv("CANTEEN_HISTORY_CACHE_USERS", "10000"))
+HISTORY_TTL = float(os.getenv("CANTEEN_HISTORY_TTL", "300"))
+
+_client = None
+_client_lock = threading.Lock()
+
+
+def get_client():
+    """The process-wide Motor client; importing Motor is not free, so it is deferred."""
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                import motor.motor_asyncio
+
+                _client = motor.motor_asyncio.AsyncIOMotorClient(
+                    MONGO_URI, maxPoolSize=POOL_SIZE,
+                    serverSelectionTimeoutMS=SERVER_SELECTION_TIMEOUT_MS)
+    return _client
+
+
+def set_client(client):
+    """Use `client` (e.g. an in-memory stand-in) instead of connecting to MONGO_URI."""
+    global _client
+    with _client_lock:
+        _client = client
+
+
+def get_database(name=None):
+    return get_client()[name or MONGO_DB]
+
+
+def close_client():
+    global _client
+    with _client_lock:
+        client, _client = _client, None
+    if client is not None and hasattr(client, "close"):
+        client.close()
+
+
+async def ping():
+    await get_client().admin.command("ping")
+
+
+def _user_keys(user_id):
+    """userId may be stored as a string or an ObjectId; match either."""
+    from bson import ObjectId
+
+    keys = [user_id]
+    if ObjectId.is_valid(user_id):
+        keys.append(ObjectId(user_id))
+    return keys
+
+
+class RecentItemsCache:
+    """Thread-safe LRU of per-user item lists whose entries expire after `ttl` seconds."""
+
+    def __init__(self, max_users=HISTORY_CACHE_USERS, ttl=HISTORY_TTL, clock=time.monotonic):
+        self.max_users = max_users
+        self.ttl = ttl
+        self.clock = clock
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, user_id):
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry is not None and entry[0] <= self.clock():
+                del self._entries[user_id]
+                entry = None
+            if entry is None:
+                self.misses += 1
+                metrics.cache_event("user_history", "miss")
+                return None
+            self._entries.move_to_end(user_id)
+            self.hits += 1
+        metrics.cache_event("user_history", "hit")
+        return entry[1]
+
+    def put(self, user_id, items):
+        with self._lock:
+            self._entries[user_id] = (self.clock() + self.ttl, items)
+            self._entries.move_to_end(user_id)
+            while len(self._entries) > self.max_users:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, user_id=None):
+        with self._lock:
+            if user_id is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(user_id, None)
+
+
+class PurchaseHistory:
+    """
+    Recent item ids per user, newest first, from the user's `limit` newest
+    orders in the `purchases` collection.
+    """
+
+    def __init__(self, db=None, collection=PURCHASES, limit=RECENT_ITEMS, cache=None):
+        self._db = db
+        self.collection_name = collection
+        self.limit = limit
+        self.cache = cache if cache is not None else RecentItemsCache()
+        self._flight = AsyncSingleFlight("user_history")
+        self.queries = 0
+
+    @property
+    def collection(self):
+        return (self._db if self._db is not None else get_database())[self.collection_name]
+
+    async def _fetch(self, user_ids):
+        """
+        One aggregation for all `user_ids`; {user_id: [item_id, ...]} with every
+        user present. Mongo keeps only each user's `limit` newest orders, so a
+        user with a long history costs no more to ship than a new one.
+        """
+        keys = [key for user_id in user_ids for key in _user_keys(user_id)]
+        history = {user_id: [] for user_id in user_ids}
+        self.queries += 1
+        with metrics.stage("mongo_history"):
+            cursor = self.collection.aggregate([
+                {"$match": {"userId": {"$in": keys}}},
+                # ObjectIds grow with insertion time, so this is newest order first.
+                {"$sort": {"_id": -1}},
+                {"$group": {"_id": "$userId", "orders": {"$push": "$items.itemId"}}},
+                {"$project": {"orders": {"$slice": ["$orders", self.limit]}}},
+            ])
+            async for doc in cursor:
+                items = history.get(str(doc["_id"]))
+                if items is None:
+                    continue
+                for order in doc["orders"]:
+                    for item_id in map(str, order):
+                        if item_id not in items:
+                            items.append(item_id)
+                    if len(items) >= self.limit:
+                        break
+                del items[self.limit:]
+        for user_id, items in history.items():
+            self.cache.put(user_id, items)
+        return history
+
+    async def recent_items(self, user_id):
+        user_id = str(user_id)
+        return (await self.recent_items_many([user_id]))[user_id]
+
+    async def recent_items_many(self, user_ids):
+        """{user_id: recent items} for a batch; cache misses share one `$in` query."""
+        result, missing = {}, []
+        for user_id in dict.fromkeys(str(u) for u in user_ids):
+            items = self.cache.get(user_id)
+            if items is None:
+                missing.append(user_id)
+            else:
+                result[user_id] = items
+        if missing:
+            result.update(await self._flight.do_many(missing, self._fetch))
+        return result
+
+    def invalidate(self, user_id=None):
+        """Drop cached history, e.g. after the user places an order."""
+        self.cache.invalidate(None if user_id is None else str(user_id))
+
+
+_history = None
+
+
+def get_purchase_history():
+    global _history
+    if _history is None:
+        with _client_lock:
+            if _history is None:
+                _history = PurchaseHistory()
+    return _history
@@ -1,13 +1,8 @@
-import pandas as pd
-import os
+"""Clean and encode the mock orders: `python -m ML.Data.process_for_model`."""
 
-RAW = os.path.join(os.path.dirname(__file__), "raw", "mock_canteen_orders.csv")
-OUT = os.path.join(os.path.dirname(__file__), "processed")
-os.makedirs(OUT, exist_ok=True)
-OUT_FN = os.path.join(OUT, "orders_clean.csv")
+from ML.Data.pipeline import print_report, run_pipeline
 
-df = pd.read_csv(RAW, parse_dates=["timestamp"])
-df = df.drop_duplicates(subset=["order_id"])
-df['quantity'] = df['quantity'].astype(int)
-df.to_csv(OUT_FN, index=False)
-print("Saved cleaned file to", OUT_FN)
+if __name__ == "__main__":
+    report = run_pipeline("orders")
+    print_report(report)
+    print("Saved cleaned file to", report["output"])
@@ -1,16 +1,16 @@
-import pandas as pd
-import os
-fn = os.path.join(os.path.dirname(__file__), "raw", "mock_canteen_orders.csv")
-df = pd.read_csv(fn, parse_dates=["timestamp"])
+"""Validate the mock orders: `python -m ML.Data.valiadate_data` (nothing is written)."""
 
-issues = []
-if df.isnull().any().any():
-    issues.append("Null values detected.")
-if not df['order_id'].is_unique:
-    issues.append("order_id not unique.")
-if (df['total_price'] <= 0).any():
-    issues.append("Non-positive total_price found.")
-if issues:
-    print("Validation issues:", issues)
-else:
-    print("Basic validation passed. Rows:", len(df))
+from ML.Data.pipeline import print_report, run_pipeline
+
+if __name__ == "__main__":
+    # Validation is the first stage of the shared pipeline; nothing is written.
+    report = run_pipeline("orders", validate_only=True)
+    print_report(report)
+
+    rows = report["rows"]
+    issues = [f"{key}: {rows[key]}" for key in ("null_rows", "out_of_range", "duplicates", "unknown_menu_item")
+              if rows.get(key)]
+    if issues:
+        print("Validation issues:", issues)
+    else:
+        print("Basic validation passed. Rows:", rows["rows_in"])
@@ -0,0 +1,56 @@
+"""
+Helpers for model/data artifacts shared by several worker processes.
+
+Writers take an exclusive file lock and publish with write-temp-then-rename,
+so a reader never sees a half-written file and concurrent workers never build
+the same artifact twice. Arrays are stored as plain .npy files so readers can
+memory-map them read-only and share the page cache instead of each holding a
+private copy.
+"""
+
+import fcntl
+import os
+import tempfile
+from contextlib import contextmanager
+
+import numpy as np
+
+
+@contextmanager
+def file_lock(path):
+    """Exclusive advisory lock on `<path>.lock`, held for the duration of the block."""
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    with open(f"{path}.lock", "w") as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock, fcntl.LOCK_UN)
+
+
+@contextmanager
+def atomic_write(path, mode="wb"):
+    """Yield a temp file next to `path` and rename it over `path` on success."""
+    directory = os.path.dirname(os.path.abspath(path))
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=f".{os.path.basename(path)}.")
+    try:
+        with os.fdopen(fd, mode) as f:
+            yield f
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+def save_array(path, array):
+    with atomic_write(path) as f:
+        np.save(f, np.ascontiguousarray(array), allow_pickle=False)
+
+
+def load_array(path, mmap=True):
+    """Read-only memory map by default; pages are shared between processes."""
+    return np.load(path, mmap_mode="r" if mmap else None, allow_pickle=False)
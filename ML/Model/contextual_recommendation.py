@@ -0,0 +1,149 @@
+import threading
+from datetime import datetime
+
+# Hours covered by each `time_of_day` label in the dataset
+# (Breakfast 8-10, Lunch 11-14, Snacks 15-17); anything outside is clamped.
+TIME_OF_DAY_BOUNDS = [(11, "Breakfast"), (15, "Lunch"), (24, "Snacks")]
+TIMES_OF_DAY = [label for _, label in TIME_OF_DAY_BOUNDS]
+DAYS_OF_WEEK = ["Monday", "Tuesday", "Wednesday", "Thursday", "Friday", "Saturday", "Sunday"]
+
+SECONDS_PER_DAY = 86400.0
+
+
+def time_of_day_for(hour):
+    for upper, label in TIME_OF_DAY_BOUNDS:
+        if hour < upper:
+            return label
+    return TIME_OF_DAY_BOUNDS[-1][1]
+
+
+def _norm(value):
+    return None if value is None else str(value).strip().lower()
+
+
+class ContextualPopularityRecommender:
+    """
+    Popularity ranked per (time_of_day x day_of_week x category) bucket.
+
+    Every bucket is precomputed into a ready-to-serve list of records, so a
+    request is a single dict lookup. Orders are weighted with an exponential
+    recency decay (half-life in days). Scores are kept relative to `self.t0`
+    so a new order only touches the buckets it falls into.
+    """
+
+    def __init__(self, half_life_days=7.0, bucket_size=25):
+        self.half_life_days = half_life_days
+        self.bucket_size = bucket_size
+        self.t0 = None
+        self.items = {}      # item_name -> {"item_name", "category", "price"}
+        self.scores = {}     # (tod, dow|None, cat|None) -> {item_name: score}
+        self.buckets = {}    # (tod, dow|None, cat|None) -> [record, ...]
+        self.version = 0     # bumped whenever any bucket changes
+        self.log_offset = 0  # bytes of the shared order journal folded in
+        self._lock = threading.Lock()
+
+    def _decay_since(self, when):
+        days = (when - self.t0).total_seconds() / SECONDS_PER_DAY
+        return 0.5 ** (days / self.half_life_days)
+
+    def fit(self, df, now=None):
+        """Build all buckets from the transaction frame in one groupby pass."""
+        self.t0 = now or datetime.now()
+
+        df = df[["item_name", "category", "price", "time_of_day",
+                 "day_of_week", "last_purchased_days_ago"]].copy()
+        df["item_name"] = df["item_name"].astype(str).str.strip()
+        df["weight"] = 0.5 ** (df["last_purchased_days_ago"].astype(float) / self.half_life_days)
+        df["tod"] = df["time_of_day"].astype(str).str.strip()
+        df["dow"] = df["day_of_week"].astype(str).str.strip()
+        df["cat"] = df["category"].astype(str).str.strip().str.lower()
+
+        item_info = df.drop_duplicates("item_name")[["item_name", "category", "price"]]
+        self.items = {
+            rec["item_name"].lower(): {
+                "item_name": rec["item_name"],
+                "category": rec["category"],
+                "price": float(rec["price"]),
+            }
+            for rec in item_info.to_dict(orient="records")
+        }
+
+        self.scores = {}
+        df["key_name"] = df["item_name"].str.lower()
+        for by_dow in (True, False):
+            for by_cat in (True, False):
+                cols = ["tod"] + (["dow"] if by_dow else []) + (["cat"] if by_cat else [])
+                grouped = df.groupby(cols + ["key_name"])["weight"].sum()
+                for idx, score in grouped.items():
+                    tod = idx[0]
+                    dow = idx[1] if by_dow else None
+                    cat = idx[-2] if by_cat else None
+                    self.scores.setdefault((tod, dow, cat), {})[idx[-1]] = float(score)
+
+        self.buckets = {}
+        for key in list(self.scores):
+            self._rebuild_bucket(key)
+        for tod, _, cat in list(self.scores):
+            for dow in DAYS_OF_WEEK:
+                if (tod, dow, cat) not in self.buckets:
+                    self._rebuild_bucket((tod, dow, cat))
+
+        self.version += 1
+        print(f"✅ Contextual popularity built: {len(self.buckets)} buckets")
+        return self
+
+    def _rebuild_bucket(self, key):
+        tod, dow, cat = key
+        ranked = sorted(self.scores.get(key, {}).items(), key=lambda kv: kv[1], reverse=True)
+
+        # Sparse day buckets are padded with the same slot's all-week ranking.
+        if dow is not None and len(ranked) < self.bucket_size:
+            seen = {name for name, _ in ranked}
+            fallback = sorted(self.scores.get((tod, None, cat), {}).items(),
+                              key=lambda kv: kv[1], reverse=True)
+            ranked += [(name, 0.0) for name, _ in fallback if name not in seen]
+
+        scale = self._decay_since(datetime.now())
+        self.buckets[key] = [
+            {**self.items[name], "score": round(score * scale, 4)}
+            for name, score in ranked[:self.bucket_size]
+        ]
+
+    def recommend(self, time_of_day, day_of_week=None, category=None, n=10):
+        return self.buckets.get((time_of_day, day_of_week, _norm(category)), [])[:n]
+
+    def recommend_now(self, now=None, category=None, n=10):
+        now = now or datetime.now()
+        return self.recommend(time_of_day_for(now.hour), DAYS_OF_WEEK[now.weekday()], category, n)
+
+    def add_order(self, item_name, when=None, category=None, price=None, quantity=1):
+        """Fold a single new order into the affected buckets."""
+        when = when or datetime.now()
+        if when.tzinfo is not None:
+            when = when.astimezone().replace(tzinfo=None)
+        name = _norm(item_name)
+
+        with self._lock:
+            if name not in self.items:
+                self.items[name] = {
+                    "item_name": str(item_name).strip(),
+                    "category": category or "Unknown",
+                    "price": float(price or 0),
+                }
+            cat = _norm(self.items[name]["category"])
+            tod = time_of_day_for(when.hour)
+            dow = DAYS_OF_WEEK[when.weekday()]
+
+            weight = quantity / self._decay_since(when)
+            touched = [(tod, dow, cat), (tod, dow, None), (tod, None, cat), (tod, None, None)]
+            for key in touched:
+                bucket = self.scores.setdefault(key, {})
+                bucket[name] = bucket.get(name, 0.0) + weight
+
+            # All-week scores pad every day bucket of the same slot.
+            to_rebuild = set(touched)
+            for c in (cat, None):
+                to_rebuild.update((tod, d, c) for d in DAYS_OF_WEEK)
+            for key in to_rebuild:
+                self._rebuild_bucket(key)
+            self.version += 1
@@ -0,0 +1,337 @@
+"""
+Offline evaluation: recommendation quality next to build and query cost.
+
+    python -m ML.Model.evaluation --k 5 10 --out eval.json
+    python -m ML.Model.evaluation --data orders.csv --scorers popularity hybrid
+
+Orders are split by time: everything before the cutoff (the
+1 - test_fraction quantile of `datetime`) trains every recommender, and the
+purchases after it are what each user is expected to buy. Users with no
+training history are counted but not scored, since nothing personal can be
+said about them.
+
+Each recommender is wrapped as a scorer: `fit(train, item_ids, catalog)`, then
+`score(user_ids)` returns a (users, items) score matrix for a batch of users. Top-k comes from one argpartition per batch, and
+the metrics are computed on the whole batch with array operations:
+
+- precision@k, recall@k, NDCG@k (binary relevance), averaged over users
+- hit_rate@k: share of users with at least one relevant item in the top-k
+- coverage@k: share of the catalog recommended to anyone
+
+Next to quality, each row reports the fit time, the peak Python-tracked
+memory while fitting (tracemalloc, which sees NumPy buffers), and the
+single-user query latency, so a faster index can be checked for lost
+quality.
+"""
+
+import argparse
+import json
+import statistics
+import time
+import tracemalloc
+
+import numpy as np
+import pandas as pd
+# Imported up front so first-use import time is not billed to a scorer's fit.
+import sklearn.metrics.pairwise  # noqa: F401
+import sklearn.preprocessing  # noqa: F401
+from scipy import sparse
+
+from ML.Model import hybrid_recommendation
+from ML.Model.general_recommendation import DATA_PATH
+from ML.Model.personalized_recommendation import build_user_item_matrix, user_similarity
+
+DEFAULT_KS = (5, 10)
+BATCH_SIZE = 512
+LATENCY_SAMPLES = 200
+
+
+def time_split(df, test_fraction=0.2, time_col="datetime"):
+    """(train, test, cutoff): rows before / at-or-after the time quantile."""
+    times = pd.to_datetime(df[time_col])
+    cutoff = times.quantile(1 - test_fraction)
+    return df[times < cutoff], df[times >= cutoff], cutoff
+
+
+def interaction_matrix(df, user_ids, item_ids):
+    """Boolean CSR (users, items) of who bought what; unknown ids are dropped."""
+    rows = pd.Index(user_ids).get_indexer(df["user_id"].astype(str))
+    cols = pd.Index(item_ids).get_indexer(df["item_id"].astype(str))
+    keep = (rows >= 0) & (cols >= 0)
+    matrix = sparse.csr_matrix((np.ones(keep.sum(), dtype=bool), (rows[keep], cols[keep])),
+                               shape=(len(user_ids), len(item_ids)))
+    matrix.sum_duplicates()
+    return matrix
+
+
+def top_k(scores, k):
+    """Row-wise indices of the k best scores, best first."""
+    k = min(k, scores.shape[1])
+    part = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+    order = np.argsort(-np.take_along_axis(scores, part, axis=1), axis=1, kind="stable")
+    return np.take_along_axis(part, order, axis=1)
+
+
+def ranking_metrics(top, relevant):
+    """
+    Per-user precision, recall, NDCG and hit for one batch.
+
+    `top` is (users, k) item indices; `relevant` a dense (users, items) bool.
+    """
+    k = top.shape[1]
+    hits = np.take_along_axis(relevant, top, axis=1)
+    n_relevant = relevant.sum(axis=1)
+    discounts = 1.0 / np.log2(np.arange(2, k + 2))
+    dcg = hits @ discounts
+    ideal = np.concatenate([[0.0], np.cumsum(discounts)])[np.minimum(n_relevant, k)]
+    n_hits = hits.sum(axis=1)
+    return {
+        "precision": n_hits / k,
+        "recall": n_hits / np.maximum(n_relevant, 1),
+        "ndcg": dcg / np.where(ideal > 0, ideal, 1.0),
+        "hit_rate": (n_hits > 0).astype(np.float64),
+    }
+
+
+# ---------- scorers: fit on the training orders, score batches of users ----------
+
+class PopularityScorer:
+    """Training-period order counts, the same ranking for every user."""
+
+    name = "popularity"
+
+    def fit(self, train, item_ids, catalog=None):
+        counts = train["item_id"].astype(str).value_counts().reindex(item_ids, fill_value=0)
+        self.scores = counts.to_numpy(dtype=np.float32)
+        return self
+
+    def score(self, user_ids):
+        return np.broadcast_to(self.scores, (len(user_ids), len(self.scores)))
+
+
+class HybridScorer:
+    """PersonalizedHybridRecommender with fixed weights (one source or a blend)."""
+
+    def __init__(self, name, weights=None):
+        self.name = name
+        self.weights = weights
+
+    def fit(self, train, item_ids, catalog=None):
+        # The catalog comes from all rows so items first sold in the test period
+        # still have features; only training orders feed the interactions.
+        catalog = train if catalog is None else catalog
+        orders = train[["user_id", "item_id"]].astype(str).assign(rating=1.0)
+        users = pd.DataFrame({"user_id": orders["user_id"].unique()})
+        items = (catalog.groupby("item_id", observed=True, sort=False)
+                 .agg(item_name=("item_name", "first"), category=("category", "first"),
+                      spicy_level=("spicy_level", "first"), price=("price", "first"),
+                      calories=("calories", "first"))
+                 .reset_index())
+        # Popularity from training rows only: no peeking at test-period totals.
+        items["popularity_score"] = (train.groupby("item_id", observed=True)["popularity_score"].mean()
+                                     .reindex(items["item_id"], fill_value=0.0).to_numpy())
+        items["purchase_count"] = (orders["item_id"].value_counts()
+                                   .reindex(items["item_id"].astype(str), fill_value=0).to_numpy())
+        self.model = hybrid_recommendation.PersonalizedHybridRecommender(weights=self.weights)
+        self.model.train(users, items, orders)
+        self.columns = pd.Index(self.model.item_ids).get_indexer(item_ids)
+        return self
+
+    def score(self, user_ids):
+        scores = self.model.score_users(user_ids)
+        aligned = np.full((len(user_ids), len(self.columns)), -np.inf, dtype=np.float32)
+        present = self.columns >= 0
+        aligned[:, present] = scores[:, self.columns[present]]
+        return aligned
+
+
+class UserCFScorer:
+    """
+    PersonalizedRecommender's model: dense user-user cosine over the pivot
+    table; a user's score is the mean purchase row of their nearest users.
+    """
+
+    name = "user_cf"
+
+    def __init__(self, neighbors=5):
+        self.neighbors = neighbors
+
+    def fit(self, train, item_ids, catalog=None):
+        frame = pd.DataFrame({"userId": train["user_id"].astype(str),
+                              "itemId": train["item_id"].astype(str), "amount": 1.0})
+        matrix = build_user_item_matrix(frame)
+        similarity = user_similarity(matrix)
+        self.rows = {u: i for i, u in enumerate(matrix.index)}
+        self.purchases = matrix.reindex(columns=item_ids, fill_value=0).to_numpy(dtype=np.float32)
+        self.similarity = similarity.to_numpy(dtype=np.float32)
+        return self
+
+    def score(self, user_ids):
+        rows = np.array([self.rows.get(str(u), -1) for u in user_ids])
+        scores = np.zeros((len(rows), self.purchases.shape[1]), dtype=np.float32)
+        known = rows >= 0
+        if known.any():
+            sims = self.similarity[rows[known]].copy()
+            sims[np.arange(len(sims)), rows[known]] = -np.inf
+            k = min(self.neighbors, sims.shape[1] - 1)
+            if k > 0:
+                nearest = np.argpartition(-sims, k - 1, axis=1)[:, :k]
+                scores[known] = self.purchases[nearest].mean(axis=1)
+        return scores
+
+
+def default_scorers():
+    return [
+        PopularityScorer(),
+        UserCFScorer(),
+        HybridScorer("content", {"content": 1, "collaborative": 0, "popularity": 0}),
+        HybridScorer("collaborative", {"content": 0, "collaborative": 1, "popularity": 0}),
+        HybridScorer("hybrid"),
+    ]
+
+
+def _fit(scorer, train, item_ids, catalog):
+    """Fit time from an untraced fit; peak memory from a second fit under tracemalloc."""
+    t0 = time.perf_counter()
+    scorer.fit(train, item_ids, catalog=catalog)
+    fit_s = time.perf_counter() - t0
+
+    tracemalloc.start()
+    try:
+        scorer.fit(train, item_ids, catalog=catalog)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return fit_s, peak
+
+
+def _latency(scorer, user_ids, samples):
+    times = []
+    for user in user_ids[:samples]:
+        t0 = time.perf_counter()
+        scores = scorer.score([user])
+        top_k(np.asarray(scores), 10)
+        times.append(time.perf_counter() - t0)
+    ordered = sorted(t * 1000 for t in times)
+    return statistics.median(ordered), ordered[max(int(len(ordered) * 0.95) - 1, 0)]
+
+
+def evaluate(df, scorers=None, ks=DEFAULT_KS, test_fraction=0.2, exclude_seen=False,
+             batch_size=BATCH_SIZE, latency_samples=LATENCY_SAMPLES):
+    """
+    Fit every scorer on the training period and score it on the test period.
+
+    With `exclude_seen`, items a user bought before the cutoff are neither
+    recommended nor counted as relevant (discovery); by default repeat
+    purchases count, which is how a canteen is mostly used.
+    Returns (rows, split_info).
+    """
+    scorers = default_scorers() if scorers is None else scorers
+    df = df.assign(user_id=df["user_id"].astype(str), item_id=df["item_id"].astype(str))
+    train, test, cutoff = time_split(df, test_fraction)
+
+    item_ids = pd.Index(df["item_id"].unique()).sort_values()
+    train_users = set(train["user_id"])
+    test_users = pd.Index(test["user_id"].unique())
+    eval_users = [u for u in test_users if u in train_users]
+
+    relevant_all = interaction_matrix(test, eval_users, item_ids)
+    seen_all = interaction_matrix(train, eval_users, item_ids)
+    if exclude_seen:
+        relevant_all = relevant_all - relevant_all.multiply(seen_all)
+    has_relevant = np.asarray(relevant_all.sum(axis=1)).ravel() > 0
+    eval_users = [u for u, keep in zip(eval_users, has_relevant) if keep]
+    relevant_all = relevant_all[has_relevant]
+    seen_all = seen_all[has_relevant]
+
+    info = {
+        "cutoff": str(cutoff),
+        "train_orders": len(train),
+        "test_orders": len(test),
+        "items": len(item_ids),
+        "evaluated_users": len(eval_users),
+        "cold_test_users": int(len(test_users) - sum(u in train_users for u in test_users)),
+        "exclude_seen": exclude_seen,
+    }
+
+    rows = []
+    max_k = max(ks)
+    for scorer in scorers:
+        fit_s, peak = _fit(scorer, train, item_ids, df)
+
+        sums = {k: {} for k in ks}
+        recommended = {k: np.zeros(len(item_ids), dtype=bool) for k in ks}
+        t0 = time.perf_counter()
+        for start in range(0, len(eval_users), batch_size):
+            batch = eval_users[start:start + batch_size]
+            scores = np.array(scorer.score(batch), dtype=np.float32)
+            if exclude_seen:
+                scores[seen_all[start:start + batch_size].toarray()] = -np.inf
+            top = top_k(scores, max_k)
+            # -inf picks (seen or unscored items) fill out short rankings; they
+            # were not really recommended, so they do not count as coverage.
+            finite = np.isfinite(np.take_along_axis(scores, top, axis=1))
+            relevant = relevant_all[start:start + batch_size].toarray()
+            for k in ks:
+                for metric, values in ranking_metrics(top[:, :k], relevant).items():
+                    sums[k][metric] = sums[k].get(metric, 0.0) + float(values.sum())
+                recommended[k][top[:, :k][finite[:, :k]]] = True
+        score_s = time.perf_counter() - t0
+
+        latency_ms, latency_p95_ms = _latency(scorer, eval_users, latency_samples)
+        row = {
+            "scorer": scorer.name,
+            "fit_s": round(fit_s, 4),
+            "fit_peak_mb": round(peak / 2**20, 2),
+            "batch_score_s": round(score_s, 4),
+            "query_ms": round(latency_ms, 4),
+            "query_p95_ms": round(latency_p95_ms, 4),
+        }
+        n = max(len(eval_users), 1)
+        for k in ks:
+            for metric, total in sums[k].items():
+                row[f"{metric}@{k}"] = round(total / n, 4)
+            row[f"coverage@{k}"] = round(recommended[k].mean(), 4)
+        rows.append(row)
+    return rows, info
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--data", default=DATA_PATH,
+                        help="orders CSV with user_id, item_id, datetime and item columns")
+    parser.add_argument("--k", type=int, nargs="+", default=list(DEFAULT_KS))
+    parser.add_argument("--test-fraction", type=float, default=0.2)
+    parser.add_argument("--exclude-seen", action="store_true",
+                        help="score only items the user had not bought before the cutoff")
+    parser.add_argument("--scorers", nargs="*", default=None,
+                        help="subset of: popularity user_cf content collaborative hybrid")
+    parser.add_argument("--out", default=None, help="write the report as JSON")
+    args = parser.parse_args()
+
+    scorers = default_scorers()
+    if args.scorers:
+        scorers = [s for s in scorers if s.name in args.scorers]
+
+    df = pd.read_csv(args.data)
+    rows, info = evaluate(df, scorers, ks=args.k, test_fraction=args.test_fraction,
+                          exclude_seen=args.exclude_seen)
+
+    print(f"split at {info['cutoff']}: {info['train_orders']} train / {info['test_orders']} test orders, "
+          f"{info['evaluated_users']} users evaluated ({info['cold_test_users']} cold), "
+          f"{info['items']} items")
+    for k in args.k:
+        print(f"\n{'scorer':<14}{'P@' + str(k):>8}{'R@' + str(k):>8}{'NDCG@' + str(k):>9}"
+              f"{'hit@' + str(k):>8}{'cov@' + str(k):>8}{'fit s':>9}{'fit MB':>9}{'query ms':>10}")
+        for row in rows:
+            print(f"{row['scorer']:<14}{row[f'precision@{k}']:>8.4f}{row[f'recall@{k}']:>8.4f}"
+                  f"{row[f'ndcg@{k}']:>9.4f}{row[f'hit_rate@{k}']:>8.4f}{row[f'coverage@{k}']:>8.4f}"
+                  f"{row['fit_s']:>9.3f}{row['fit_peak_mb']:>9.1f}{row['query_ms']:>10.3f}")
+
+    if args.out:
+        with open(args.out, "w") as f:
+            json.dump({"split": info, "results": rows}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,99 @@
+import json
+
+import numpy as np
+import pandas as pd
+
+SPICY_LEVELS = ["Mild", "Medium", "Spicy"]
+
+
+class ItemFeatureTransformer:
+    """
+    Fitted item-feature encoder for the content-based recommender.
+
+    Nominal columns are one-hot encoded, ordered columns are mapped to their
+    rank scaled into [0, 1], and numeric columns are min-max scaled with the
+    bounds stored at fit time. Once fitted it can encode new items without
+    refitting, and round-trips through a plain JSON dict.
+    """
+
+    def __init__(self, one_hot=("category",), ordinal=None,
+                 numeric=("price", "calories", "popularity_score")):
+        self.one_hot = list(one_hot)
+        self.ordinal = dict(ordinal) if ordinal is not None else {"spicy_level": SPICY_LEVELS}
+        self.numeric = list(numeric)
+        self.categories_ = {}
+        self.mins_ = {}
+        self.maxs_ = {}
+
+    @property
+    def feature_names_(self):
+        names = []
+        for col in self.one_hot:
+            names += [f"{col}={value}" for value in self.categories_[col]]
+        names += list(self.ordinal)
+        names += self.numeric
+        return names
+
+    def fit(self, items):
+        for col in self.one_hot:
+            self.categories_[col] = sorted(items[col].dropna().astype(str).str.strip().unique())
+        for col in self.numeric:
+            values = items[col].astype(np.float64)
+            self.mins_[col] = float(values.min())
+            self.maxs_[col] = float(values.max())
+        return self
+
+    def transform(self, items):
+        blocks = []
+
+        for col in self.one_hot:
+            # Unseen values get an all-zero row instead of a new column.
+            codes = pd.Categorical(items[col].astype(str).str.strip(),
+                                   categories=self.categories_[col]).codes
+            eye = np.vstack([np.eye(len(self.categories_[col]), dtype=np.float32),
+                             np.zeros((1, len(self.categories_[col])), dtype=np.float32)])
+            blocks.append(eye[codes])
+
+        for col, levels in self.ordinal.items():
+            codes = pd.Categorical(items[col].astype(str).str.strip(), categories=levels).codes
+            scaled = np.where(codes >= 0, codes / max(len(levels) - 1, 1), 0.0)
+            blocks.append(scaled.astype(np.float32)[:, None])
+
+        if self.numeric:
+            values = items[self.numeric].to_numpy(dtype=np.float64)
+            mins = np.array([self.mins_[c] for c in self.numeric])
+            spans = np.array([self.maxs_[c] - self.mins_[c] for c in self.numeric])
+            spans[spans == 0] = 1.0
+            blocks.append(((values - mins) / spans).astype(np.float32))
+
+        return np.hstack(blocks) if blocks else np.empty((len(items), 0), dtype=np.float32)
+
+    def fit_transform(self, items):
+        return self.fit(items).transform(items)
+
+    def to_dict(self):
+        return {
+            "one_hot": self.one_hot,
+            "ordinal": self.ordinal,
+            "numeric": self.numeric,
+            "categories": self.categories_,
+            "mins": self.mins_,
+            "maxs": self.maxs_,
+        }
+
+    @classmethod
+    def from_dict(cls, state):
+        transformer = cls(state["one_hot"], state["ordinal"], state["numeric"])
+        transformer.categories_ = state["categories"]
+        transformer.mins_ = state["mins"]
+        transformer.maxs_ = state["maxs"]
+        return transformer
+
+    def save(self, path):
+        with open(path, "w") as f:
+            json.dump(self.to_dict(), f)
+
+    @classmethod
+    def load(cls, path):
+        with open(path) as f:
+            return cls.from_dict(json.load(f))
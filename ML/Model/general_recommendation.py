@@ -1,95 +1,139 @@
 
 
+import json
 import pandas as pd
-from sklearn.preprocessing import LabelEncoder, MinMaxScaler
-from sklearn.metrics.pairwise import cosine_similarity
 import pickle
 import os
 
+from ML import metrics
+from ML.Data import columnar_cache
+from ML.Model import popularity
+from ML.Model.artifacts import atomic_write, file_lock, load_array, save_array
+from ML.Model.feature_transformer import ItemFeatureTransformer
+from ML.Model.neighbors import build_index, load_index, resolve_backend
+
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 DATA_PATH = os.path.join(BASE_DIR, "Data", "raw", "canteen_recommendation_dataset.csv")
 
-print("📁 BASE_DIR:", BASE_DIR)
-print("📁 DATA_PATH:", DATA_PATH)
-print("📁 Exists?", os.path.exists(DATA_PATH))
-
-if not os.path.exists(DATA_PATH):
-    raise FileNotFoundError(f"Dataset not found at {DATA_PATH}")
+# Up to this many items the full item x item matrix is precomputed (fastest
+# lookups); above it, "auto" switches to a neighbour index (ML.Model.neighbors).
+MATRIX_MAX_ITEMS = 5_000
 
 
-df_raw = pd.read_csv(DATA_PATH)
 class ContentBasedRecommender:
-    def __init__(self, data_path="data/canteen_recommendation_dataset.csv"):
-       
+    def __init__(self, data_path="data/canteen_recommendation_dataset.csv", neighbor_backend="matrix"):
+        """
+        `neighbor_backend` picks how similar items are found: "matrix" (all
+        pairs precomputed with cosine_similarity, O(N^2) memory), "exact" or
+        "lsh" (see ML.Model.neighbors), or "auto" to choose by catalogue size.
+        """
         self.data_path = data_path
-        self.df = pd.read_csv(data_path)
+        # Shared frame from the columnar cache: never mutate it.
+        self.df = columnar_cache.load_csv(data_path)
+        self.neighbor_backend = neighbor_backend
         self.similarity_df = None
-
-        if "item_name" in self.df.columns:
-            self.df["item_name"] = (
-                self.df["item_name"]
-                .astype(str)
-                .str.strip()
-                .str.lower()
-            )
+        self.neighbor_index = None
+        self.index_ids = None
+        self.transformer = None
+        self._items = None
+        self._index_positions = None
+
+    def item_table(self):
+        """One row per item_id (lower-cased names) with the columns the features need."""
+        if self._items is None:
+            items = self.df.drop_duplicates(subset="item_id").copy()
+            items["item_name"] = items["item_name"].astype(str).str.strip().str.lower()
+            items["category"] = items["category"].astype(str)
+            self._items = items.reset_index(drop=True)
+        return self._items
 
     def preprocess_data(self):
         
-        df = self.df.copy()
+        items = self.item_table()
+        if self.transformer is None:
+            self.transformer = ItemFeatureTransformer().fit(items)
 
-        df['item_name'] = df['item_name'].astype(str).str.strip().str.lower()
-        le = LabelEncoder()
-        df['category_enc'] = le.fit_transform(df['category'])
-        df['spicy_enc'] = le.fit_transform(df['spicy_level'])
-
-        
-        features = df[['item_id', 'category_enc', 'price', 'calories', 'spicy_enc', 'popularity_score']]
-        features = features.drop_duplicates(subset='item_id').set_index('item_id')
-
-        
-        scaler = MinMaxScaler()
         features_scaled = pd.DataFrame(
-            scaler.fit_transform(features),
-            index=features.index,
-            columns=features.columns
+            self.transformer.transform(items),
+            index=pd.Index(items["item_id"].to_numpy(), name="item_id"),
+            columns=self.transformer.feature_names_
         )
-        self.df = df 
         self.features_scaled = features_scaled
         return features_scaled
 
+    def transform_items(self, items):
+        """Encode new item rows with the already-fitted transformer."""
+        if self.transformer is None:
+            self.preprocess_data()
+        return self.transformer.transform(items)
+
     def build_similarity_matrix(self):
-        
+        from sklearn.metrics.pairwise import cosine_similarity
+
         features_scaled = self.preprocess_data()
-        similarity_matrix = cosine_similarity(features_scaled)
+        with metrics.stage("similarity_build"):
+            similarity_matrix = cosine_similarity(features_scaled)
         self.similarity_df = pd.DataFrame(similarity_matrix, index=features_scaled.index, columns=features_scaled.index)
         return self.similarity_df
 
+    def resolved_backend(self):
+        if self.neighbor_backend == "matrix":
+            return "matrix"
+        n_items = len(self.item_table())
+        if self.neighbor_backend == "auto" and n_items <= MATRIX_MAX_ITEMS:
+            return "matrix"
+        return resolve_backend(n_items, self.neighbor_backend)
+
+    def build_neighbor_index(self):
+        features_scaled = self.preprocess_data()
+        with metrics.stage("similarity_build"):
+            self.neighbor_index = build_index(features_scaled.to_numpy(), self.resolved_backend())
+        self.index_ids = features_scaled.index.to_numpy()
+        self._index_positions = None
+        return self.neighbor_index
+
+    def _similar_ids(self, item_id, n):
+        """Ids of the n items most similar to `item_id`, best first."""
+        if self.neighbor_index is not None:
+            if self._index_positions is None:
+                self._index_positions = pd.Index(self.index_ids)
+            if item_id not in self._index_positions:
+                raise ValueError(f"Item '{item_id}' is not in the similarity index.")
+            with metrics.stage("similarity_lookup"):
+                positions, _ = self.neighbor_index.query_item(self._index_positions.get_loc(item_id), n)
+            return self.index_ids[positions]
+
+        if item_id not in self.similarity_df.columns:
+            raise ValueError(f"Item '{item_id}' is not in the similarity model.")
+        with metrics.stage("similarity_lookup"):
+            similar_items = self.similarity_df[item_id].drop(item_id, errors="ignore")
+            return similar_items.nlargest(n).index
+
     def recommend_items(self, item_name, n=5):
     
-        if self.similarity_df is None:
-            self.build_similarity_matrix()
+        if self.similarity_df is None and self.neighbor_index is None:
+            if self.resolved_backend() == "matrix":
+                self.build_similarity_matrix()
+            else:
+                self.build_neighbor_index()
 
         
-        self.df['item_name'] = self.df['item_name'].astype(str)
-
-   
+        items = self.item_table()
         item_name = str(item_name).strip().lower()
 
     
-        matched_rows = self.df[self.df['item_name'].str.lower() == item_name]
+        matched_rows = items[items['item_name'] == item_name]
         if matched_rows.empty:
             raise ValueError(f"Item '{item_name}' not found in dataset.")
 
         item_id = matched_rows['item_id'].values[0]
 
     
-        similar_items = self.similarity_df[item_id].sort_values(ascending=False)[1:n+1]
-        recommended_ids = similar_items.index
+        recommended_ids = self._similar_ids(item_id, n)
 
    
         recommendations = (
-        self.df[self.df['item_id'].isin(recommended_ids)][['item_name', 'category', 'price']]
-        .drop_duplicates()
+        items.set_index('item_id').loc[recommended_ids, ['item_name', 'category', 'price']]
         .reset_index(drop=True)
     )
 
@@ -97,52 +141,119 @@ class ContentBasedRecommender:
 
 
     def get_popular_items(self, n=10):
-    
-        popular = (
-        self.df.groupby("item_id")
-        .agg({"purchase_count": "sum", "popularity_score": "mean"})
-        .sort_values(by=["purchase_count", "popularity_score"], ascending=False)
-        .head(n)
-        .reset_index()
-    )
-
-    
-        df_raw = pd.read_csv(self.data_path)
-
-
-    
-        item_info = df_raw[["item_id", "item_name", "category", "price"]].drop_duplicates()
-        popular = popular.merge(item_info, on="item_id", how="left")
-
-    
-        popular = popular.fillna({
-        "item_name": "Unknown Item",
-        "category": "Unknown",
-        "price": 0,
-        "popularity_score": 0,
-        "purchase_count": 0
-    })
-
-    
-        popular["popularity_score"] = popular["popularity_score"].round(2)
-        popular["price"] = popular["price"].round(2)
-
-    
-        return popular[["item_name", "purchase_count", "popularity_score", "category", "price"]]
-
-
-
-
+        """Most ordered items, from the precomputed popularity artifact (ML.Model.popularity)."""
+        records = popularity.get_popularity(self.data_path).top(n)
+        return pd.DataFrame(records, columns=["item_name", "purchase_count", "popularity_score",
+                                              "category", "price"])
 
     def save_model(self, path='Model/item_similarity.pkl'):
-        
-        os.makedirs("Model", exist_ok=True)
+        """
+        Save the similarity matrix. A `.npy` path writes the matrix plus a
+        `<stem>.ids.npy` index that workers can memory-map; anything else
+        is the legacy pickled DataFrame. Files are replaced atomically.
+        """
         if self.similarity_df is None:
             self.build_similarity_matrix()
-        with open(path, 'wb') as f:
-            pickle.dump(self.similarity_df, f)
+        # Sidecars first: readers treat the main file appearing as "ready".
+        if self.transformer is not None:
+            with atomic_write(self._transformer_path(path), "w") as f:
+                json.dump(self.transformer.to_dict(), f)
+        if path.endswith(".npy"):
+            save_array(self._ids_path(path), self.similarity_df.index.to_numpy())
+            save_array(path, self.similarity_df.to_numpy())
+        else:
+            with atomic_write(path) as f:
+                pickle.dump(self.similarity_df, f)
 
     def load_model(self, path='Model/item_similarity.pkl'):
         
-        with open(path, 'rb') as f:
-            self.similarity_df = pickle.load(f)
+        if path.endswith(".npy"):
+            # Read-only mmap: worker processes share these pages.
+            ids = load_array(self._ids_path(path), mmap=False)
+            matrix = load_array(path)
+            self.similarity_df = pd.DataFrame(matrix, index=ids, columns=ids, copy=False)
+        else:
+            with open(path, 'rb') as f:
+                self.similarity_df = pickle.load(f)
+        if os.path.exists(self._transformer_path(path)):
+            self.transformer = ItemFeatureTransformer.load(self._transformer_path(path))
+
+    def save_index(self, path):
+        """Persist the neighbour index as `<stem>.<backend>.npz` plus the usual sidecars."""
+        if self.neighbor_index is None:
+            self.build_neighbor_index()
+        with atomic_write(self._transformer_path(path), "w") as f:
+            json.dump(self.transformer.to_dict(), f)
+        save_array(self._ids_path(path), self.index_ids)
+        self.neighbor_index.save(self._index_path(path, self.neighbor_index.kind))
+
+    def load_index(self, path):
+        self.neighbor_index = load_index(self._index_path(path, self.resolved_backend()))
+        self.index_ids = load_array(self._ids_path(path), mmap=False)
+        self._index_positions = None
+        if os.path.exists(self._transformer_path(path)):
+            self.transformer = ItemFeatureTransformer.load(self._transformer_path(path))
+
+    def source_meta(self):
+        """What the saved model was built from; a mismatch means it is stale."""
+        return {
+            "source": os.path.abspath(self.data_path),
+            "data_version": columnar_cache.data_version(self.data_path),
+            "rows": len(self.df),
+        }
+
+    def _is_current(self, target):
+        try:
+            with open(self._meta_path(target)) as f:
+                return json.load(f) == self.source_meta()
+        except (FileNotFoundError, ValueError):
+            return False
+
+    def load_or_build(self, path):
+        """
+        Load the saved model, building it first under a file lock if it is
+        missing or was built from another version of the dataset.
+
+        With a neighbour-index backend the index is stored next to `path`
+        (see `_index_path`) instead of the all-pairs matrix.
+        """
+        backend = self.resolved_backend()
+        target = path if backend == "matrix" else self._index_path(path, backend)
+        if not self._is_current(target):
+            with file_lock(path):
+                # Another worker may have built it while we waited for the lock.
+                if not self._is_current(target):
+                    if os.path.exists(target):
+                        print("⚠️ Saved model was built from another dataset version. Rebuilding...")
+                    else:
+                        print("⚠️ No pre-trained model found. Building new one...")
+                    if backend == "matrix":
+                        self.build_similarity_matrix()
+                        self.save_model(path)
+                    else:
+                        self.build_neighbor_index()
+                        self.save_index(path)
+                    # Written last: it marks the files above as current.
+                    with atomic_write(self._meta_path(target), "w") as f:
+                        json.dump(self.source_meta(), f)
+        if backend == "matrix":
+            self.load_model(path)
+        else:
+            self.load_index(path)
+        return self
+
+    @staticmethod
+    def _index_path(path, backend):
+        return f"{os.path.splitext(path)[0]}.{backend}.npz"
+
+    @staticmethod
+    def _transformer_path(path):
+        return os.path.splitext(path)[0] + ".features.json"
+
+    @staticmethod
+    def _meta_path(target):
+        return os.path.splitext(target)[0] + ".meta.json"
+
+    @staticmethod
+    def _ids_path(path):
+        return os.path.splitext(path)[0] + ".ids.npy"
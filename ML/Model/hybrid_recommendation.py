@@ -0,0 +1,395 @@
+import os
+
+import numpy as np
+import pandas as pd
+
+from ML import metrics
+from ML.Model.artifacts import atomic_write
+from ML.Model.feature_transformer import SPICY_LEVELS, ItemFeatureTransformer
+
+MODEL_PATH = "ML/Model/hybrid_model.npz"
+
+SOURCES = ("content", "collaborative", "popularity")
+DEFAULT_WEIGHTS = {"content": 0.4, "collaborative": 0.4, "popularity": 0.2}
+
+# Nearest users kept per user for the collaborative score.
+NEIGHBORS = 20
+# Top items taken from each source before blending.
+CANDIDATES = 200
+# Users scored against each other per block while training.
+SIMILARITY_BLOCK = 1024
+
+
+def _minmax(values):
+    values = np.asarray(values, dtype=np.float32)
+    span = values.max() - values.min() if len(values) else 0.0
+    if span == 0:
+        return np.zeros_like(values)
+    return (values - values.min()) / span
+
+
+def _l2_rows(matrix):
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return (matrix / norms).astype(np.float32)
+
+
+def _top_k(scores, k):
+    """Indices of the k largest scores, unordered (partial selection)."""
+    if k <= 0:
+        return np.empty(0, dtype=np.intp)
+    if k >= len(scores):
+        return np.arange(len(scores))
+    return np.argpartition(scores, -k)[-k:]
+
+
+def resolve_weights(weights=None):
+    """Merge `weights` over DEFAULT_WEIGHTS into an array ordered like SOURCES."""
+    merged = dict(DEFAULT_WEIGHTS)
+    for source, weight in (weights or {}).items():
+        if source not in SOURCES:
+            raise ValueError(f"Unknown score source '{source}'; expected one of {SOURCES}")
+        if weight < 0:
+            raise ValueError(f"Weight for '{source}' must not be negative")
+        merged[source] = float(weight)
+    return np.array([merged[s] for s in SOURCES], dtype=np.float32)
+
+
+class PersonalizedHybridRecommender:
+    """
+    Blends content, collaborative and popularity scores per user.
+
+    Everything is aligned on one item axis, so a request is a few vector ops:
+
+    - content: cosine between each item's feature vector and the user's
+      profile (mean of the items they bought, plus optional seed items)
+    - collaborative: purchases of the user's NEIGHBORS most similar users,
+      weighted by similarity (neighbors are found once, at training time)
+    - popularity: purchase_count / popularity_score, min-max scaled
+
+    Each source contributes its top CANDIDATES items. Only that union is
+    blended and ranked, and the top-N is picked with argpartition. Sources
+    with nothing to say (a new user has no history or neighbors) drop out,
+    and the remaining weights are rescaled.
+    """
+
+    def __init__(self, model_path=MODEL_PATH, weights=None,
+                 neighbors=NEIGHBORS, candidates=CANDIDATES):
+        self.model_path = model_path
+        self.weights = resolve_weights(weights)
+        self.neighbors = neighbors
+        self.candidates = candidates
+        self.item_ids = None
+        self.item_names = None
+        self.features = None         # items x features, L2-normalized rows
+        self.popularity = None       # items, in [0, 1]
+        self.user_ids = None
+        self.user_index = {}
+        self.interactions = None     # users x items, CSR
+        self.neighbor_idx = None     # users x NEIGHBORS
+        self.neighbor_sim = None     # users x NEIGHBORS
+        self._item_index = None
+        self._popular_candidates = None
+
+    # ---------- training ----------
+
+    def train(self, users_df, items_df, orders_df):
+        """
+        Fit from Mongo-shaped frames.
+
+        `items_df` has one row per item (`item_id` or `_id`, plus whichever of
+        item_name/name, category, spicy_level, price, calories,
+        popularity_score and purchase_count exist); `orders_df` has user_id,
+        item_id and an optional `rating` used as the interaction weight.
+        Users in `users_df` without orders are kept so they get the cold-start
+        blend instead of a lookup error.
+        """
+        from scipy import sparse
+
+        items = items_df.copy()
+        if "item_id" not in items.columns:
+            items["item_id"] = items["_id"]
+        items["item_id"] = items["item_id"].astype(str)
+        items = items.drop_duplicates(subset="item_id").reset_index(drop=True)
+        if "item_name" not in items.columns:
+            items["item_name"] = items["name"] if "name" in items.columns else items["item_id"]
+
+        self.item_ids = items["item_id"].to_numpy(dtype=str)
+        self.item_names = items["item_name"].astype(str).to_numpy(dtype=str)
+        self._item_index = None
+        self._popular_candidates = None
+
+        with metrics.stage("hybrid_train"):
+            self.features = self._item_features(items)
+            self.popularity = self._popularity(items, orders_df)
+            self.interactions = self._interactions(users_df, orders_df, sparse)
+            self.neighbor_idx, self.neighbor_sim = self._nearest_users()
+
+        print(f"✅ Hybrid model trained: {len(self.user_ids)} users x {len(self.item_ids)} items")
+        return self
+
+    @classmethod
+    def from_dataset(cls, df, model_path=MODEL_PATH, **kwargs):
+        """Train from the canteen dataset CSV: every row is one purchase."""
+        items = (
+            df.groupby("item_id", observed=True, sort=False)
+            .agg(item_name=("item_name", "first"), category=("category", "first"),
+                 spicy_level=("spicy_level", "first"), price=("price", "first"),
+                 calories=("calories", "first"), popularity_score=("popularity_score", "mean"),
+                 purchase_count=("purchase_count", "sum"))
+            .reset_index()
+        )
+        orders = df[["user_id", "item_id"]].astype(str).assign(rating=1.0)
+        users = pd.DataFrame({"user_id": orders["user_id"].unique()})
+        return cls(model_path=model_path, **kwargs).train(users, items, orders)
+
+    def _item_features(self, items):
+        one_hot = [c for c in ("category",) if c in items.columns]
+        ordinal = {"spicy_level": SPICY_LEVELS} if "spicy_level" in items.columns else {}
+        numeric = [c for c in ("price", "calories") if c in items.columns]
+        items = items.fillna({c: 0 for c in numeric})
+        transformer = ItemFeatureTransformer(one_hot, ordinal, numeric).fit(items)
+        return _l2_rows(transformer.transform(items))
+
+    def _popularity(self, items, orders_df):
+        parts = [_minmax(items[c].fillna(0).to_numpy(dtype=np.float64))
+                 for c in ("purchase_count", "popularity_score") if c in items.columns]
+        if not parts:
+            counts = (orders_df["item_id"].astype(str).value_counts()
+                      .reindex(self.item_ids, fill_value=0))
+            parts = [_minmax(counts.to_numpy(dtype=np.float64))]
+        return np.mean(parts, axis=0).astype(np.float32)
+
+    def _interactions(self, users_df, orders_df, sparse):
+        orders = orders_df.assign(user_id=orders_df["user_id"].astype(str),
+                                  item_id=orders_df["item_id"].astype(str))
+        known_users = users_df["user_id"] if "user_id" in users_df.columns else users_df.get("_id")
+        user_ids = pd.Index(orders["user_id"].unique())
+        if known_users is not None:
+            user_ids = user_ids.append(pd.Index(known_users.astype(str))).unique()
+        self.user_ids = user_ids.to_numpy(dtype=str)
+        self.user_index = {u: i for i, u in enumerate(self.user_ids)}
+
+        item_pos = pd.Index(self.item_ids).get_indexer(orders["item_id"])
+        keep = item_pos >= 0    # orders of items no longer in the catalog
+        rows = user_ids.get_indexer(orders["user_id"][keep])
+        values = (orders["rating"].to_numpy(dtype=np.float32)[keep]
+                  if "rating" in orders.columns else np.ones(keep.sum(), dtype=np.float32))
+        matrix = sparse.csr_matrix((values, (rows, item_pos[keep])),
+                                   shape=(len(self.user_ids), len(self.item_ids)), dtype=np.float32)
+        matrix.sum_duplicates()
+        return matrix
+
+    def _nearest_users(self):
+        """Top-NEIGHBORS cosine neighbors per user, computed block by block."""
+        from sklearn.preprocessing import normalize
+
+        n_users = self.interactions.shape[0]
+        k = min(self.neighbors, max(n_users - 1, 0))
+        neighbor_idx = np.zeros((n_users, k), dtype=np.int32)
+        neighbor_sim = np.zeros((n_users, k), dtype=np.float32)
+        if k == 0:
+            return neighbor_idx, neighbor_sim
+
+        normalized = normalize(self.interactions)
+        for start in range(0, n_users, SIMILARITY_BLOCK):
+            stop = min(start + SIMILARITY_BLOCK, n_users)
+            block = (normalized[start:stop] @ normalized.T).toarray()
+            block[np.arange(stop - start), np.arange(start, stop)] = -1.0    # not your own neighbor
+            top = np.argpartition(block, -k, axis=1)[:, -k:]
+            neighbor_idx[start:stop] = top
+            neighbor_sim[start:stop] = np.clip(np.take_along_axis(block, top, axis=1), 0, None)
+        return neighbor_idx, neighbor_sim
+
+    # ---------- persistence ----------
+
+    def save(self, path=None):
+        """Write every array into one .npz, replaced atomically."""
+        path = path or self.model_path
+        csr = self.interactions
+        with atomic_write(path) as f:
+            np.savez(
+                f,
+                item_ids=self.item_ids, item_names=self.item_names,
+                features=self.features, popularity=self.popularity,
+                user_ids=self.user_ids,
+                indptr=csr.indptr, indices=csr.indices, data=csr.data,
+                neighbor_idx=self.neighbor_idx, neighbor_sim=self.neighbor_sim,
+            )
+        print(f"✅ Hybrid model saved at: {path}")
+
+    def load(self, path=None):
+        from scipy import sparse
+
+        path = path or self.model_path
+        if not os.path.exists(path):
+            raise FileNotFoundError(f"❌ Model not found at {path}")
+        with np.load(path, allow_pickle=False) as data:
+            self.item_ids = data["item_ids"]
+            self.item_names = data["item_names"]
+            self.features = data["features"]
+            self.popularity = data["popularity"]
+            self.user_ids = data["user_ids"]
+            self.interactions = sparse.csr_matrix(
+                (data["data"], data["indices"], data["indptr"]),
+                shape=(len(self.user_ids), len(self.item_ids)))
+            self.neighbor_idx = data["neighbor_idx"]
+            self.neighbor_sim = data["neighbor_sim"]
+        self.user_index = {u: i for i, u in enumerate(self.user_ids)}
+        self._item_index = None
+        self._popular_candidates = None
+        print(f"✅ Hybrid model loaded from: {path}")
+        return self
+
+    # ---------- serving ----------
+
+    def item_index(self):
+        if self._item_index is None:
+            self._item_index = {item_id: i for i, item_id in enumerate(self.item_ids)}
+        return self._item_index
+
+    def popular_candidates(self):
+        """Popularity does not depend on the user, so its candidates are fixed."""
+        if self._popular_candidates is None:
+            self._popular_candidates = _top_k(self.popularity, self.candidates)
+        return self._popular_candidates
+
+    def source_scores(self, user_id=None, seed_items=()):
+        """(3, items) array of per-source scores in [0, 1] and the purchased item indices."""
+        n_items = len(self.item_ids)
+        scores = np.zeros((len(SOURCES), n_items), dtype=np.float32)
+        row = self.user_index.get(str(user_id)) if user_id is not None else None
+
+        purchased = np.empty(0, dtype=np.int64)
+        history_weights = np.empty(0, dtype=np.float32)
+        if row is not None:
+            start, stop = self.interactions.indptr[row], self.interactions.indptr[row + 1]
+            purchased = self.interactions.indices[start:stop]
+            history_weights = self.interactions.data[start:stop]
+
+        index = self.item_index()
+        seeds = np.array([index[s] for s in map(str, seed_items) if s in index], dtype=np.int64)
+        profile_items = np.concatenate([purchased, seeds])
+        if len(profile_items):
+            weights = np.concatenate([history_weights, np.ones(len(seeds), dtype=np.float32)])
+            profile = weights @ self.features[profile_items]
+            norm = np.linalg.norm(profile)
+            if norm > 0:
+                scores[0] = self.features @ (profile / norm)
+
+        if row is not None and self.neighbor_sim.shape[1]:
+            sims = self.neighbor_sim[row]
+            if sims.sum() > 0:
+                # Sum the neighbors' CSR rows directly; scipy's fancy row
+                # indexing costs more than the arithmetic at this size.
+                indptr = self.interactions.indptr
+                neighbors = self.neighbor_idx[row]
+                starts, lengths = indptr[neighbors], indptr[neighbors + 1] - indptr[neighbors]
+                # Positions starts[j]..starts[j] + lengths[j] of every neighbor, in one pass.
+                picks = (np.repeat(starts - np.cumsum(lengths) + lengths, lengths)
+                         + np.arange(lengths.sum()))
+                weights = np.repeat(sims, lengths) * self.interactions.data[picks]
+                collaborative = np.bincount(self.interactions.indices[picks], weights=weights,
+                                            minlength=n_items)
+                peak = collaborative.max()
+                if peak > 0:
+                    scores[1] = collaborative / peak
+
+        scores[2] = self.popularity
+        return scores, purchased
+
+    def recommend(self, user_id=None, n=5, weights=None, seed_items=(), exclude_purchased=True):
+        """
+        Top-`n` items for `user_id` as dicts with the blended and per-source scores.
+
+        `weights` overrides the instance weights for this call; `seed_items`
+        (item ids) steer the content score, e.g. for a user without history.
+        """
+        if self.item_ids is None:
+            raise ValueError("Model not trained or loaded.")
+        weights = self.weights if weights is None else resolve_weights(weights)
+
+        with metrics.stage("hybrid_rank"):
+            scores, purchased = self.source_scores(user_id, seed_items)
+
+            # Sources with no signal for this user drop out of the blend.
+            active = weights * (scores.max(axis=1) > 0)
+            if active.sum() == 0:
+                active = np.array([0, 0, 1], dtype=np.float32)
+            active = active / active.sum()
+
+            n_items = len(self.item_ids)
+            marked = np.zeros(n_items, dtype=bool)
+            if active[0] > 0:
+                marked[_top_k(scores[0], self.candidates)] = True
+            if active[1] > 0:
+                # Only items the neighbors bought score at all.
+                nonzero = np.flatnonzero(scores[1])
+                marked[nonzero if len(nonzero) <= self.candidates
+                       else _top_k(scores[1], self.candidates)] = True
+            if active[2] > 0:
+                marked[self.popular_candidates()] = True
+            candidates = np.flatnonzero(marked)
+
+            blended = active @ scores[:, candidates]
+            if exclude_purchased and len(purchased):
+                bought = np.zeros(n_items, dtype=bool)
+                bought[purchased] = True
+                blended[bought[candidates]] = -np.inf
+
+            top = _top_k(blended, n)
+            top = top[np.argsort(-blended[top], kind="stable")]
+            top = top[np.isfinite(blended[top])]
+            picked = candidates[top]
+
+        return [
+            {
+                "item_id": str(self.item_ids[i]),
+                "item_name": str(self.item_names[i]),
+                "score": round(float(b), 4),
+                **{source: round(float(scores[s, i]), 4) for s, source in enumerate(SOURCES)},
+            }
+            for i, b in zip(picked, blended[top])
+        ]
+
+    def score_users(self, user_ids, weights=None):
+        """
+        Blended scores of every item for many users at once, (users, items).
+
+        The batch counterpart of `recommend()` for offline evaluation: the
+        same per-source scores and weight drop-out, computed as matrix
+        products over all items instead of a candidate union (the top of
+        the ranking is the same unless an item falls outside every
+        source's candidates). Already purchased items are not masked.
+        """
+        from scipy import sparse
+
+        weights = self.weights if weights is None else resolve_weights(weights)
+        rows = np.array([self.user_index.get(str(u), -1) for u in user_ids], dtype=np.int64)
+        known = rows >= 0
+        n_users, n_items = len(rows), len(self.item_ids)
+
+        scores = np.zeros((len(SOURCES), n_users, n_items), dtype=np.float32)
+        if known.any():
+            history = self.interactions[rows[known]]
+            profiles = _l2_rows(np.asarray(history @ self.features))
+            scores[0, known] = profiles @ self.features.T
+
+            k = self.neighbor_idx.shape[1]
+            if k:
+                m = int(known.sum())
+                neighbor_weights = sparse.csr_matrix(
+                    (self.neighbor_sim[rows[known]].ravel(), self.neighbor_idx[rows[known]].ravel(),
+                     np.arange(0, m * k + 1, k)),
+                    shape=(m, self.interactions.shape[0]))
+                collaborative = (neighbor_weights @ self.interactions).toarray()
+                peak = collaborative.max(axis=1, keepdims=True)
+                peak[peak == 0] = 1.0
+                scores[1, known] = collaborative / peak
+        scores[2] = self.popularity
+
+        active = weights[:, None] * (scores.max(axis=2) > 0)
+        empty = active.sum(axis=0) == 0
+        active[2, empty] = 1.0
+        active /= active.sum(axis=0, keepdims=True)
+        return np.einsum("su,sui->ui", active, scores)
@@ -0,0 +1,216 @@
+import json
+import threading
+import time
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+from ML import metrics
+from ML.Model import popularity
+from ML.Model.artifacts import atomic_write
+
+SECONDS_PER_DAY = 86400.0
+
+# Decayed scores are stored scaled up by 2 ** ((t - t_ref) / half_life) so an
+# order is a single add; once they grow past this, everything is rebased.
+RESCALE_LIMIT = 1e150
+
+
+class LivePopularityCounters:
+    """
+    Per-item popularity counters updated in O(1) per order.
+
+    Each item owns a slot in a set of flat NumPy arrays: total order count,
+    exponentially decayed count and a 24-bucket hour-of-day histogram. The
+    arrays grow by doubling, so ingesting an order never touches other items.
+    """
+
+    def __init__(self, half_life_days=7.0, capacity=64,
+                 snapshot_path=None, snapshot_interval=60.0):
+        self.half_life = half_life_days * SECONDS_PER_DAY
+        self.snapshot_path = snapshot_path
+        self.snapshot_interval = snapshot_interval
+
+        self.index = {}
+        self.names = []
+        self.categories = []
+        self.prices = []
+        self.counts = np.zeros(capacity, dtype=np.int64)
+        self.decayed = np.zeros(capacity, dtype=np.float64)
+        self.hourly = np.zeros((capacity, 24), dtype=np.int32)
+
+        self.t_ref = time.time()
+        self.version = 0
+        # Version of the PopularityArtifact the counters were seeded from, and
+        # how far into the shared order journal (ML.Model.order_log) they are.
+        self.seeded_from = None
+        self.log_offset = 0
+        self._last_snapshot = time.monotonic()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.names)
+
+    def _grow(self):
+        capacity = len(self.counts) * 2
+        self.counts = np.resize(self.counts, capacity)
+        self.counts[len(self.names):] = 0
+        self.decayed = np.resize(self.decayed, capacity)
+        self.decayed[len(self.names):] = 0
+        hourly = np.zeros((capacity, 24), dtype=np.int32)
+        hourly[:len(self.names)] = self.hourly[:len(self.names)]
+        self.hourly = hourly
+
+    def _slot(self, item_name, category=None, price=None):
+        key = str(item_name).strip().lower()
+        slot = self.index.get(key)
+        if slot is None:
+            slot = len(self.names)
+            if slot == len(self.counts):
+                self._grow()
+            self.index[key] = slot
+            self.names.append(str(item_name).strip())
+            self.categories.append(category or "Unknown")
+            self.prices.append(float(price or 0))
+        return slot
+
+    def _rescale(self, now):
+        factor = 2.0 ** (-(now - self.t_ref) / self.half_life)
+        self.decayed *= factor
+        self.t_ref = now
+
+    def add_order(self, item_name, quantity=1, when=None, category=None, price=None):
+        # Naive timestamps are local wall-clock time, as in the dataset (and
+        # the contextual model); aware ones are converted to it.
+        when = datetime.now() if when is None else pd.Timestamp(when).to_pydatetime()
+        if when.tzinfo is not None:
+            when = when.astimezone().replace(tzinfo=None)
+        ts = when.timestamp()
+        hour = when.hour
+
+        with self._lock:
+            slot = self._slot(item_name, category, price)
+            weight = quantity * 2.0 ** ((ts - self.t_ref) / self.half_life)
+            self.counts[slot] += quantity
+            self.decayed[slot] += weight
+            self.hourly[slot, hour] += quantity
+            if self.decayed[slot] > RESCALE_LIMIT:
+                self._rescale(ts)
+            self.version += 1
+
+    def snapshot_due(self):
+        return bool(self.snapshot_path) and \
+            time.monotonic() - self._last_snapshot >= self.snapshot_interval
+
+    def bootstrap(self, df):
+        """Seed the counters from the historical transaction frame in one pass."""
+        return self.seed(popularity.build(df, half_life_days=self.half_life / SECONDS_PER_DAY))
+
+    def seed(self, artifact):
+        """
+        Seed the counters from a PopularityArtifact (ML.Model.popularity).
+
+        The dataset is a frozen export, so its latest order is taken to be
+        "now"; otherwise every item would have decayed to ~0 and only
+        relative order would survive.
+        """
+        with self._lock:
+            for name, category, price in zip(artifact.names, artifact.categories, artifact.prices):
+                self._slot(name, category, price)
+            slots = np.array([self.index[name.lower()] for name in artifact.names], dtype=np.int64)
+            self.half_life = artifact.half_life_days * SECONDS_PER_DAY
+            self._rescale(time.time())
+            np.add.at(self.counts, slots, artifact.counts)
+            np.add.at(self.decayed, slots, artifact.decayed)
+            np.add.at(self.hourly, slots, artifact.hourly)
+            self.version += 1
+            self.seeded_from = artifact.version
+        print(f"✅ Live popularity counters seeded from popularity artifact {artifact.version} "
+              f"({artifact.meta['orders']} orders)")
+        return self
+
+    def top(self, n=10, category=None, hour=None):
+        with metrics.stage("rank"):
+            return self._top(n, category, hour)
+
+    def _top(self, n, category, hour):
+        size = len(self.names)
+        if size == 0:
+            return []
+
+        with self._lock:
+            if hour is not None:
+                scores = self.hourly[:size, hour].astype(np.float64)
+            else:
+                scores = self.decayed[:size] * 2.0 ** (-(time.time() - self.t_ref) / self.half_life)
+            counts = self.counts[:size].copy()
+
+        candidates = np.arange(size)
+        if category is not None:
+            wanted = category.strip().lower()
+            candidates = np.array([i for i in candidates
+                                   if str(self.categories[i]).lower() == wanted], dtype=np.int64)
+            if len(candidates) == 0:
+                return []
+
+        n = min(n, len(candidates))
+        if n <= 0:
+            return []
+        part = candidates[np.argpartition(-scores[candidates], n - 1)[:n]]
+        ranked = part[np.lexsort((-counts[part], -scores[part]))]
+
+        return [
+            {
+                "item_name": self.names[i],
+                "popularity_score": round(float(scores[i]), 2),
+                "purchase_count": int(counts[i]),
+                "category": self.categories[i],
+                "price": self.prices[i],
+            }
+            for i in ranked
+        ]
+
+    def save_snapshot(self, path=None):
+        path = path or self.snapshot_path
+        with self._lock:
+            size = len(self.names)
+            meta = {
+                "names": self.names,
+                "categories": self.categories,
+                "prices": self.prices,
+                "t_ref": self.t_ref,
+                "half_life": self.half_life,
+                "version": self.version,
+                "seeded_from": self.seeded_from,
+                "log_offset": self.log_offset,
+            }
+            arrays = {
+                "counts": self.counts[:size].copy(),
+                "decayed": self.decayed[:size].copy(),
+                "hourly": self.hourly[:size].copy(),
+            }
+            self._last_snapshot = time.monotonic()
+
+        with atomic_write(path) as f:
+            np.savez(f, meta=np.array(json.dumps(meta)), **arrays)
+
+    @classmethod
+    def load_snapshot(cls, path, **kwargs):
+        with np.load(path) as data:
+            meta = json.loads(str(data["meta"]))
+            counters = cls(capacity=max(len(meta["names"]), 64), snapshot_path=path, **kwargs)
+            size = len(meta["names"])
+            counters.counts[:size] = data["counts"]
+            counters.decayed[:size] = data["decayed"]
+            counters.hourly[:size] = data["hourly"]
+
+        counters.half_life = meta["half_life"]
+        counters.t_ref = meta["t_ref"]
+        counters.version = meta["version"]
+        counters.seeded_from = meta.get("seeded_from")
+        counters.log_offset = meta.get("log_offset", 0)
+        for name, category, price in zip(meta["names"], meta["categories"], meta["prices"]):
+            counters._slot(name, category, price)
+        print(f"✅ Live popularity counters restored from {path}")
+        return counters
@@ -0,0 +1,81 @@
+"""
+Journal of the orders ingested through POST /recommend/orders, shared by
+every worker process.
+
+Each accepted order is appended as one JSON line under the journal's file
+lock; every worker then folds in the lines it has not applied yet (its own
+and the other workers') before it answers, so the live counters and the
+contextual model see every order whichever worker received it. The journal
+also outlives restarts and artifact rebuilds: state rebuilt from the
+popularity artifact replays the orders newer than the artifact's latest one.
+"""
+
+import json
+import os
+from datetime import datetime
+
+from ML.Model.artifacts import file_lock
+
+MODEL_DIR = os.path.dirname(os.path.abspath(__file__))
+LOG_PATH = os.getenv("CANTEEN_ORDER_LOG", os.path.join(MODEL_DIR, "live_orders.jsonl"))
+
+
+def local_time(when=None):
+    """Naive local wall-clock time, as in the dataset; aware times are converted."""
+    when = when or datetime.now()
+    if when.tzinfo is not None:
+        when = when.astimezone().replace(tzinfo=None)
+    return when
+
+
+class OrderLog:
+    def __init__(self, path=LOG_PATH):
+        self.path = path
+
+    def append(self, item_name, quantity=1, when=None, category=None, price=None):
+        entry = {
+            "item_name": item_name,
+            "quantity": quantity,
+            "when": local_time(when).isoformat(),
+            "category": category,
+            "price": price,
+        }
+        line = json.dumps(entry, separators=(",", ":")) + "\n"
+        with file_lock(self.path):
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(line)
+
+    def size(self):
+        try:
+            return os.stat(self.path).st_size
+        except FileNotFoundError:
+            return 0
+
+    def replay(self, model, offset=0, after=None):
+        """
+        Feed every complete line past byte `offset` to `model.add_order` and
+        return the offset just past the last one applied. Orders at or before
+        `after` (the latest order of the data `model` was built from) are
+        already counted there and are skipped.
+        """
+        try:
+            with open(self.path, "rb") as f:
+                f.seek(offset)
+                data = f.read()
+        except FileNotFoundError:
+            return offset
+        end = data.rfind(b"\n") + 1
+
+        for line in data[:end].splitlines():
+            entry = json.loads(line)
+            when = datetime.fromisoformat(entry["when"])
+            if after is not None and when <= after:
+                continue
+            model.add_order(
+                entry["item_name"],
+                quantity=entry["quantity"],
+                when=when,
+                category=entry["category"],
+                price=entry["price"],
+            )
+        return offset + end
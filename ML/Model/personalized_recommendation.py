@@ -1,15 +1,49 @@
 import pandas as pd
 import numpy as np
-from sklearn.metrics.pairwise import cosine_similarity
 import pickle
 import os
-from bson import ObjectId
+
+from ML import metrics
+from ML.Data import mongo_store
+from ML.Model.artifacts import atomic_write
+
+MODEL_PATH = "ML/Model/personalized_model.pkl"
+
+
+def build_user_item_matrix(df):
+    return df.pivot_table(
+        index="userId",
+        columns="itemId",
+        values="amount",
+        fill_value=0
+    )
+
+
+def user_similarity(user_item_matrix):
+    """Dense user-user cosine similarity; CPU-bound, keep it off the event loop."""
+    from sklearn.metrics.pairwise import cosine_similarity
+
+    with metrics.stage("personalized_train"):
+        similarity = cosine_similarity(user_item_matrix)
+    return pd.DataFrame(
+        similarity,
+        index=user_item_matrix.index,
+        columns=user_item_matrix.index
+    )
+
+
+def save_personalized_model(path, user_item_matrix, similarity_df):
+    """Both frames are needed to recommend, so they are stored together."""
+    with atomic_write(path) as f:
+        pickle.dump({"user_item_matrix": user_item_matrix, "similarity_df": similarity_df}, f)
+
 
 class PersonalizedRecommender:
-    def __init__(self, mongo_client, db_name="auth-db"):
-        self.mongo_client = mongo_client
-        self.db = self.mongo_client[db_name]
-        self.collection = self.db["purchases"]
+    def __init__(self, mongo_client=None, db_name=None):
+        """Defaults to the shared client and database from ML.Data.mongo_store."""
+        self.mongo_client = mongo_client if mongo_client is not None else mongo_store.get_client()
+        self.db = self.mongo_client[db_name or mongo_store.MONGO_DB]
+        self.collection = self.db[mongo_store.PURCHASES]
         self.user_item_matrix = None
         self.similarity_df = None
 
@@ -39,42 +73,41 @@ class PersonalizedRecommender:
     async def build_user_item_matrix(self):
         """Build the user-item matrix asynchronously."""
         df = await self.fetch_data()
-        self.user_item_matrix = df.pivot_table(
-            index="userId",
-            columns="itemId",
-            values="amount",
-            fill_value=0
-        )
+        self.user_item_matrix = build_user_item_matrix(df)
         print(f"✅ Created user-item matrix with shape {self.user_item_matrix.shape}")
         return self.user_item_matrix
 
     async def train_model(self):
-        """Train the personalized user similarity model."""
+        """
+        Train the personalized user similarity model in this process.
+
+        This blocks the event loop while it computes; the API runs training
+        through ML.Model.training_jobs instead.
+        """
         if self.user_item_matrix is None:
             await self.build_user_item_matrix()
 
-        similarity = cosine_similarity(self.user_item_matrix)
-        self.similarity_df = pd.DataFrame(
-            similarity,
-            index=self.user_item_matrix.index,
-            columns=self.user_item_matrix.index
-        )
+        self.similarity_df = user_similarity(self.user_item_matrix)
         print("✅ Personalized model (user-user similarity) built.")
         return self.similarity_df
 
-    def save_model(self, path="ML/Model/personalized_model.pkl"):
+    def save_model(self, path=MODEL_PATH):
         
-        os.makedirs(os.path.dirname(path), exist_ok=True)
-        with open(path, "wb") as f:
-            pickle.dump(self.similarity_df, f)
+        save_personalized_model(path, self.user_item_matrix, self.similarity_df)
         print(f"✅ Personalized model saved at: {path}")
 
-    def load_model(self, path="ML/Model/personalized_model.pkl"):
-        """Load the saved similarity model."""
+    def load_model(self, path=MODEL_PATH):
+        """Load the saved similarity model (and its user-item matrix)."""
         if not os.path.exists(path):
             raise FileNotFoundError(f"❌ Model not found at {path}")
         with open(path, "rb") as f:
-            self.similarity_df = pickle.load(f)
+            model = pickle.load(f)
+        if isinstance(model, dict):
+            self.user_item_matrix = model["user_item_matrix"]
+            self.similarity_df = model["similarity_df"]
+        else:
+            # Older files hold only the similarity frame.
+            self.similarity_df = model
         print(f"✅ Personalized model loaded from: {path}")
 
     def recommend_for_user(self, user_id, n=5):
@@ -86,15 +119,16 @@ class PersonalizedRecommender:
             raise ValueError(f"User {user_id} not found in similarity matrix.")
 
         
-        similar_users = self.similarity_df[user_id].sort_values(ascending=False)[1:n+1]
-        top_users = similar_users.index.tolist()
+        with metrics.stage("personalized_lookup"):
+            similar_users = self.similarity_df[user_id].sort_values(ascending=False)[1:n+1]
+            top_users = similar_users.index.tolist()
 
-        
-        user_purchases = self.user_item_matrix.loc[user_id]
-        already_bought = set(user_purchases[user_purchases > 0].index)
+            
+            user_purchases = self.user_item_matrix.loc[user_id]
+            already_bought = set(user_purchases[user_purchases > 0].index)
 
-        rec_scores = self.user_item_matrix.loc[top_users].mean().sort_values(ascending=False)
-        rec_items = [item for item in rec_scores.index if item not in already_bought][:n]
+            rec_scores = self.user_item_matrix.loc[top_users].mean().sort_values(ascending=False)
+            rec_items = [item for item in rec_scores.index if item not in already_bought][:n]
 
         print(f"🎯 Recommended items for {user_id}: {rec_items}")
         return rec_items
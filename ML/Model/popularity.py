@@ -0,0 +1,270 @@
+"""
+Precomputed popularity rankings, built from the transaction dataset.
+
+    python -m ML.Model.popularity [--data CSV] [--out ML/Model/popularity.npz]
+
+This is the popularity analysis of ML/Notebooks/popularity_recommender.ipynb
+(order counts overall, over the last RECENT_DAYS days and per time of day)
+turned into one artifact. It also holds per-category rankings and the per-item
+arrays that LivePopularityCounters starts from:
+
+- counts: orders per item
+- decayed: orders weighted by 0.5 ** (age / half-life), relative to the latest
+  order in the data
+- hourly: orders per item and hour of day (items x 24)
+
+Rankings keep the TOP_K best items each, as one flat index array plus offsets.
+Records returned by `top()` have the same fields as the live counters'
+rankings. The .npz carries a JSON `meta` with the schema number, a content
+version, and the source CSV with its mtime. `load_or_build()` rebuilds when
+the CSV has changed or the schema is out of date.
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import threading
+import time
+
+import numpy as np
+import pandas as pd
+
+from ML import metrics
+from ML.Data import columnar_cache
+from ML.Model.artifacts import atomic_write, file_lock
+
+MODEL_DIR = os.path.dirname(os.path.abspath(__file__))
+ARTIFACT_PATH = os.path.join(MODEL_DIR, "popularity.npz")
+SCHEMA = 1
+
+HALF_LIFE_DAYS = 7.0
+RECENT_DAYS = 7
+TOP_K = 100
+
+SECONDS_PER_DAY = 86400.0
+
+
+def _key(value):
+    return str(value).strip().lower()
+
+
+class PopularityArtifact:
+    def __init__(self, meta, names, categories, prices, counts, decayed, hourly,
+                 ranking_items, ranking_counts):
+        self.meta = meta
+        self.names = names
+        self.categories = categories
+        self.prices = prices
+        self.counts = counts
+        self.decayed = decayed
+        self.hourly = hourly
+        self.ranking_items = ranking_items
+        self.ranking_counts = ranking_counts
+
+    def __len__(self):
+        return len(self.names)
+
+    @property
+    def version(self):
+        return self.meta["version"]
+
+    @property
+    def half_life_days(self):
+        return self.meta["half_life_days"]
+
+    def ranking_keys(self):
+        return list(self.meta["rankings"])
+
+    def time_windows(self):
+        return [key.split(":", 1)[1] for key in self.meta["rankings"] if key.startswith("time_of_day:")]
+
+    def top(self, n=10, category=None, time_of_day=None, recent=False):
+        """
+        The n most ordered items, overall or within one category, time of day
+        or the recent window. `purchase_count` counts orders in that window.
+        """
+        if category is not None:
+            key = f"category:{_key(category)}"
+        elif time_of_day is not None:
+            key = f"time_of_day:{_key(time_of_day)}"
+        else:
+            key = "recent" if recent else "overall"
+        start, end = self.meta["rankings"].get(key, (0, 0))
+        end = min(end, start + n)
+        return [
+            {
+                "item_name": self.names[i],
+                "popularity_score": round(float(self.decayed[i]), 2),
+                "purchase_count": int(count),
+                "category": self.categories[i],
+                "price": self.prices[i],
+            }
+            for i, count in zip(self.ranking_items[start:end], self.ranking_counts[start:end])
+        ]
+
+    def save(self, path=ARTIFACT_PATH):
+        meta = {**self.meta, "names": self.names, "categories": self.categories, "prices": self.prices}
+        with atomic_write(path) as f:
+            np.savez(f, meta=np.array(json.dumps(meta)), counts=self.counts, decayed=self.decayed,
+                     hourly=self.hourly, ranking_items=self.ranking_items,
+                     ranking_counts=self.ranking_counts)
+
+    @classmethod
+    def load(cls, path=ARTIFACT_PATH):
+        with np.load(path, allow_pickle=False) as data:
+            meta = json.loads(str(data["meta"]))
+            arrays = {name: data[name] for name in
+                      ("counts", "decayed", "hourly", "ranking_items", "ranking_counts")}
+        names, categories, prices = meta.pop("names"), meta.pop("categories"), meta.pop("prices")
+        return cls(meta, names, categories, prices, **arrays)
+
+
+def _rank(scores, decayed, candidates, top_k):
+    """Candidates by score, then recency-weighted score; zero scores dropped."""
+    candidates = candidates[scores[candidates] > 0]
+    order = np.lexsort((-decayed[candidates], -scores[candidates]))
+    return candidates[order[:top_k]]
+
+
+def build(df, half_life_days=HALF_LIFE_DAYS, recent_days=RECENT_DAYS, top_k=TOP_K,
+          source=None, source_version=None):
+    """PopularityArtifact from a transaction frame (item_name, category, price, datetime, time_of_day)."""
+    with metrics.stage("popularity_build"):
+        names = df["item_name"].astype(str).str.strip()
+        codes, _ = pd.factorize(names.str.lower())
+        items = df.loc[~pd.Series(codes).duplicated().to_numpy(), ["category", "price"]]
+        n = len(items)
+
+        when = pd.to_datetime(df["datetime"])
+        latest = when.max()
+        age_days = (latest - when).dt.total_seconds().to_numpy() / SECONDS_PER_DAY
+
+        counts = np.bincount(codes, minlength=n).astype(np.int64)
+        decayed = np.bincount(codes, weights=0.5 ** (age_days / half_life_days), minlength=n)
+        hourly = np.zeros((n, 24), dtype=np.int32)
+        np.add.at(hourly, (codes, when.dt.hour.to_numpy()), 1)
+        recent = np.bincount(codes[age_days <= recent_days], minlength=n)
+
+        item_names = names[~pd.Series(codes).duplicated().to_numpy()].tolist()
+        item_categories = items["category"].astype(str).tolist()
+        all_items = np.arange(n)
+
+        windows = {"overall": counts, "recent": recent}
+        category_codes, category_labels = pd.factorize(pd.Series(item_categories))
+        for code, category in enumerate(category_labels):
+            windows[f"category:{_key(category)}"] = np.where(category_codes == code, counts, 0)
+        if "time_of_day" in df.columns:
+            tod = df["time_of_day"].astype(str).str.strip()
+            for label in tod.unique():
+                windows[f"time_of_day:{_key(label)}"] = np.bincount(
+                    codes[(tod == label).to_numpy()], minlength=n)
+
+        rankings, items_parts, count_parts, offset = {}, [], [], 0
+        for key, scores in windows.items():
+            ranked = _rank(scores, decayed, all_items, top_k)
+            rankings[key] = (offset, offset + len(ranked))
+            offset += len(ranked)
+            items_parts.append(ranked)
+            count_parts.append(scores[ranked])
+
+    ranking_items = np.concatenate(items_parts).astype(np.int32)
+    ranking_counts = np.concatenate(count_parts).astype(np.int64)
+    digest = hashlib.sha1(counts.tobytes() + decayed.tobytes() + ranking_items.tobytes())
+    digest.update(json.dumps([SCHEMA, item_names, half_life_days, recent_days]).encode())
+    meta = {
+        "schema": SCHEMA,
+        "version": digest.hexdigest()[:12],
+        "built_at": time.time(),
+        "source": os.path.abspath(source) if source else None,
+        "source_version": source_version,
+        "orders": int(len(df)),
+        "latest_order": latest.isoformat(),
+        "half_life_days": half_life_days,
+        "recent_days": recent_days,
+        "top_k": top_k,
+        "rankings": rankings,
+    }
+    return PopularityArtifact(meta, item_names, item_categories,
+                              [float(p) for p in items["price"]], counts, decayed, hourly,
+                              ranking_items, ranking_counts)
+
+
+def build_from_csv(data_path=columnar_cache.DATASET_CSV, **kwargs):
+    return build(columnar_cache.load_csv(data_path), source=data_path,
+                 source_version=columnar_cache.data_version(data_path), **kwargs)
+
+
+def _is_current(artifact, data_path):
+    if artifact.meta.get("schema") != SCHEMA:
+        return False
+    version = columnar_cache.data_version(data_path)
+    # Without the CSV (e.g. a slim serving image) the artifact is all there is.
+    return version is None or (artifact.meta.get("source") == os.path.abspath(data_path)
+                               and artifact.meta.get("source_version") == version)
+
+
+def load_or_build(data_path=columnar_cache.DATASET_CSV, path=ARTIFACT_PATH):
+    """The artifact at `path`, rebuilt and saved first if `data_path` has changed."""
+    if os.path.exists(path):
+        artifact = PopularityArtifact.load(path)
+        if _is_current(artifact, data_path):
+            return artifact
+    with file_lock(path):
+        # Another process may have rebuilt it while we waited for the lock.
+        if os.path.exists(path):
+            artifact = PopularityArtifact.load(path)
+            if _is_current(artifact, data_path):
+                return artifact
+        artifact = build_from_csv(data_path)
+        artifact.save(path)
+    print(f"✅ Popularity artifact {artifact.version} built from {artifact.meta['orders']} orders")
+    return artifact
+
+
+_artifacts = {}
+_artifacts_lock = threading.Lock()
+
+
+def get_popularity(data_path=columnar_cache.DATASET_CSV):
+    """
+    Process-wide artifact for `data_path`, loaded once. The main dataset's is
+    persisted at ARTIFACT_PATH; others (benchmarks, ad-hoc CSVs) are built in
+    memory.
+    """
+    key = os.path.abspath(data_path)
+    artifact = _artifacts.get(key)
+    if artifact is None:
+        with _artifacts_lock:
+            artifact = _artifacts.get(key)
+            if artifact is None:
+                if key == os.path.abspath(columnar_cache.DATASET_CSV):
+                    artifact = load_or_build(data_path)
+                else:
+                    artifact = build_from_csv(data_path)
+                _artifacts[key] = artifact
+    return artifact
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build the popularity artifact.")
+    parser.add_argument("--data", default=columnar_cache.DATASET_CSV)
+    parser.add_argument("--out", default=ARTIFACT_PATH)
+    parser.add_argument("--half-life-days", type=float, default=HALF_LIFE_DAYS)
+    parser.add_argument("--recent-days", type=int, default=RECENT_DAYS)
+    parser.add_argument("--top-k", type=int, default=TOP_K)
+    args = parser.parse_args()
+
+    t0 = time.perf_counter()
+    artifact = build_from_csv(args.data, half_life_days=args.half_life_days,
+                              recent_days=args.recent_days, top_k=args.top_k)
+    artifact.save(args.out)
+    print(f"✅ Popularity artifact {artifact.version}: {len(artifact)} items, "
+          f"{len(artifact.ranking_keys())} rankings from {artifact.meta['orders']} orders "
+          f"in {time.perf_counter() - t0:.2f}s -> {args.out} ({os.path.getsize(args.out)} bytes)")
+    for rec in artifact.top(5):
+        print(f"   {rec['item_name']}: {rec['purchase_count']}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,23 +1,15 @@
 # ML/Model/train_personalized_model.py
 
-import os
 import pandas as pd
-from motor.motor_asyncio import AsyncIOMotorClient
 import asyncio
-from dotenv import load_dotenv
-from personalized_recommendation import PersonalizedHybridRecommender
+from ML.Data import mongo_store
+from ML.Model.hybrid_recommendation import MODEL_PATH, PersonalizedHybridRecommender
 
 
-load_dotenv()
-MONGO_URI = os.getenv("MONGODB_URI")
-MONGO_DB = os.getenv("MONGODB_DB", "canteen")
-MODEL_PATH = "ML/Model/personalized_model.pkl"
-
 async def train_model():
     """Fetch users, items, and orders from MongoDB, then train and save model."""
     print("📡 Connecting to MongoDB...")
-    client = AsyncIOMotorClient(MONGO_URI)
-    db = client[MONGO_DB]
+    db = mongo_store.get_database()
 
     users = await db.users.find().to_list(length=None)
     items = await db.items.find().to_list(length=None)
@@ -54,7 +46,7 @@ async def train_model():
     recommender.save()
     print(f"✅ Model trained and saved at {MODEL_PATH}")
 
-    client.close()
+    mongo_store.close_client()
 
 if __name__ == "__main__":
     asyncio.run(train_model())
@@ -0,0 +1,289 @@
+"""
+Background training jobs for the personalized model.
+
+Fetching purchases from Mongo is async I/O and stays on the event loop; the
+CPU-bound part (pivot_table + dense cosine similarity + pickling) runs in a
+separate process, so the API keeps serving while a model trains. One job runs
+at a time. Each job reports a status and progress, can be cancelled (the
+training process is terminated) and, when it succeeds, hands the saved model
+path to an `on_done` callback that swaps it into the serving recommender.
+
+The model file is written with write-temp-then-rename, so a cancelled or
+failed job leaves the previous model untouched.
+
+With several workers, a job runs in the worker that accepted it but its state
+is published to JOBS_DIR as <job_id>.json after every change, so any worker
+can report it. A cancel that reaches another worker leaves <job_id>.cancel
+there, which the owning worker picks up on its next poll.
+"""
+
+import asyncio
+import itertools
+import json
+import multiprocessing
+import os
+import queue as queue_module
+import time
+import traceback
+from collections import OrderedDict
+
+from ML.Model.artifacts import atomic_write, file_lock
+from ML.Model.personalized_recommendation import (
+    build_user_item_matrix,
+    save_personalized_model,
+    user_similarity,
+)
+
+JOBS_DIR = os.getenv("CANTEEN_TRAINING_JOBS_DIR",
+                     os.path.join(os.path.dirname(os.path.abspath(__file__)), "training_jobs"))
+POLL_INTERVAL = 0.2
+KEEP_JOBS = 20
+
+ACTIVE_STATES = ("queued", "fetching", "training", "saving")
+
+
+def _train_worker(df, model_path, progress):
+    """Runs in the child process; reports (status, progress, message) tuples."""
+    try:
+        progress.put(("training", 0.3, f"pivoting {len(df)} purchase records"))
+        matrix = build_user_item_matrix(df)
+        progress.put(("training", 0.5, f"user similarity for {matrix.shape[0]} users"))
+        similarity = user_similarity(matrix)
+        progress.put(("saving", 0.9, f"writing {model_path}"))
+        save_personalized_model(model_path, matrix, similarity)
+        progress.put(("saved", 1.0, f"{matrix.shape[0]} users x {matrix.shape[1]} items"))
+    except BaseException:
+        progress.put(("error", 0.0, traceback.format_exc(limit=5)))
+        raise
+
+
+def _process_identity(pid):
+    """
+    Boot id plus start time of `pid` (/proc/<pid>/stat field 22), which tell a
+    reused pid from the original process; None where /proc is unavailable.
+    """
+    try:
+        with open("/proc/sys/kernel/random/boot_id") as f:
+            boot_id = f.read().strip()
+        with open(f"/proc/{pid}/stat") as f:
+            # The command name may contain spaces; fields resume after its ')'.
+            fields = f.read().rsplit(")", 1)[1].split()
+    except OSError:
+        return None
+    return f"{boot_id}:{fields[19]}"
+
+
+def _pid_alive(pid, identity=None):
+    """True while `pid` runs and, when `identity` is known, is still the same process."""
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return identity is None or _process_identity(pid) == identity
+
+
+class TrainingJob:
+    def __init__(self, job_id, pid=None, identity=None):
+        self.id = job_id
+        self.pid = pid or os.getpid()
+        self.identity = identity if pid else _process_identity(self.pid)
+        self.status = "queued"
+        self.progress = 0.0
+        self.message = ""
+        self.error = None
+        self.created = time.time()
+        self.finished = None
+        self._process = None
+        self._task = None
+        self._cancel_requested = False
+
+    @property
+    def active(self):
+        return self.status in ACTIVE_STATES
+
+    def to_dict(self):
+        return {
+            "job_id": self.id,
+            "status": self.status,
+            "progress": round(self.progress, 3),
+            "message": self.message,
+            "error": self.error,
+            "created": self.created,
+            "finished": self.finished,
+            "elapsed_s": round((self.finished or time.time()) - self.created, 3),
+            "worker_pid": self.pid,
+            "worker_identity": self.identity,
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        """A read-only copy of a job published by (possibly) another worker."""
+        job = cls(data["job_id"], data["worker_pid"], data.get("worker_identity"))
+        job.status, job.progress, job.message = data["status"], data["progress"], data["message"]
+        job.error, job.created, job.finished = data["error"], data["created"], data["finished"]
+        if job.active and not _pid_alive(job.pid, job.identity):
+            job.status, job.error = "failed", f"worker {job.pid} exited during the job"
+            job.finished = job.finished or time.time()
+        return job
+
+
+class TrainingJobRunner:
+    def __init__(self, start_method="spawn", jobs_dir=JOBS_DIR):
+        # spawn: forking a process that runs threads and an event loop is unsafe.
+        self._ctx = multiprocessing.get_context(start_method)
+        self._ids = itertools.count(1)
+        self.jobs_dir = jobs_dir
+        # Jobs this worker runs; the others are read from jobs_dir.
+        self.jobs = OrderedDict()
+
+    def _path(self, job_id, suffix=".json"):
+        return os.path.join(self.jobs_dir, f"{os.path.basename(job_id)}{suffix}")
+
+    def _publish(self, job):
+        with atomic_write(self._path(job.id), "w") as f:
+            json.dump(job.to_dict(), f)
+
+    def _read(self, job_id):
+        try:
+            with open(self._path(job_id)) as f:
+                return TrainingJob.from_dict(json.load(f))
+        except (FileNotFoundError, ValueError, KeyError):
+            return None
+
+    def all_jobs(self):
+        """Every published job, newest first."""
+        if not os.path.isdir(self.jobs_dir):
+            return []
+        jobs = [self.get(name[:-5]) for name in os.listdir(self.jobs_dir) if name.endswith(".json")]
+        return sorted((job for job in jobs if job is not None), key=lambda job: job.created, reverse=True)
+
+    def active_job(self):
+        return next((job for job in self.all_jobs() if job.active), None)
+
+    def get(self, job_id):
+        return self.jobs.get(job_id) or self._read(job_id)
+
+    def submit(self, fetch, model_path, on_done):
+        """
+        Start a job on the running loop and return it, or None if one is active.
+
+        `fetch` is an async callable returning the purchase DataFrame;
+        `on_done(model_path)` is awaited after the model file is written.
+        """
+        # Check-and-publish under one lock, so two workers cannot both start a job.
+        with file_lock(os.path.join(self.jobs_dir, "submit")):
+            jobs = self.all_jobs()
+            if any(job.active for job in jobs):
+                return None
+            job = TrainingJob(f"train-{int(time.time())}-{os.getpid()}-{next(self._ids)}")
+            self.jobs[job.id] = job
+            self._publish(job)
+            for old in jobs[KEEP_JOBS - 1:]:
+                self.jobs.pop(old.id, None)
+                for suffix in (".json", ".cancel"):
+                    if os.path.exists(self._path(old.id, suffix)):
+                        os.remove(self._path(old.id, suffix))
+
+        job._task = asyncio.get_running_loop().create_task(self._run(job, fetch, model_path, on_done))
+        return job
+
+    def cancel(self, job_id):
+        job = self.jobs.get(job_id)
+        if job is None:
+            # Owned by another worker: leave a request for it to act on.
+            job = self._read(job_id)
+            if job is not None and job.active:
+                with atomic_write(self._path(job_id, ".cancel"), "w") as f:
+                    f.write(str(os.getpid()))
+            return job
+        if not job.active:
+            return job
+        job._cancel_requested = True
+        if job._process is not None:
+            # Still starting: _run terminates it as soon as start() returns.
+            if job._process.is_alive():
+                job._process.terminate()
+        elif job._task is not None:
+            job._task.cancel()
+        return job
+
+    def _cancelled(self, job):
+        if not job._cancel_requested and os.path.exists(self._path(job.id, ".cancel")):
+            self.cancel(job.id)
+        return job._cancel_requested
+
+    def _set(self, job, status, progress, message):
+        job.status, job.progress, job.message = status, progress, message
+        self._publish(job)
+
+    def _finish(self, job, status, message=None, error=None):
+        job.status = status
+        job.finished = time.time()
+        if message is not None:
+            job.message = message
+        job.error = error
+        self._publish(job)
+
+    async def _run(self, job, fetch, model_path, on_done):
+        try:
+            self._set(job, "fetching", 0.05, "loading purchases")
+            df = await fetch()
+            if self._cancelled(job):
+                self._finish(job, "cancelled", "cancelled before training")
+                return
+
+            progress = self._ctx.Queue()
+            job._process = self._ctx.Process(
+                target=_train_worker, args=(df, model_path, progress), daemon=True)
+            self._set(job, "training", 0.2, "starting trainer")
+            # start() pickles `df` into a pipe the child only drains once its
+            # interpreter is up, so it blocks; keep that off the loop too.
+            await asyncio.to_thread(job._process.start)
+            del df
+            if self._cancelled(job):
+                job._process.terminate()
+
+            worker_error = None
+            while True:
+                alive = job._process.is_alive()
+                if alive and self._cancelled(job):
+                    job._process.terminate()
+                seen = (job.status, job.progress, job.message)
+                while True:
+                    try:
+                        status, fraction, message = progress.get_nowait()
+                    except queue_module.Empty:
+                        break
+                    if status == "error":
+                        worker_error = message
+                    elif status != "saved":
+                        job.status, job.progress, job.message = status, fraction, message
+                    else:
+                        job.progress, job.message = fraction, message
+                if (job.status, job.progress, job.message) != seen:
+                    self._publish(job)
+                if not alive:
+                    break
+                await asyncio.sleep(POLL_INTERVAL)
+
+            job._process.join()
+            if self._cancelled(job):
+                self._finish(job, "cancelled", "training process terminated")
+                return
+            if job._process.exitcode != 0:
+                self._finish(job, "failed", error=worker_error or f"exit code {job._process.exitcode}")
+                return
+
+            await on_done(model_path)
+            job.progress = 1.0
+            self._finish(job, "done")
+            print(f"✅ Training job {job.id} finished: {job.message}")
+        except asyncio.CancelledError:
+            if job._process is not None and job._process.is_alive():
+                job._process.terminate()
+            self._finish(job, "cancelled", "cancelled")
+        except Exception as e:
+            self._finish(job, "failed", error=str(e))
+            traceback.print_exc()
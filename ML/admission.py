@@ -0,0 +1,146 @@
+"""
+Admission control: per-route-group concurrency limits and load shedding.
+
+Each group (a path prefix) gets a concurrency limit and a bounded wait queue.
+A request beyond the limit waits for a free slot. If the queue is already
+full, or no slot frees up within QUEUE_TIMEOUT seconds, the request gets a
+503 with Retry-After straight away. Waiting longer would only make the
+client's eventual answer later and tie up memory and sockets.
+
+Slow Gemini calls can then pile up at most CHAT_CONCURRENCY + CHAT_QUEUE
+deep, and the recommend routes, which share the process and its
+threadpool, keep their own slots.
+
+Limits come from the environment: CANTEEN_<GROUP>_CONCURRENCY and
+CANTEEN_<GROUP>_QUEUE (group in CHAT, RECOMMEND, PERSONAL). Queue wait is
+CANTEEN_ADMISSION_QUEUE_TIMEOUT, and CANTEEN_ADMISSION=0 disables all of it.
+Limits are per worker process. Paths outside these prefixes (health,
+metrics, admin) are never limited.
+"""
+
+import asyncio
+import os
+
+from ML import metrics
+
+ENABLED = os.getenv("CANTEEN_ADMISSION", "1") == "1"
+QUEUE_TIMEOUT = float(os.getenv("CANTEEN_ADMISSION_QUEUE_TIMEOUT", "5"))
+RETRY_AFTER_SECONDS = 1
+
+# group: (path prefix, default concurrency, default queue depth)
+DEFAULT_LIMITS = {
+    "chat": ("/chat", 8, 16),
+    "recommend": ("/recommend", 64, 256),
+    "personal": ("/personal", 16, 32),
+}
+
+
+class RouteLimiter:
+    """Concurrency slots plus a bounded FIFO of waiters for one route group."""
+
+    def __init__(self, name, max_concurrent, max_queue, queue_timeout=QUEUE_TIMEOUT):
+        self.name = name
+        self.max_concurrent = max_concurrent
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self.in_flight = 0
+        self.waiting = 0
+        self._slots = asyncio.Semaphore(max_concurrent)
+
+    async def acquire(self):
+        """Take a slot; returns None when admitted, else the shedding reason."""
+        if not self._slots.locked():
+            # Free slot: acquire() returns without suspending.
+            await self._slots.acquire()
+            self.in_flight += 1
+            return None
+        if self.waiting >= self.max_queue:
+            return "queue_full"
+        self.waiting += 1
+        try:
+            await asyncio.wait_for(self._slots.acquire(), self.queue_timeout)
+        except asyncio.TimeoutError:
+            return "queue_timeout"
+        finally:
+            self.waiting -= 1
+        self.in_flight += 1
+        return None
+
+    def release(self):
+        self.in_flight -= 1
+        self._slots.release()
+
+
+def _limits_from_env():
+    limiters = []
+    for name, (prefix, concurrency, queue) in DEFAULT_LIMITS.items():
+        concurrency = int(os.getenv(f"CANTEEN_{name.upper()}_CONCURRENCY", concurrency))
+        queue = int(os.getenv(f"CANTEEN_{name.upper()}_QUEUE", queue))
+        limiters.append((prefix, RouteLimiter(name, concurrency, queue)))
+    return limiters
+
+
+LIMITERS = _limits_from_env()
+
+
+def limiter_for(path):
+    for prefix, limiter in LIMITERS:
+        if path.startswith(prefix):
+            return limiter
+    return None
+
+
+def _collect(attr):
+    return lambda: {(limiter.name,): getattr(limiter, attr) for _, limiter in LIMITERS}
+
+
+metrics.register(metrics.Gauge(
+    "canteen_admission_limit", "Concurrent requests allowed per route group.",
+    ("group",), _collect("max_concurrent")))
+metrics.register(metrics.Gauge(
+    "canteen_admission_queue_limit", "Requests allowed to wait per route group.",
+    ("group",), _collect("max_queue")))
+metrics.register(metrics.Gauge(
+    "canteen_admission_in_flight", "Requests being handled per route group.",
+    ("group",), _collect("in_flight")))
+metrics.register(metrics.Gauge(
+    "canteen_admission_queued", "Requests waiting for a slot per route group.",
+    ("group",), _collect("waiting")))
+
+
+async def _reject(send, limiter, reason):
+    metrics.admission_rejected(limiter.name, reason)
+    body = b'{"detail":"Server busy, please retry shortly"}'
+    await send({
+        "type": "http.response.start",
+        "status": 503,
+        "headers": [
+            (b"content-type", b"application/json"),
+            (b"content-length", str(len(body)).encode()),
+            (b"retry-after", str(RETRY_AFTER_SECONDS).encode()),
+        ],
+    })
+    await send({"type": "http.response.body", "body": body})
+
+
+class AdmissionMiddleware:
+    """Pure ASGI middleware applying the route group limits."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        limiter = limiter_for(scope["path"]) if scope["type"] == "http" else None
+        # CORS preflights are answered by the CORS middleware and cost nothing.
+        if limiter is None or scope["method"] == "OPTIONS":
+            await self.app(scope, receive, send)
+            return
+
+        reason = await limiter.acquire()
+        if reason is not None:
+            await _reject(send, limiter, reason)
+            return
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            limiter.release()
@@ -1,28 +1,59 @@
+import asyncio
+import os
 import random
-import pandas as pd
-from fastapi import APIRouter, HTTPException
+import re
+import time
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache, partial
+from fastapi import APIRouter
 from pydantic import BaseModel, Field
 from typing import List
-from google import genai
-from google.genai import types
 
+from ML import metrics
+from ML.API.responses import ResponseCache
+from ML.circuit_breaker import CircuitBreaker
+from ML.singleflight import AsyncSingleFlight
 from ML.API.recommend_api import (
-    load_dataset,
-    get_menu,
-    get_popular,
-    get_highest_rated,
-    find_by_category,
-    spicy_items
+    menu_records,
+    popular_records,
+    highest_rated_records,
+    category_records,
+    spicy_records,
+    time_of_day_popular_records
 )
 
 router = APIRouter(prefix="/chat", tags=["chat"])
 
-DATA_CACHE = load_dataset()
-MENU_CACHE = get_menu()
-
-client = genai.Client()
 MODEL = "gemini-2.5-flash"
 
+# Identical questions asked at the same moment (same prompt, history and
+# message) share one LLM call.
+_llm_flight = AsyncSingleFlight("llm")
+
+# Seconds to wait for Gemini before answering from the fallback instead.
+LLM_TIMEOUT = float(os.getenv("CANTEEN_LLM_TIMEOUT", "15"))
+
+# Gemini calls get their own pool, sized like the chat admission limit. A call
+# abandoned after LLM_TIMEOUT keeps its thread until the client returns, so on
+# the shared default executor hung calls would starve every other to_thread.
+LLM_THREADS = int(os.getenv("CANTEEN_LLM_THREADS", os.getenv("CANTEEN_CHAT_CONCURRENCY", "8")))
+_llm_executor = ThreadPoolExecutor(max_workers=LLM_THREADS, thread_name_prefix="llm")
+
+# Opens when half of the recent calls fail or take longer than 8s; while open,
+# chat is answered from recent replies or the local menu without calling out.
+llm_breaker = CircuitBreaker("llm", failure_rate=0.5, slow_call_seconds=8.0, slow_rate=0.5,
+                             window=20, min_calls=5, open_seconds=30.0)
+
+# Recent LLM replies by normalized question, served when the LLM is unavailable.
+_recent_replies = ResponseCache(max_entries=256)
+
+@lru_cache(maxsize=1)
+def get_client():
+    """Import and construct the Gemini client on first use, not at import time."""
+    from google import genai
+
+    return genai.Client()
+
 class Part(BaseModel):
     text: str
 
@@ -37,20 +68,25 @@ class ChatRequest(BaseModel):
 class ChatResponse(BaseModel):
     reply: str
     updated_history: List[Content]
+    # True when the reply came from a fallback instead of the LLM.
+    degraded: bool = False
 
 def build_system_instruction():
-    menu = MENU_CACHE
-    popular = get_popular(10)
-    rated = get_highest_rated(10)
-    spicy = spicy_items()[:10]
+    menu = menu_records()
+    popular = popular_records(10)
+    rated = highest_rated_records(10)
+    spicy = spicy_records()[:10]
+    by_time = time_of_day_popular_records(5)
 
     menu_lines = [
         f"- {m['item_name']} (₹{m['price']}) | Category: {m['category']} | Rating: {m.get('rating', 'N/A')}"
         for m in menu
     ]
 
+    # Order counts rather than the live score: that decays with the clock, and a
+    # prompt that changed mid-burst would split _llm_flight's key.
     pop_lines = [
-        f"{i+1}. {p['item_name']} — Popularity Score: {p.get('popularity_score', 0)}"
+        f"{i+1}. {p['item_name']} — Orders: {p.get('purchase_count', 0)}"
         for i, p in enumerate(popular)
     ]
 
@@ -59,6 +95,11 @@ def build_system_instruction():
         for i, r in enumerate(rated)
     ]
 
+    time_lines = [
+        f"- {tod.title()}: " + ", ".join(p["item_name"] for p in picks)
+        for tod, picks in by_time.items()
+    ]
+
     spicy_lines = [
         f"{i+1}. {s['item_name']} — Spice Level: {s.get('spicy_level', 0)}"
         for i, s in enumerate(spicy)
@@ -81,6 +122,9 @@ MENU:
 POPULAR ITEMS:
 {chr(10).join(pop_lines)}
 
+POPULAR BY TIME OF DAY:
+{chr(10).join(time_lines)}
+
 HIGHEST RATED:
 {chr(10).join(rated_lines)}
 
@@ -104,48 +148,118 @@ def greeting_reply():
         "Hey there! Looking for something tasty? 😁"
     ])
 
-@router.post("/chat", response_model=ChatResponse)
-async def chat(request: ChatRequest):
+def _question_key(text):
+    return " ".join(re.findall(r"[a-z0-9]+", text.lower()))
 
-    if is_greeting(request.new_message):
-        reply = greeting_reply()
-        updated = request.history + [
-            Content(role="user", parts=[Part(text=request.new_message)]),
-            Content(role="model", parts=[Part(text=reply)])
-        ]
-        return ChatResponse(reply=reply, updated_history=updated)
+def local_reply(message):
+    """Answer from the menu data alone, used when the LLM is unavailable."""
+    text = message.lower()
+    menu = menu_records()
 
-    prompt = build_system_instruction()
+    named = [m for m in menu if m["item_name"].lower() in text]
+    if named:
+        return " ".join(
+            f"{m['item_name']} is ₹{m['price']} ({m['category']}, rated {m.get('rating', 'N/A')})."
+            for m in named[:3]
+        )
 
-    convo = [types.Content(role="user", parts=[types.Part(text=prompt)])]
+    cap = re.search(r"(?:under|below|less than|within)\s*(?:₹|rs\.?|inr)?\s*(\d+)", text)
+    if cap:
+        limit = float(cap.group(1))
+        cheap = sorted((m for m in menu if float(m["price"]) <= limit),
+                       key=lambda m: -float(m.get("rating") or 0))[:5]
+        if not cheap:
+            return f"Sorry, nothing on the menu is under ₹{cap.group(1)}."
+        return f"Under ₹{cap.group(1)}: " + ", ".join(
+            f"{m['item_name']} (₹{m['price']})" for m in cheap) + "."
+
+    if "spicy" in text:
+        picks = [s["item_name"] for s in spicy_records()[:5]]
+        return "Our spiciest picks: " + ", ".join(picks) + "."
+    if "rated" in text or "rating" in text or "best" in text:
+        picks = [r["item_name"] for r in highest_rated_records(5)]
+        return "Highest rated right now: " + ", ".join(picks) + "."
+
+    picks = [p["item_name"] for p in popular_records(5)]
+    return "I can only give quick answers right now. Popular today: " + ", ".join(picks) + "."
+
+def fallback_reply(message, reason):
+    """A recent LLM answer to the same question, else the local menu answer."""
+    cached = _recent_replies.get(_question_key(message))
+    if cached is not None:
+        metrics.chat_fallback("cache", reason)
+        return cached
+    metrics.chat_fallback("local", reason)
+    return local_reply(message)
+
+def _generate(prompt, history, new_message):
+    """One blocking Gemini call; runs in the LLM pool."""
+    from google.genai import types
 
-    for msg in request.history:
+    convo = [types.Content(role="user", parts=[types.Part(text=prompt)])]
+    for msg in history:
         convo.append(
             types.Content(
                 role=msg.role,
                 parts=[types.Part(text=p.text) for p in msg.parts]
             )
         )
-
     convo.append(
-        types.Content(role="user", parts=[types.Part(text=request.new_message)])
+        types.Content(role="user", parts=[types.Part(text=new_message)])
     )
+    return get_client().models.generate_content(model=MODEL, contents=convo).text
 
-    try:
-        res = client.models.generate_content(
-            model=MODEL,
-            contents=convo
-        )
-        reply = res.text
-    except Exception as e:
-        raise HTTPException(500, str(e))
-
+def _reply(request, reply, degraded=False):
     updated = request.history + [
         Content(role="user", parts=[Part(text=request.new_message)]),
         Content(role="model", parts=[Part(text=reply)])
     ]
+    return ChatResponse(reply=reply, updated_history=updated, degraded=degraded)
+
+@router.post("/chat", response_model=ChatResponse)
+async def chat(request: ChatRequest):
+
+    if is_greeting(request.new_message):
+        return _reply(request, greeting_reply())
+
+    # Fail fast while Gemini is known to be failing or slow.
+    if not llm_breaker.allow():
+        return _reply(request, fallback_reply(request.new_message, "circuit_open"), degraded=True)
+
+    # Menu and ranking lookups may still be cold; keep them off the event loop.
+    with metrics.stage("prompt_build"):
+        prompt = await asyncio.to_thread(build_system_instruction)
+
+    async def generate():
+        t0 = time.perf_counter()
+        ok = False
+        try:
+            with metrics.stage("llm_call"):
+                # The client is blocking (and so are its first import and
+                # construction); keep all of it off the event loop. On timeout
+                # the call finishes in the background within the LLM pool and
+                # its reply is dropped; one still queued there never starts.
+                reply = await asyncio.wait_for(asyncio.get_running_loop().run_in_executor(
+                    _llm_executor, partial(_generate, prompt, request.history,
+                                           request.new_message)), LLM_TIMEOUT)
+            ok = True
+            return reply
+        finally:
+            llm_breaker.record(ok, time.perf_counter() - t0)
+
+    key = (prompt, tuple((m.role, tuple(p.text for p in m.parts)) for m in request.history),
+           request.new_message)
+    try:
+        reply = await _llm_flight.do(key, generate, metric_key="/chat/chat")
+    except asyncio.TimeoutError:
+        return _reply(request, fallback_reply(request.new_message, "timeout"), degraded=True)
+    except Exception as e:
+        print(f"❌ LLM call failed: {e}")
+        return _reply(request, fallback_reply(request.new_message, "error"), degraded=True)
 
-    return ChatResponse(reply=reply, updated_history=updated)
+    if not request.history:
+        _recent_replies.put(_question_key(request.new_message), reply)
+    return _reply(request, reply)
 
 @router.get("/")
 def ping():
@@ -0,0 +1,110 @@
+"""
+Circuit breaker for slow or failing dependencies (the Gemini client).
+
+The breaker keeps the outcomes of the last WINDOW calls. While closed, every
+call goes through. Once at least MIN_CALLS are recorded and the share of
+failures, or of calls slower than `slow_call_seconds`, reaches its threshold,
+the breaker opens. While open, `allow()` returns False and callers fail fast
+to their fallback. After `open_seconds` one trial call is let through
+(half-open). If it succeeds in time the breaker closes again; otherwise it
+re-opens for another `open_seconds`.
+
+States are exported as canteen_circuit_state{breaker} (0 closed, 1 half-open,
+2 open) and outcomes as canteen_circuit_calls_total.
+"""
+
+import threading
+import time
+from collections import deque
+
+from ML import metrics
+
+CLOSED = "closed"
+HALF_OPEN = "half_open"
+OPEN = "open"
+
+STATE_VALUES = {CLOSED: 0, HALF_OPEN: 1, OPEN: 2}
+
+_breakers = {}
+
+
+class CircuitBreaker:
+    def __init__(self, name, failure_rate=0.5, slow_call_seconds=10.0, slow_rate=0.5,
+                 window=20, min_calls=5, open_seconds=30.0):
+        self.name = name
+        self.failure_rate = failure_rate
+        self.slow_call_seconds = slow_call_seconds
+        self.slow_rate = slow_rate
+        self.min_calls = min_calls
+        self.open_seconds = open_seconds
+        self.state = CLOSED
+        self.opened_at = None
+        self._outcomes = deque(maxlen=window)    # (failed, slow) per call
+        self._trial_in_flight = False
+        self._lock = threading.Lock()
+        _breakers[name] = self
+
+    def allow(self):
+        """True if a call may go to the dependency now."""
+        with self._lock:
+            if self.state == CLOSED:
+                return True
+            if self.state == OPEN and time.monotonic() - self.opened_at >= self.open_seconds:
+                self._set_state(HALF_OPEN)
+            if self.state == HALF_OPEN and not self._trial_in_flight:
+                self._trial_in_flight = True
+                return True
+        metrics.circuit_call(self.name, "rejected")
+        return False
+
+    def record(self, ok, duration):
+        """Record one call's outcome; `ok=False` for errors and timeouts."""
+        slow = duration >= self.slow_call_seconds
+        metrics.circuit_call(self.name, "failure" if not ok else "slow" if slow else "success")
+        with self._lock:
+            if self.state == HALF_OPEN:
+                self._trial_in_flight = False
+                self._set_state(OPEN if not ok or slow else CLOSED)
+                return
+            self._outcomes.append((not ok, slow))
+            if self.state == CLOSED and len(self._outcomes) >= self.min_calls:
+                n = len(self._outcomes)
+                failures = sum(failed for failed, _ in self._outcomes)
+                slow_calls = sum(s for _, s in self._outcomes)
+                if failures / n >= self.failure_rate or slow_calls / n >= self.slow_rate:
+                    self._set_state(OPEN)
+
+    def _set_state(self, state):
+        if state == OPEN:
+            self.opened_at = time.monotonic()
+        if state != self.state:
+            print(f"⚠️ Circuit '{self.name}': {self.state} -> {state}")
+        self.state = state
+        if state == CLOSED:
+            self._outcomes.clear()
+
+    def reset(self):
+        with self._lock:
+            self._trial_in_flight = False
+            self._set_state(CLOSED)
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                "state": self.state,
+                "recent_calls": len(self._outcomes),
+                "recent_failures": sum(failed for failed, _ in self._outcomes),
+                "recent_slow": sum(slow for _, slow in self._outcomes),
+            }
+
+
+def _collect_states():
+    return {(name,): STATE_VALUES[b.state] for name, b in _breakers.items()}
+
+
+metrics.register(metrics.Gauge(
+    "canteen_circuit_state",
+    "Circuit breaker state: 0 closed, 1 half-open, 2 open.",
+    ("breaker",),
+    _collect_states,
+))
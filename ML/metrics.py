@@ -0,0 +1,256 @@
+"""
+In-process metrics exposed at /metrics in the Prometheus text format.
+
+These families cover where time goes under load:
+
+- canteen_http_request_duration_seconds{method,route,status}: per-route
+  latency, recorded by `MetricsMiddleware` against the route template
+  (`/recommend/category/{cat}`), not the raw path.
+- canteen_stage_duration_seconds{stage}: internal stages timed with
+  `with stage("similarity_lookup"): ...` in the recommenders, the data
+  cache, the serializer and the chat service.
+- canteen_cache_events_total{cache,result}: hits, misses and 304s of the
+  response cache and the menu search cache.
+- canteen_singleflight_calls_total{flight,key,result}: calls coalesced by
+  `ML.singleflight` ("leader" computed, "shared" waited for the leader,
+  "error" got the leader's exception), keyed by route or service.
+- canteen_admission_*{group}: concurrency limit, in-flight and queued
+  requests per `ML.admission` route group, and requests shed with a 503.
+- canteen_circuit_*{breaker}: state (0 closed, 1 half-open, 2 open) and call
+  outcomes of `ML.circuit_breaker` breakers, plus the chat replies served
+  from a fallback while the LLM is failing or slow.
+
+Set CANTEEN_METRICS=0 to turn everything off: `stage()` then hands back one
+shared no-op context manager, `cache_event()` returns immediately and the
+middleware is not installed. Metrics are per process; with several gunicorn
+workers each one reports its own.
+"""
+
+import bisect
+import os
+import threading
+import time
+from contextlib import nullcontext
+
+ENABLED = os.getenv("CANTEEN_METRICS", "1") == "1"
+
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05,
+                   0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _labels(names, values):
+    if not names:
+        return ""
+    return "{" + ",".join(f'{n}="{_escape(v)}"' for n, v in zip(names, values)) + "}"
+
+
+class Counter:
+    def __init__(self, name, help_text, labelnames=()):
+        self.name = name
+        self.help = help_text
+        self.labelnames = labelnames
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *labels, amount=1):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            for labels, value in sorted(self._values.items()):
+                lines.append(f"{self.name}{_labels(self.labelnames, labels)} {value}")
+        return lines
+
+
+class Histogram:
+    def __init__(self, name, help_text, labelnames=(), buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.help = help_text
+        self.labelnames = labelnames
+        self.buckets = tuple(buckets)
+        self._series = {}    # labels -> [bucket counts..., +Inf count, sum]
+        self._lock = threading.Lock()
+
+    def observe(self, value, *labels):
+        slot = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = [0] * (len(self.buckets) + 2)
+            series[slot] += 1
+            series[-1] += value
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        names = self.labelnames + ("le",)
+        with self._lock:
+            for labels, series in sorted(self._series.items()):
+                cumulative = 0
+                for bound, count in zip(self.buckets + ("+Inf",), series[:-1]):
+                    cumulative += count
+                    lines.append(f"{self.name}_bucket{_labels(names, labels + (bound,))} {cumulative}")
+                lines.append(f"{self.name}_sum{_labels(self.labelnames, labels)} {series[-1]}")
+                lines.append(f"{self.name}_count{_labels(self.labelnames, labels)} {cumulative}")
+        return lines
+
+
+class Gauge:
+    """
+    Current values, read at scrape time.
+
+    `collect` is a callable returning {label tuple: value}; the admission
+    limiters and circuit breakers already track their state, so nothing is
+    updated on the request path.
+    """
+
+    def __init__(self, name, help_text, labelnames, collect):
+        self.name = name
+        self.help = help_text
+        self.labelnames = labelnames
+        self.collect = collect
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} gauge"]
+        for labels, value in sorted(self.collect().items()):
+            lines.append(f"{self.name}{_labels(self.labelnames, labels)} {value}")
+        return lines
+
+
+REQUEST_LATENCY = Histogram(
+    "canteen_http_request_duration_seconds",
+    "HTTP request latency by route template.",
+    ("method", "route", "status"),
+)
+STAGE_LATENCY = Histogram(
+    "canteen_stage_duration_seconds",
+    "Time spent in internal stages (data load, ranking, similarity, LLM, serialization).",
+    ("stage",),
+)
+CACHE_EVENTS = Counter(
+    "canteen_cache_events_total",
+    "Cache lookups by cache and result.",
+    ("cache", "result"),
+)
+
+SINGLEFLIGHT_CALLS = Counter(
+    "canteen_singleflight_calls_total",
+    "Calls per single-flight group and key, by leader/shared/error.",
+    ("flight", "key", "result"),
+)
+
+ADMISSION_REJECTED = Counter(
+    "canteen_admission_rejected_total",
+    "Requests shed by admission control, by route group and reason.",
+    ("group", "reason"),
+)
+CIRCUIT_CALLS = Counter(
+    "canteen_circuit_calls_total",
+    "Calls through a circuit breaker by outcome (success, failure, slow, rejected).",
+    ("breaker", "result"),
+)
+CHAT_FALLBACKS = Counter(
+    "canteen_chat_fallbacks_total",
+    "Chat replies not produced by the LLM, by source (cache, local) and reason.",
+    ("source", "reason"),
+)
+
+REGISTRY = [REQUEST_LATENCY, STAGE_LATENCY, CACHE_EVENTS, SINGLEFLIGHT_CALLS,
+            ADMISSION_REJECTED, CIRCUIT_CALLS, CHAT_FALLBACKS]
+
+
+def register(metric):
+    """Add a metric defined elsewhere (e.g. a Gauge over module state)."""
+    REGISTRY.append(metric)
+    return metric
+
+
+class _Stage:
+    __slots__ = ("name", "t0")
+
+    def __init__(self, name):
+        self.name = name
+
+    def __enter__(self):
+        self.t0 = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        STAGE_LATENCY.observe(time.perf_counter() - self.t0, self.name)
+        return False
+
+
+_NOOP = nullcontext()
+
+
+def stage(name):
+    """Context manager timing one internal stage; a shared no-op when disabled."""
+    return _Stage(name) if ENABLED else _NOOP
+
+
+def cache_event(cache, result):
+    if ENABLED:
+        CACHE_EVENTS.inc(cache, result)
+
+
+def singleflight_event(flight, key, result):
+    if ENABLED:
+        SINGLEFLIGHT_CALLS.inc(flight, key, result)
+
+
+def admission_rejected(group, reason):
+    if ENABLED:
+        ADMISSION_REJECTED.inc(group, reason)
+
+
+def circuit_call(breaker, result):
+    if ENABLED:
+        CIRCUIT_CALLS.inc(breaker, result)
+
+
+def chat_fallback(source, reason):
+    if ENABLED:
+        CHAT_FALLBACKS.inc(source, reason)
+
+
+def render():
+    lines = []
+    for metric in REGISTRY:
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
+
+
+class MetricsMiddleware:
+    """Pure ASGI middleware (no BaseHTTPMiddleware body buffering) timing each request."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        status = 500
+        t0 = time.perf_counter()
+
+        async def send_wrapper(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            # The router stores the matched route in the scope it was given.
+            route = scope.get("route")
+            path = getattr(route, "path", None) or "unmatched"
+            REQUEST_LATENCY.observe(time.perf_counter() - t0, scope["method"], path, status)
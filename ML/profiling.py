@@ -0,0 +1,214 @@
+"""
+On-demand sampling profiler for the recommendation and chat handlers.
+
+Off unless CANTEEN_PROFILING_TOKEN is set. With it set, two triggers exist,
+both requiring the token:
+
+- Single request: send `X-Profile-Token: <token>` with a request under
+  /recommend, /chat or /personal. The response carries `X-Profile-Id`; fetch
+  the stacks from GET /admin/profile/{id}.
+- Time window: POST /admin/profile/start?seconds=N samples the whole process
+  for N seconds (capped at MAX_WINDOW_SECONDS) and then stops by itself.
+
+A background thread samples `sys._current_frames()` every SAMPLE_INTERVAL
+seconds, so the cost is bounded by the sampling rate rather than by call
+count, and every capture has a hard sample cap. Profiles are kept as collapsed
+stacks ("frame;frame;frame count" lines, the input format of flamegraph.pl and
+speedscope) in a small in-memory ring and, if CANTEEN_PROFILE_DIR is set, also
+written there as <id>.folded.
+"""
+
+import hmac
+import itertools
+import os
+import sys
+import threading
+import time
+from collections import Counter, OrderedDict
+
+TOKEN = os.getenv("CANTEEN_PROFILING_TOKEN", "")
+ENABLED = bool(TOKEN)
+PROFILE_DIR = os.getenv("CANTEEN_PROFILE_DIR", "")
+
+HEADER = "x-profile-token"
+PROFILED_PREFIXES = ("/recommend", "/chat", "/personal")
+
+SAMPLE_INTERVAL = 0.005
+MAX_SAMPLES = 20000
+MAX_WINDOW_SECONDS = 60
+KEEP_PROFILES = 20
+
+# Leaf frames in these files mean the thread is parked (idle pool workers,
+# the event loop waiting in select) and the sample is dropped.
+IDLE_FILES = ("threading.py", "selectors.py", "queue.py")
+
+_ids = itertools.count(1)
+_profiles = OrderedDict()
+_profiles_lock = threading.Lock()
+_active = threading.Lock()    # one capture at a time keeps the overhead bounded
+
+
+def check_token(value):
+    # compare_digest only takes ASCII str, so compare bytes: any header value is
+    # then a plain mismatch rather than a TypeError.
+    return ENABLED and value is not None and hmac.compare_digest(value.encode(), TOKEN.encode())
+
+
+def _frame_label(frame):
+    code = frame.f_code
+    return f"{os.path.basename(code.co_filename)}:{code.co_name}"
+
+
+class StackSampler:
+    """Samples every other thread's Python stack on a fixed interval."""
+
+    def __init__(self, interval=SAMPLE_INTERVAL, max_samples=MAX_SAMPLES):
+        self.interval = interval
+        self.max_samples = max_samples
+        self.stacks = Counter()
+        self.samples = 0
+        self._stop = threading.Event()
+        self._thread = None
+        self.started = None
+        self.duration = 0.0
+
+    def start(self):
+        self.started = time.time()
+        self._thread = threading.Thread(target=self._run, name="stack-sampler", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+        self.duration = time.time() - self.started
+        return self
+
+    def _run(self):
+        own = threading.get_ident()
+        while not self._stop.wait(self.interval) and self.samples < self.max_samples:
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == own or frame.f_code.co_filename.endswith(IDLE_FILES):
+                    continue
+                stack = []
+                while frame is not None:
+                    stack.append(_frame_label(frame))
+                    frame = frame.f_back
+                self.stacks[";".join(reversed(stack))] += 1
+            self.samples += 1
+
+    def collapsed(self):
+        return "\n".join(f"{stack} {count}" for stack, count in self.stacks.most_common())
+
+
+def _new_id():
+    return f"{int(time.time())}-{next(_ids)}"
+
+
+def _store(kind, label, sampler, profile_id=None):
+    profile_id = profile_id or _new_id()
+    profile = {
+        "id": profile_id,
+        "kind": kind,
+        "target": label,
+        "started": sampler.started,
+        "duration_s": round(sampler.duration, 4),
+        "samples": sampler.samples,
+        "interval_s": sampler.interval,
+        "collapsed": sampler.collapsed(),
+    }
+    with _profiles_lock:
+        _profiles[profile_id] = profile
+        while len(_profiles) > KEEP_PROFILES:
+            _profiles.popitem(last=False)
+
+    if PROFILE_DIR:
+        os.makedirs(PROFILE_DIR, exist_ok=True)
+        with open(os.path.join(PROFILE_DIR, f"{profile_id}.folded"), "w") as f:
+            f.write(profile["collapsed"] + "\n")
+    return profile_id
+
+
+def get_profile(profile_id):
+    with _profiles_lock:
+        return _profiles.get(profile_id)
+
+
+def list_profiles():
+    with _profiles_lock:
+        return [{k: v for k, v in p.items() if k != "collapsed"} for p in _profiles.values()]
+
+
+def start_window(seconds):
+    """
+    Sample the whole process for `seconds` in the background.
+
+    Returns the profile id the capture will be stored under, or None if a
+    capture is already running.
+    """
+    seconds = min(max(float(seconds), 0.1), MAX_WINDOW_SECONDS)
+    if not _active.acquire(blocking=False):
+        return None
+
+    sampler = StackSampler()
+    profile_id = _new_id()
+
+    def run():
+        try:
+            sampler.start()
+            time.sleep(seconds)
+            sampler.stop()
+            _store("window", f"{seconds:g}s", sampler, profile_id)
+        finally:
+            _active.release()
+
+    threading.Thread(target=run, name="profile-window", daemon=True).start()
+    return profile_id
+
+
+class ProfilingMiddleware:
+    """Profiles single requests that carry a valid X-Profile-Token header."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not scope["path"].startswith(PROFILED_PREFIXES):
+            await self.app(scope, receive, send)
+            return
+
+        headers = dict(scope["headers"])
+        token = headers.get(HEADER.encode())
+        if token is None or not check_token(token.decode("latin-1")):
+            await self.app(scope, receive, send)
+            return
+
+        if not _active.acquire(blocking=False):
+            await self.app(scope, receive, send)
+            return
+
+        sampler = StackSampler().start()
+        started_messages = []
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                # Hold the headers until the handler is done so the id can be added.
+                started_messages.append(message)
+                return
+            if started_messages and message["type"] == "http.response.body":
+                start = started_messages.pop()
+                if not message.get("more_body", False):
+                    sampler.stop()
+                    profile_id = _store("request", f"{scope['method']} {scope['path']}", sampler)
+                    start = {**start, "headers": list(start["headers"]) +
+                             [(b"x-profile-id", profile_id.encode())]}
+                await send(start)
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            if sampler.duration == 0.0:
+                sampler.stop()
+            _active.release()
@@ -0,0 +1,143 @@
+"""
+Request coalescing ("single flight") for expensive identical calls.
+
+At peak, many identical requests (the same `/recommend/popular?top_n=10`, the
+same chat question) arrive within a few milliseconds of each other. Wrapping
+the expensive part in `flight.do(key, fn)` makes the first caller for a key
+the leader, which runs `fn`; callers arriving while it is still running wait
+for that one result instead of recomputing it. If `fn` raises, every waiter
+gets the same exception. Nothing is cached: once the leader finishes, the
+next call for the key starts a new flight, so the caller decides freshness
+through the key (include the data version in it).
+
+`SingleFlight` is for blocking code called from threads (sync FastAPI routes
+run in the threadpool); `AsyncSingleFlight` is for coroutines on one event
+loop, and its `do_many` coalesces batch lookups key by key. Every call is
+counted in canteen_singleflight_calls_total under the flight name and a
+caller-chosen `metric_key`. The metric key should stay low-cardinality, such
+as the route template, not the raw dedup key.
+"""
+
+import asyncio
+import threading
+
+from ML import metrics
+
+
+class _Call:
+    __slots__ = ("done", "result", "error")
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    """Thread-safe coalescing of concurrent blocking calls with equal keys."""
+
+    def __init__(self, name):
+        self.name = name
+        self._calls = {}
+        self._lock = threading.Lock()
+
+    def in_flight(self):
+        with self._lock:
+            return len(self._calls)
+
+    def do(self, key, fn, metric_key="-"):
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+
+        if leader:
+            try:
+                call.result = fn()
+            except BaseException as e:
+                call.error = e
+                metrics.singleflight_event(self.name, metric_key, "error")
+                raise
+            finally:
+                with self._lock:
+                    del self._calls[key]
+                call.done.set()
+            metrics.singleflight_event(self.name, metric_key, "leader")
+            return call.result
+
+        call.done.wait()
+        if call.error is not None:
+            metrics.singleflight_event(self.name, metric_key, "error")
+            raise call.error
+        metrics.singleflight_event(self.name, metric_key, "shared")
+        return call.result
+
+
+class AsyncSingleFlight:
+    """
+    Coalescing of concurrent coroutine calls with equal keys on one loop.
+
+    The work runs as its own task and every caller awaits it through
+    `asyncio.shield`, so a caller that is cancelled (client went away) does
+    not cancel the result the other waiters are waiting for.
+    """
+
+    def __init__(self, name):
+        self.name = name
+        self._tasks = {}
+
+    def in_flight(self):
+        return len(self._tasks)
+
+    def _forget(self, key, task):
+        if self._tasks.get(key) is task:
+            del self._tasks[key]
+        if not task.cancelled():
+            task.exception()    # retrieved, even if every waiter was cancelled
+
+    async def do(self, key, coro_fn, metric_key="-"):
+        task = self._tasks.get(key)
+        leader = task is None
+        if leader:
+            task = asyncio.ensure_future(coro_fn())
+            self._tasks[key] = task
+            task.add_done_callback(lambda t: self._forget(key, t))
+
+        try:
+            result = await asyncio.shield(task)
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            metrics.singleflight_event(self.name, metric_key, "error")
+            raise
+        metrics.singleflight_event(self.name, metric_key, "leader" if leader else "shared")
+        return result
+
+    async def do_many(self, keys, coro_fn, metric_key="-"):
+        """
+        {key: result} for several keys at once. Keys already in flight join
+        those calls; the rest share one new call, `coro_fn(rest)`, which must
+        return a dict covering them. Calls made with `do()` on the same flight
+        must then also return {key: result} dicts.
+        """
+        tasks = {key: self._tasks[key] for key in keys if key in self._tasks}
+        rest = [key for key in keys if key not in tasks]
+        if rest:
+            task = asyncio.ensure_future(coro_fn(rest))
+            for key in rest:
+                self._tasks[key] = task
+                task.add_done_callback(lambda t, key=key: self._forget(key, t))
+            tasks.update(dict.fromkeys(rest, task))
+
+        results = {}
+        try:
+            for task in dict.fromkeys(tasks.values()):
+                results.update(await asyncio.shield(task))
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            metrics.singleflight_event(self.name, metric_key, "error")
+            raise
+        metrics.singleflight_event(self.name, metric_key, "leader" if rest else "shared")
+        return {key: results[key] for key in keys}
@@ -0,0 +1,93 @@
+"""
+Cold-start cost of loading the dataset: raw CSV parsing vs. the columnar cache.
+
+    python -m benchmarks.bench_cold_start --rows 5000000
+
+Each variant runs in a fresh interpreter so time and peak RSS are not shared.
+"csv x3" mirrors the old startup path, which parsed the dataset at
+general_recommendation import, in ContentBasedRecommender.__init__ and in the
+chat service. For the Feather variant it also reports how many columns are
+views over the memory-mapped file rather than private copies.
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+from benchmarks.synthetic import write_dataset_csv
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+CHILD = r"""
+import json, sys, time
+t0 = time.perf_counter()
+mode, path, cache = sys.argv[1:4]
+shared = None
+if mode == "csv":
+    import pandas as pd
+    for _ in range(3):
+        df = pd.read_csv(path)
+else:
+    from ML.Data.columnar_cache import read_cache
+    df = read_cache(cache)
+    # Touch every column like the recommenders do at startup.
+    df.groupby("item_id", observed=True)["purchase_count"].sum()
+    arrays = [(s.cat.codes if s.dtype.name == "category" else s).to_numpy() for _, s in df.items()]
+    shared = f"{sum(not a.flags.owndata for a in arrays)}/{len(arrays)}"
+elapsed = time.perf_counter() - t0
+# VmHWM rather than ru_maxrss: the latter can carry the parent's peak over exec.
+with open("/proc/self/status") as f:
+    rss_mb = next(int(l.split()[1]) for l in f if l.startswith("VmHWM")) / 1024
+print(json.dumps({"mode": mode, "rows": len(df), "seconds": elapsed, "peak_rss_mb": rss_mb,
+                  "zero_copy_columns": shared}))
+"""
+
+
+def run_child(mode, csv_path, cache_path):
+    out = subprocess.run(
+        [sys.executable, "-c", CHILD, mode, csv_path, cache_path],
+        cwd=ROOT, check=True, capture_output=True, text=True,
+    )
+    return json.loads(out.stdout.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--rows", type=int, default=5_000_000)
+    parser.add_argument("--items", type=int, default=24)
+    parser.add_argument("--workdir", default=None)
+    args = parser.parse_args()
+
+    from ML.Data.columnar_cache import build_cache
+
+    workdir = args.workdir or tempfile.mkdtemp(prefix="canteen-bench-")
+    os.makedirs(workdir, exist_ok=True)
+    csv_path = os.path.join(workdir, "canteen_recommendation_dataset.csv")
+    cache_path = os.path.join(workdir, "canteen_recommendation_dataset.feather")
+
+    if not os.path.exists(csv_path):
+        t0 = time.perf_counter()
+        write_dataset_csv(csv_path, args.rows, n_items=args.items)
+        print(f"generated {args.rows} rows in {time.perf_counter() - t0:.1f}s")
+
+    t0 = time.perf_counter()
+    build_cache(csv_path, cache_path)
+    build_seconds = time.perf_counter() - t0
+
+    results = [run_child("csv", csv_path, cache_path), run_child("feather", csv_path, cache_path)]
+    print(f"{'mode':<10}{'rows':>12}{'seconds':>10}{'peak RSS MB':>14}")
+    for r in results:
+        print(f"{r['mode']:<10}{r['rows']:>12}{r['seconds']:>10.2f}{r['peak_rss_mb']:>14.0f}"
+              + (f"  zero-copy columns {r['zero_copy_columns']}" if r["zero_copy_columns"] else ""))
+    print(f"one-off cache build: {build_seconds:.2f}s, "
+          f"csv {os.path.getsize(csv_path) / 2**20:.0f} MB, "
+          f"feather {os.path.getsize(cache_path) / 2**20:.0f} MB")
+    print(json.dumps({"build_seconds": build_seconds, "results": results}))
+
+
+if __name__ == "__main__":
+    main()
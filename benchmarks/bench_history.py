@@ -0,0 +1,190 @@
+"""
+Cost of per-user purchase history with and without the mongo_store cache.
+
+    python -m benchmarks.bench_history --users 2000 --rows 200000 --rtt-ms 2
+
+Purchases live in an in-memory stand-in for the `purchases` collection that
+adds --rtt-ms of latency to every query, like a round-trip to Mongo. Reports
+Mongo queries and latency for:
+
+- cold: one `recent_items()` per user, cache empty (one query each)
+- warm: the same users again, served from the LRU + TTL cache
+- batch: `recent_items_many()` for --batch users at a time, cache empty
+- concurrent: --batch simultaneous requests for one cold user (coalesced),
+  half through `recent_items()` and half through `recent_items_many()`, the
+  path /personal/hybrid takes
+- overlapping: concurrent batches that share users fetch each user once
+- timeout: a caller that gives up (as /personal/hybrid does after
+  HISTORY_TIMEOUT) does not cancel the fetch, which still fills the cache
+- capped: no user's answer ships more than `limit` orders from Mongo
+
+Also checks that cached, batched and uncached answers agree. Exits non-zero
+if they do not, if a batch or the concurrent burst takes more than one query,
+if overlapping batches or an abandoned fetch cost extra queries, or if a
+user's answer ships more than `limit` orders.
+"""
+
+import argparse
+import asyncio
+import statistics
+import sys
+import time
+
+from benchmarks.synthetic import (
+    InMemoryMongo,
+    _AsyncCursor,
+    make_dataset,
+    make_purchase_docs,
+    run_pipeline,
+)
+
+
+class _SlowCursor(_AsyncCursor):
+    def __init__(self, docs, rtt):
+        super().__init__(docs)
+        self._rtt = rtt
+
+    async def __anext__(self):
+        if self._rtt:
+            await asyncio.sleep(self._rtt)
+            self._rtt = 0
+        return await super().__anext__()
+
+
+class SlowMongo(InMemoryMongo):
+    def __init__(self, docs, rtt):
+        super().__init__(docs)
+        self.rtt = rtt
+        self.keys = 0
+        self.shipped = 0    # most orders returned for any one user
+        self.by_user = {}
+        for doc in docs:
+            self.by_user.setdefault(doc["userId"], []).append(doc)
+
+    def aggregate(self, pipeline):
+        # Index on userId, as the real collection would have.
+        self.queries += 1
+        users = pipeline[0]["$match"]["userId"]["$in"]
+        self.keys += len(users)
+        docs = [doc for user in users for doc in self.by_user.get(user, [])]
+        docs = run_pipeline(docs, pipeline[1:])
+        self.shipped = max(self.shipped, *(len(doc["orders"]) for doc in docs), 0)
+        return _SlowCursor(docs, self.rtt)
+
+
+async def timed(calls):
+    samples = []
+    for call in calls:
+        t0 = time.perf_counter()
+        await call()
+        samples.append(time.perf_counter() - t0)
+    return samples
+
+
+def describe(name, samples, queries, per):
+    ms = sorted(s * 1000 for s in samples)
+    print(f"  {name:<11} {len(ms):>5} calls  {queries:>5} queries  median {statistics.median(ms):7.3f} ms  "
+          f"p99 {ms[int(len(ms) * 0.99) - 1]:7.3f} ms  ({sum(ms) / per:.3f} ms per user)")
+
+
+async def run(args):
+    from ML.Data.mongo_store import PurchaseHistory
+
+    df = make_dataset(args.rows, n_users=args.users)
+    db = SlowMongo(make_purchase_docs(df), args.rtt_ms / 1000)
+    users = sorted(db.by_user)
+    print(f"{len(db.docs)} purchases, {len(users)} users, {args.rtt_ms} ms per query")
+
+    history = PurchaseHistory(db)
+    q0 = db.queries
+    cold = await timed(lambda u=u: history.recent_items(u) for u in users)
+    describe("cold", cold, db.queries - q0, len(users))
+    expected = {u: await history.recent_items(u) for u in users}
+
+    q0 = db.queries
+    warm = await timed(lambda u=u: history.recent_items(u) for u in users)
+    describe("warm", warm, db.queries - q0, len(users))
+
+    batched = PurchaseHistory(db)
+    batches = [users[i:i + args.batch] for i in range(0, len(users), args.batch)]
+    results = {}
+    q0 = db.queries
+    batch = await timed(lambda b=b: _collect(batched, b, results) for b in batches)
+    batch_queries = db.queries - q0
+    describe("batch", batch, batch_queries, len(users))
+
+    burst = PurchaseHistory(db)
+    q0 = db.queries
+    t0 = time.perf_counter()
+    answers = await asyncio.gather(
+        *(burst.recent_items(users[0]) for _ in range(args.batch // 2)),
+        *(_one(burst, users[0]) for _ in range(args.batch - args.batch // 2)))
+    burst_s = time.perf_counter() - t0
+    burst_queries = db.queries - q0
+    print(f"  {'concurrent':<11} {args.batch:>5} calls  {burst_queries:>5} queries  "
+          f"total {burst_s * 1000:7.3f} ms")
+
+    overlapping = PurchaseHistory(db)
+    window = users[:args.batch]
+    q0, k0 = db.queries, db.keys
+    await asyncio.gather(*(_collect(overlapping, window[i:i + args.batch // 2], results)
+                           for i in range(0, args.batch // 2 + 1, max(args.batch // 4, 1))))
+    overlap_queries, overlap_keys = db.queries - q0, db.keys - k0
+    print(f"  {'overlapping':<11} {overlap_queries:>5} queries asking for {overlap_keys} users "
+          f"({len(window)} distinct)")
+
+    abandoned = PurchaseHistory(db)
+    q0 = db.queries
+    try:
+        await asyncio.wait_for(abandoned.recent_items_many([users[1]]), args.rtt_ms / 4000)
+        gave_up = False
+    except asyncio.TimeoutError:
+        gave_up = True
+    await asyncio.sleep(args.rtt_ms / 500)
+    survived = abandoned.cache.get(users[1]) == expected[users[1]]
+    timeout_queries = db.queries - q0
+    print(f"  {'timeout':<11} caller gave up: {gave_up}, fetch completed and cached: {survived}")
+    heaviest = max(len(docs) for docs in db.by_user.values())
+    print(f"  {'capped':<11} heaviest user has {heaviest} orders, "
+          f"at most {db.shipped} shipped for any user")
+
+    ok = True
+    if results != expected or any(a != expected[users[0]] for a in answers):
+        print("FAIL: cached, batched and concurrent answers differ")
+        ok = False
+    if batch_queries != len(batches) or burst_queries != 1:
+        print("FAIL: expected one query per batch and one for the concurrent burst")
+        ok = False
+    if overlap_keys != len(window):
+        print("FAIL: overlapping batches refetched users already in flight")
+        ok = False
+    if db.shipped > history.limit:
+        print("FAIL: Mongo returned more than `limit` orders for a user")
+        ok = False
+    if args.rtt_ms and not (gave_up and survived and timeout_queries == 1):
+        print("FAIL: an abandoned fetch was cancelled instead of filling the cache")
+        ok = False
+    print("PASS" if ok else "FAIL")
+    return ok
+
+
+async def _one(history, user_id):
+    return (await history.recent_items_many([user_id]))[user_id]
+
+
+async def _collect(history, user_ids, results):
+    results.update(await history.recent_items_many(user_ids))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--users", type=int, default=2_000)
+    parser.add_argument("--rows", type=int, default=200_000)
+    parser.add_argument("--rtt-ms", type=float, default=2.0)
+    parser.add_argument("--batch", type=int, default=100)
+    args = parser.parse_args()
+    sys.exit(0 if asyncio.run(run(args)) else 1)
+
+
+if __name__ == "__main__":
+    main()
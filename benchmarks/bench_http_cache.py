@@ -0,0 +1,78 @@
+"""
+Per-request cost of the cached read endpoints.
+
+    python -m benchmarks.bench_http_cache --requests 500
+
+For each route, times in-process requests (Starlette TestClient, so no network)
+in four modes: uncached (response cache cleared before every call), cached
+body, cached body with gzip/brotli negotiated, and a conditional request that
+is answered with 304. Also reports the bytes sent in each mode.
+"""
+
+import argparse
+import json
+import os
+import statistics
+import time
+
+os.environ.setdefault("CANTEEN_LAZY_STARTUP", "1")
+
+from fastapi.testclient import TestClient  # noqa: E402
+
+from ML.API.responses import response_cache  # noqa: E402
+from main import app  # noqa: E402
+
+ROUTES = [
+    "/recommend/menu",
+    "/recommend/popular?limit=10",
+    "/recommend/highest-rated?top_n=10",
+]
+
+
+def time_requests(client, path, n, headers=None, clear=False):
+    samples = []
+    size = 0
+    for _ in range(n):
+        if clear:
+            response_cache.clear()
+        t0 = time.perf_counter()
+        response = client.get(path, headers=headers or {})
+        samples.append(time.perf_counter() - t0)
+        size = int(response.headers.get("content-length", len(response.content)))
+    return {
+        "status": response.status_code,
+        "median_us": round(statistics.median(samples) * 1e6, 1),
+        "p95_us": round(sorted(samples)[int(len(samples) * 0.95) - 1] * 1e6, 1),
+        "bytes": size,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--requests", type=int, default=500)
+    args = parser.parse_args()
+
+    results = {}
+    with TestClient(app) as client:
+        for path in ROUTES:
+            etag = client.get(path).headers["etag"]
+            identity = {"Accept-Encoding": "identity"}
+            results[path] = {
+                "uncached": time_requests(client, path, args.requests, identity, clear=True),
+                "cached": time_requests(client, path, args.requests, identity),
+                "cached_compressed": time_requests(
+                    client, path, args.requests, {"Accept-Encoding": "br, gzip"}),
+                "not_modified": time_requests(
+                    client, path, args.requests, {"If-None-Match": etag, **identity}),
+            }
+
+    for path, modes in results.items():
+        print(path)
+        for mode, r in modes.items():
+            print(f"  {mode:<18} {r['status']}  median {r['median_us']:>9} us  "
+                  f"p95 {r['p95_us']:>9} us  {r['bytes']:>7} B")
+    print(json.dumps(results))
+
+
+if __name__ == "__main__":
+    main()
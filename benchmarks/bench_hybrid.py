@@ -0,0 +1,82 @@
+"""
+Per-request latency of the hybrid ranker.
+
+    python -m benchmarks.bench_hybrid --items 1000 10000 --users 5000
+
+For each catalog size it fits PersonalizedHybridRecommender on a synthetic
+purchase log, reloads it from the .npz, and times `recommend()` for known
+users, unknown users (popularity only) and unknown users with seed items.
+Exits non-zero if a median goes over --budget-ms (1 ms by default).
+"""
+
+import argparse
+import contextlib
+import io
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+from benchmarks.synthetic import make_dataset, make_items
+
+
+def timed(fn, args_list):
+    samples = []
+    for args in args_list:
+        t0 = time.perf_counter()
+        fn(*args)
+        samples.append(time.perf_counter() - t0)
+    ms = sorted(s * 1000 for s in samples)
+    return statistics.median(ms), ms[int(len(ms) * 0.99) - 1]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--items", type=int, nargs="+", default=[1_000, 10_000])
+    parser.add_argument("--users", type=int, default=5_000)
+    parser.add_argument("--rows", type=int, default=300_000)
+    parser.add_argument("--requests", type=int, default=2_000)
+    parser.add_argument("--top-n", type=int, default=10)
+    parser.add_argument("--budget-ms", type=float, default=1.0)
+    args = parser.parse_args()
+
+    from ML.Model.hybrid_recommendation import PersonalizedHybridRecommender
+
+    ok = True
+    for n_items in args.items:
+        df = make_dataset(args.rows, n_users=args.users, items=make_items(n_items), every_item=True)
+        path = os.path.join(tempfile.mkdtemp(prefix="canteen-hybrid-"), "hybrid_model.npz")
+
+        t0 = time.perf_counter()
+        with contextlib.redirect_stdout(io.StringIO()):
+            PersonalizedHybridRecommender.from_dataset(df, model_path=path).save()
+            model = PersonalizedHybridRecommender(path).load()
+        train_s = time.perf_counter() - t0
+
+        users = [model.user_ids[i % len(model.user_ids)] for i in range(args.requests)]
+        seeds = [[model.item_ids[i % len(model.item_ids)]] for i in range(args.requests)]
+        model.recommend(users[0], n=args.top_n)
+
+        rows = {
+            "known user": timed(lambda u: model.recommend(u, n=args.top_n), [(u,) for u in users]),
+            "unknown user": timed(lambda u: model.recommend(u, n=args.top_n),
+                                  [(f"new-{i}",) for i in range(args.requests)]),
+            "unknown + seeds": timed(lambda u, s: model.recommend(u, n=args.top_n, seed_items=s),
+                                     [(f"new-{i}", s) for i, s in enumerate(seeds)]),
+        }
+        print(f"{len(model.item_ids)} items x {len(model.user_ids)} users (fit + save + load {train_s:.2f}s)")
+        if len(model.item_ids) != n_items:
+            print(f"  FAIL: expected a catalogue of {n_items} items")
+            ok = False
+        for name, (median, p99) in rows.items():
+            flag = "" if median <= args.budget_ms else "  <-- over budget"
+            ok &= median <= args.budget_ms
+            print(f"  {name:<16} median {median:7.3f} ms  p99 {p99:7.3f} ms{flag}")
+
+    print("PASS" if ok else "FAIL")
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == "__main__":
+    main()
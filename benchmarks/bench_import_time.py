@@ -0,0 +1,84 @@
+"""
+Import and startup cost of the unified app.
+
+    python -m benchmarks.bench_import_time --runs 5
+
+Measures, each in a fresh interpreter: `import main` wall time, the lifespan
+warm-up (with its per-component split), and the heaviest top-level imports
+reported by `python -X importtime`.
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+CHILD = r"""
+import asyncio, json, time
+t0 = time.perf_counter()
+import main
+imported = time.perf_counter() - t0
+
+async def startup():
+    async with main.app.router.lifespan_context(main.app):
+        pass
+
+t0 = time.perf_counter()
+asyncio.run(startup())
+started = time.perf_counter() - t0
+print(json.dumps({"import": imported, "startup": started,
+                  "components": main.app.state.startup_timings}))
+"""
+
+
+def run_child():
+    out = subprocess.run([sys.executable, "-c", CHILD], cwd=ROOT, check=True,
+                         capture_output=True, text=True)
+    return json.loads(out.stdout.strip().splitlines()[-1])
+
+
+def heaviest_imports(limit):
+    out = subprocess.run([sys.executable, "-X", "importtime", "-c", "import main"],
+                         cwd=ROOT, check=True, capture_output=True, text=True)
+    rows = []
+    for line in out.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        # Nested imports are indented by two extra spaces per level; keep what
+        # `main` pulls in directly and one level below that.
+        if len(name) - len(name.lstrip()) in (3, 5):
+            rows.append((int(cumulative), name.strip()))
+    return sorted(rows, reverse=True)[:limit]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--top", type=int, default=12)
+    args = parser.parse_args()
+
+    runs = [run_child() for _ in range(args.runs)]
+    summary = {
+        "import_median_s": statistics.median(r["import"] for r in runs),
+        "startup_median_s": statistics.median(r["startup"] for r in runs),
+        "components_last_run": runs[-1]["components"],
+        "heaviest_imports_ms": {name: us / 1000 for us, name in heaviest_imports(args.top)},
+    }
+
+    print(f"import main      : {summary['import_median_s'] * 1000:8.1f} ms (median of {args.runs})")
+    print(f"lifespan startup : {summary['startup_median_s'] * 1000:8.1f} ms")
+    for name, seconds in summary["components_last_run"].items():
+        print(f"  {name:<16}: {seconds}")
+    print("heaviest imports below main (cumulative ms):")
+    for name, ms in summary["heaviest_imports_ms"].items():
+        print(f"  {name:<24}{ms:8.1f}")
+    print(json.dumps(summary))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,109 @@
+"""
+Recall vs. latency of the neighbour-search backends in ML.Model.neighbors.
+
+    python -m benchmarks.bench_neighbors --items 10000 50000 200000
+
+Item vectors are the content features of synthetic dishes (category one-hot,
+spice level, price, calories), encoded like ContentBasedRecommender does. With
+--combo-fraction, extra combo items are added whose vectors are two dishes'
+vectors summed, the way a "Burger+Fries" combo would be encoded.
+
+For each catalogue size it builds every backend, saves and reloads its .npz,
+and for --queries random items reports:
+
+- build and load time, index file size
+- query latency (median / p99)
+- recall@k against exact search. Feature vectors have many exact ties, so a
+  returned item counts as a hit when its cosine is at least the k-th exact
+  similarity.
+
+The all-pairs matrix is also timed where it fits (--matrix-max items).
+"""
+
+import argparse
+import os
+import statistics
+import tempfile
+import time
+
+import numpy as np
+
+from benchmarks.synthetic import make_items
+from ML.Model.feature_transformer import ItemFeatureTransformer
+from ML.Model.neighbors import ExactIndex, LSHIndex, load_index
+
+LSH_CONFIGS = [
+    {"n_tables": 4, "n_probes": 1},
+    {"n_tables": 8, "n_probes": 2},
+    {"n_tables": 16, "n_probes": 4},
+]
+
+
+def item_vectors(n_items, combo_fraction, seed=0):
+    items = make_items(n_items, seed=seed)
+    transformer = ItemFeatureTransformer(numeric=("price", "calories"))
+    vectors = transformer.fit_transform(items)
+    n_combos = int(n_items * combo_fraction)
+    if n_combos:
+        rng = np.random.default_rng(seed + 1)
+        pairs = rng.integers(0, n_items, (n_combos, 2))
+        vectors = np.vstack([vectors, vectors[pairs[:, 0]] + vectors[pairs[:, 1]]])
+    return vectors
+
+
+def run_backend(name, build, queries, truth_kth, k):
+    path = os.path.join(tempfile.mkdtemp(prefix="canteen-nn-"), "index.npz")
+    t0 = time.perf_counter()
+    index = build()
+    build_s = time.perf_counter() - t0
+    index.save(path)
+    t0 = time.perf_counter()
+    index = load_index(path)
+    load_s = time.perf_counter() - t0
+
+    latencies, hits = [], 0
+    for q, kth in zip(queries, truth_kth):
+        t0 = time.perf_counter()
+        _, sims = index.query_item(q, k)
+        latencies.append(time.perf_counter() - t0)
+        hits += int((sims >= kth - 1e-6).sum())
+    ms = sorted(l * 1000 for l in latencies)
+    print(f"  {name:<22} build {build_s:7.3f}s  load {load_s:6.3f}s  "
+          f"size {os.path.getsize(path) / 2**20:7.1f} MB  query median {statistics.median(ms):7.3f} ms  "
+          f"p99 {ms[int(len(ms) * 0.99) - 1]:7.3f} ms  recall@{k} {hits / (len(queries) * k):.3f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--items", type=int, nargs="+", default=[10_000, 50_000, 200_000])
+    parser.add_argument("--combo-fraction", type=float, default=0.5)
+    parser.add_argument("--queries", type=int, default=500)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--matrix-max", type=int, default=20_000)
+    args = parser.parse_args()
+
+    for n_items in args.items:
+        vectors = item_vectors(n_items, args.combo_fraction)
+        rng = np.random.default_rng(0)
+        queries = rng.choice(len(vectors), args.queries, replace=False)
+        exact = ExactIndex(vectors)
+        truth_kth = [exact.query_item(q, args.k)[1][-1] for q in queries]
+        print(f"{len(vectors)} items ({n_items} dishes + combos), {vectors.shape[1]} features")
+
+        if len(vectors) <= args.matrix_max:
+            from sklearn.metrics.pairwise import cosine_similarity
+
+            t0 = time.perf_counter()
+            matrix = cosine_similarity(vectors).astype(np.float32)
+            print(f"  {'matrix (all pairs)':<22} build {time.perf_counter() - t0:7.3f}s  "
+                  f"size {matrix.nbytes / 2**20:7.1f} MB")
+            del matrix
+
+        run_backend("exact", lambda: ExactIndex(vectors), queries, truth_kth, args.k)
+        for config in LSH_CONFIGS:
+            name = f"lsh t={config['n_tables']} p={config['n_probes']}"
+            run_backend(name, lambda: LSHIndex(vectors, **config), queries, truth_kth, args.k)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,250 @@
+"""
+Admission control and LLM circuit breaker under a misbehaving LLM.
+
+    python -m benchmarks.bench_overload --flood 120
+
+First checks the CircuitBreaker and RouteLimiter state machines directly
+(thresholds, half-open trial, queue limit and timeout, slot release). Then
+runs the app in-process against a synthetic dataset with a fault-injecting
+fake Gemini client, in these phases:
+
+- healthy: the LLM answers quickly, so chat replies are not degraded
+- slow: the LLM takes longer than the chat timeout. A flood of distinct
+  chat requests is sent while /recommend/popular is pinged. Expected: chat
+  beyond the limit and queue is shed with 503 (with CORS headers), the
+  breaker opens, degraded replies come back fast, abandoned calls stay
+  within the LLM thread pool, and recommend latency stays close to idle.
+- failing: the LLM raises. Expected: the breaker stays open and answers
+  come from the reply cache or the local menu.
+- recovered: the LLM is healthy again. After the open period, one trial
+  call closes the breaker.
+
+Timeouts and breaker thresholds are scaled down so the run takes seconds.
+Exits non-zero if any expectation fails.
+"""
+
+import argparse
+import asyncio
+import os
+import random
+import statistics
+import sys
+import tempfile
+import threading
+import time
+
+import httpx
+
+from benchmarks.bench_suite import configure_app, prepare_data, quiet
+
+
+class FaultyLLM:
+    """Fake Gemini client; `latency`, `error_rate` and `hang` can change mid-run."""
+
+    def __init__(self, latency=0.0, error_rate=0.0, hang=False, seed=0):
+        self.latency = latency
+        self.error_rate = error_rate
+        self.hang = hang
+        self.calls = 0
+        self.models = self
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def generate_content(self, model, contents):
+        with self._lock:
+            self.calls += 1
+            fail = self._rng.random() < self.error_rate
+        if self.hang:
+            time.sleep(3600)
+        if self.latency:
+            time.sleep(self.latency)
+        if fail:
+            raise RuntimeError("injected LLM failure")
+        return type("Reply", (), {"text": f"LLM answer ({len(contents)} turns)"})()
+
+
+def summary(latencies):
+    ms = sorted(l * 1000 for l in latencies)
+    if not ms:
+        return "no samples"
+    return f"median {statistics.median(ms):7.1f} ms  p99 {ms[int(len(ms) * 0.99) - 1 if len(ms) > 1 else 0]:7.1f} ms"
+
+
+async def chat(client, message):
+    t0 = time.perf_counter()
+    response = await client.post("/chat/chat", json={"history": [], "new_message": message})
+    elapsed = time.perf_counter() - t0
+    degraded = response.status_code == 200 and response.json()["degraded"]
+    return response.status_code, degraded, elapsed
+
+
+async def ping(client, done, interval=0.02):
+    latencies = []
+    while not done():
+        t0 = time.perf_counter()
+        response = await client.get("/recommend/popular?top_n=10")
+        response.raise_for_status()
+        latencies.append(time.perf_counter() - t0)
+        await asyncio.sleep(interval)
+    return latencies
+
+
+def check_breaker(check):
+    from ML.circuit_breaker import CircuitBreaker
+
+    print("circuit breaker")
+    breaker = CircuitBreaker("check", failure_rate=0.5, slow_call_seconds=1.0, slow_rate=0.5,
+                             window=4, min_calls=4, open_seconds=0.05)
+    for ok in (True, False, True):
+        breaker.record(ok, 0.0)
+    check("closed below min_calls", breaker.state == "closed" and breaker.allow())
+    breaker.record(False, 0.0)
+    check("opens at the failure rate", breaker.state == "open" and not breaker.allow())
+    time.sleep(0.06)
+    check("one half-open trial after open_seconds", breaker.allow() and not breaker.allow())
+    breaker.record(True, 2.0)
+    check("slow trial re-opens", breaker.state == "open")
+    time.sleep(0.06)
+    breaker.allow()
+    breaker.record(True, 0.0)
+    check("good trial closes and clears the window",
+          breaker.state == "closed" and breaker.snapshot()["recent_calls"] == 0)
+    for _ in range(2):
+        breaker.record(True, 0.0)
+    for _ in range(2):
+        breaker.record(True, 1.5)
+    check("opens at the slow-call rate", breaker.state == "open")
+
+
+async def check_limiter(check):
+    from ML.admission import RouteLimiter
+
+    print("route limiter")
+    limiter = RouteLimiter("check", max_concurrent=2, max_queue=1, queue_timeout=0.05)
+    first = [await limiter.acquire() for _ in range(2)]
+    check("admits up to the limit", first == [None, None] and limiter.in_flight == 2)
+    waiter = asyncio.create_task(limiter.acquire())
+    await asyncio.sleep(0)
+    check("queue full is shed", await limiter.acquire() == "queue_full")
+    check("queued waiter times out", await waiter == "queue_timeout" and limiter.waiting == 0)
+    waiter = asyncio.create_task(limiter.acquire())
+    await asyncio.sleep(0)
+    limiter.release()
+    check("release admits the waiter", await waiter is None and limiter.in_flight == 2)
+    limiter.release()
+    limiter.release()
+    check("all slots free again", limiter.in_flight == 0 and await limiter.acquire() is None)
+
+
+async def run(args):
+    os.environ.setdefault("CANTEEN_LAZY_STARTUP", "1")
+    workdir = tempfile.mkdtemp(prefix="canteen-overload-")
+    data_csv, menu_csv, _ = prepare_data(workdir, args.rows, args.items, args.users)
+    configure_app(workdir, data_csv, menu_csv)
+
+    from ML import admission, chat_api_service, metrics
+    from main import app
+
+    llm = FaultyLLM()
+    chat_api_service.get_client = lambda: llm
+    chat_api_service.LLM_TIMEOUT = 0.5
+    breaker = chat_api_service.llm_breaker
+    breaker.slow_call_seconds = 0.4
+    breaker.open_seconds = 1.0
+    breaker.reset()
+    chat_limiter = admission.limiter_for("/chat/chat")
+    chat_limiter.queue_timeout = 2.0
+
+    checks = []
+
+    def check(name, ok):
+        checks.append(ok)
+        print(f"  {'ok  ' if ok else 'FAIL'} {name}")
+
+    check_breaker(check)
+    await check_limiter(check)
+
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=60) as client:
+        with quiet():
+            await client.get("/recommend/popular?top_n=10")
+            await client.get("/recommend/menu")
+
+        t_end = time.perf_counter() + 1.0
+        idle = await ping(client, lambda: time.perf_counter() > t_end)
+        print(f"idle recommend pings:       {summary(idle)}")
+
+        print("healthy")
+        results = await asyncio.gather(*(chat(client, f"what is good today {i}") for i in range(10)))
+        check("all replies from the LLM", all(s == 200 and not d for s, d, _ in results))
+        check(f"breaker closed ({breaker.state})", breaker.state == "closed")
+
+        print(f"slow (LLM {args.slow_latency}s, timeout {chat_api_service.LLM_TIMEOUT}s)")
+        llm.latency = args.slow_latency
+        flood = asyncio.gather(*(chat(client, f"anything spicy {i}?") for i in range(args.flood)))
+        pings = await ping(client, flood.done)
+        results = await flood
+        llm_threads = sum(t.name.startswith("llm") for t in threading.enumerate())
+        # Hold every chat slot so the next request is shed for sure.
+        for _ in range(chat_limiter.max_concurrent):
+            await chat_limiter.acquire()
+        queue_timeout, chat_limiter.queue_timeout = chat_limiter.queue_timeout, 0.01
+        shed_response = await client.post("/chat/chat", headers={"Origin": "http://app.example"},
+                                          json={"history": [], "new_message": "one more?"})
+        chat_limiter.queue_timeout = queue_timeout
+        for _ in range(chat_limiter.max_concurrent):
+            chat_limiter.release()
+        statuses = [s for s, _, _ in results]
+        shed = statuses.count(503)
+        degraded = [e for s, d, e in results if s == 200 and d]
+        print(f"  chat: {statuses.count(200)} answered ({len(degraded)} degraded), {shed} shed with 503")
+        print(f"  recommend pings during flood: {summary(pings)}")
+        check("excess chat shed with 503", shed > 0)
+        check(f"LLM calls bounded by the pool ({llm_threads} <= {chat_api_service.LLM_THREADS} threads)",
+              llm_threads <= chat_api_service.LLM_THREADS)
+        check("503 carries CORS headers", shed_response.status_code == 503
+              and "access-control-allow-origin" in shed_response.headers)
+        check(f"breaker opened ({breaker.state})", breaker.state == "open")
+        check("degraded replies served", len(degraded) > 0)
+        check("recommend p99 under 10x idle p99 + 50 ms",
+              sorted(pings)[int(len(pings) * 0.99) - 1] < 10 * sorted(idle)[int(len(idle) * 0.99) - 1] + 0.05)
+
+        print("failing (LLM raises)")
+        llm.latency, llm.error_rate = 0.0, 1.0
+        calls_before = llm.calls
+        results = await asyncio.gather(*(chat(client, "What is under 50?") for _ in range(10)))
+        check("breaker open: LLM not called", llm.calls == calls_before)
+        check("all replies degraded", all(s == 200 and d for s, d, _ in results))
+        print(f"  degraded latency: {summary([e for _, _, e in results])}")
+
+        print("recovered")
+        llm.error_rate = 0.0
+        await asyncio.sleep(breaker.open_seconds + 0.1)
+        status, degraded, _ = await chat(client, "what is good today 0")
+        check("trial call answered by the LLM", status == 200 and not degraded)
+        check(f"breaker closed again ({breaker.state})", breaker.state == "closed")
+
+        exported = metrics.render()
+        check("limits and breaker state exported",
+              'canteen_admission_limit{group="chat"}' in exported
+              and 'canteen_circuit_state{breaker="llm"} 0' in exported
+              and "canteen_admission_rejected_total" in exported)
+
+    ok = all(checks)
+    print("PASS" if ok else "FAIL")
+    return ok
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--flood", type=int, default=120, help="concurrent chat requests")
+    parser.add_argument("--slow-latency", type=float, default=2.0)
+    parser.add_argument("--rows", type=int, default=20_000)
+    parser.add_argument("--items", type=int, default=100)
+    parser.add_argument("--users", type=int, default=500)
+    args = parser.parse_args()
+    sys.exit(0 if asyncio.run(run(args)) else 1)
+
+
+if __name__ == "__main__":
+    main()
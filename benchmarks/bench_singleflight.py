@@ -0,0 +1,181 @@
+"""
+Request coalescing under a burst of identical requests.
+
+    python -m benchmarks.bench_singleflight --burst 50
+
+Sends --burst identical requests at once through an in-process ASGI client,
+against a synthetic dataset, for:
+
+- GET /recommend/popular?top_n=10 with an empty response cache
+- GET /recommend/similar?item_name=...
+- POST /chat/chat with a fake LLM that takes --llm-latency seconds and
+  counts its calls
+
+For each it reports the wall time and how many computations actually ran (from
+canteen_singleflight_calls_total). Then it checks that an error raised by
+the leader reaches every waiter, for both the threaded and the async flight.
+Exits non-zero if a burst computed more than once per wave or an error was lost.
+"""
+
+import argparse
+import asyncio
+import os
+import sys
+import tempfile
+import threading
+import time
+
+import httpx
+
+from benchmarks.bench_suite import FakeLLM, configure_app, prepare_data, quiet
+
+
+class CountingLLM(FakeLLM):
+    def __init__(self, latency):
+        super().__init__(latency)
+        self.calls = 0
+        self._lock = threading.Lock()
+
+    def generate_content(self, model, contents):
+        with self._lock:
+            self.calls += 1
+        return super().generate_content(model, contents)
+
+
+def flight_counts(flight):
+    from ML import metrics
+
+    counts = {}
+    for (name, _key, result), value in metrics.SINGLEFLIGHT_CALLS._values.items():
+        if name == flight:
+            counts[result] = counts.get(result, 0) + value
+    return counts
+
+
+async def burst(client, n, method, path, json=None):
+    t0 = time.perf_counter()
+    responses = await asyncio.gather(*(client.request(method, path, json=json) for _ in range(n)))
+    elapsed = time.perf_counter() - t0
+    statuses = {r.status_code for r in responses}
+    bodies = {r.content for r in responses}
+    return elapsed, statuses, len(bodies)
+
+
+def check_thread_errors(n):
+    from ML.singleflight import SingleFlight
+
+    flight = SingleFlight("bench_error")
+    calls = []
+    errors = []
+    gate = threading.Barrier(n)
+
+    def fail():
+        calls.append(1)
+        time.sleep(0.05)
+        raise ValueError("boom")
+
+    def worker():
+        gate.wait()
+        try:
+            flight.do("key", fail)
+        except ValueError as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=worker) for _ in range(n)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return len(calls), len(errors)
+
+
+async def check_async_errors(n):
+    from ML.singleflight import AsyncSingleFlight
+
+    flight = AsyncSingleFlight("bench_error_async")
+    calls = []
+
+    async def fail():
+        calls.append(1)
+        await asyncio.sleep(0.05)
+        raise ValueError("boom")
+
+    results = await asyncio.gather(*(flight.do("key", fail) for _ in range(n)),
+                                   return_exceptions=True)
+    return len(calls), sum(isinstance(r, ValueError) for r in results)
+
+
+async def run(args):
+    os.environ.setdefault("CANTEEN_LAZY_STARTUP", "1")
+    # Admission control would shed part of the burst; coalescing is measured alone.
+    os.environ.setdefault("CANTEEN_ADMISSION", "0")
+    workdir = tempfile.mkdtemp(prefix="canteen-singleflight-")
+    data_csv, menu_csv, _ = prepare_data(workdir, args.rows, args.items, args.users)
+    configure_app(workdir, data_csv, menu_csv)
+
+    from ML import chat_api_service
+    from ML.API.responses import response_cache
+    from main import app
+
+    llm = CountingLLM(args.llm_latency)
+    chat_api_service.get_client = lambda: llm
+
+    ok = True
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        with quiet():
+            # Build the lazy models first so the burst measures the request path.
+            await client.get("/recommend/popular?top_n=10")
+            await client.get("/recommend/similar?item_name=Samosa&limit=5")
+
+        response_cache.clear()
+        before = flight_counts("response_cache")
+        elapsed, statuses, distinct = await burst(client, args.burst, "GET", "/recommend/popular?top_n=10")
+        after = flight_counts("response_cache")
+        leaders = after.get("leader", 0) - before.get("leader", 0)
+        shared = after.get("shared", 0) - before.get("shared", 0)
+        print(f"popular  burst {args.burst}: {elapsed * 1000:8.1f} ms  statuses {sorted(statuses)}  "
+              f"computed {leaders}, shared {shared}, distinct bodies {distinct}")
+        ok &= statuses == {200} and distinct == 1
+
+        before = flight_counts("similar")
+        elapsed, statuses, distinct = await burst(
+            client, args.burst, "GET", "/recommend/similar?item_name=Samosa&limit=5")
+        after = flight_counts("similar")
+        leaders = after.get("leader", 0) - before.get("leader", 0)
+        shared = after.get("shared", 0) - before.get("shared", 0)
+        print(f"similar  burst {args.burst}: {elapsed * 1000:8.1f} ms  statuses {sorted(statuses)}  "
+              f"computed {leaders}, shared {shared}, distinct bodies {distinct}")
+        ok &= statuses == {200} and distinct == 1
+
+        body = {"history": [], "new_message": "What is spicy and under 50?"}
+        elapsed, statuses, distinct = await burst(client, args.burst, "POST", "/chat/chat", json=body)
+        print(f"chat     burst {args.burst}: {elapsed * 1000:8.1f} ms  statuses {sorted(statuses)}  "
+              f"LLM calls {llm.calls}")
+        ok &= statuses == {200} and llm.calls == 1
+
+    calls, errors = check_thread_errors(args.burst)
+    print(f"thread error propagation: {calls} call(s), {errors}/{args.burst} waiters got the error")
+    ok &= calls == 1 and errors == args.burst
+
+    calls, errors = await check_async_errors(args.burst)
+    print(f"async error propagation:  {calls} call(s), {errors}/{args.burst} waiters got the error")
+    ok &= calls == 1 and errors == args.burst
+
+    print("PASS" if ok else "FAIL")
+    return ok
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--burst", type=int, default=50)
+    parser.add_argument("--rows", type=int, default=50_000)
+    parser.add_argument("--items", type=int, default=200)
+    parser.add_argument("--users", type=int, default=1_000)
+    parser.add_argument("--llm-latency", type=float, default=0.2)
+    args = parser.parse_args()
+    sys.exit(0 if asyncio.run(run(args)) else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,307 @@
+"""
+End-to-end benchmark suite: recommenders, every recommend_api route and chat.
+
+    python -m benchmarks.bench_suite --sizes small medium --out bench.json
+    python -m benchmarks.bench_suite --sizes small --compare bench.json
+
+For each dataset size a synthetic dataset, menu and purchase log are generated
+into a scratch directory and the app is pointed at them. Then it times:
+
+- ContentBasedRecommender: load, build_similarity_matrix, recommend_items,
+  get_popular_items
+- PersonalizedRecommender: train_model (fetch + pivot + cosine, reading an
+  in-memory stand-in for the Mongo collection) and recommend_for_user
+- every recommend_api route plus /recommend/similar through an in-process
+  ASGI client. GET routes run "cold" (response cache cleared each call) and
+  "warm".
+- POST /chat/chat with a fake LLM client, so prompt building and the
+  handler are measured without network calls
+
+Results are written as JSON (with the git commit) so two runs can be compared;
+`--compare` prints the median ratio per benchmark and flags slowdowns.
+"""
+
+import argparse
+import asyncio
+import contextlib
+import io
+import json
+import os
+import platform
+import statistics
+import subprocess
+import tempfile
+import time
+
+import httpx
+
+from benchmarks.synthetic import (
+    InMemoryMongo,
+    make_dataset,
+    make_items,
+    make_menu,
+    make_purchase_docs,
+)
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+SIZES = {
+    "small": {"rows": 2_000, "items": 24, "users": 100},
+    "medium": {"rows": 50_000, "items": 200, "users": 1_000},
+    "large": {"rows": 500_000, "items": 1_000, "users": 5_000},
+}
+
+GET_ROUTES = [
+    "/recommend/menu",
+    "/recommend/menu?limit=20&offset=20&fields=item_name,price",
+    "/recommend/popular?limit=10",
+    "/recommend/popular?hour=12&limit=10",
+    "/recommend/highest-rated?limit=10",
+    "/recommend/category/Snacks?limit=10",
+    "/recommend/spicy?limit=10",
+    "/recommend/now?limit=10",
+    "/recommend/search/dish 1",
+    "/recommend/item/Samosa",
+    "/recommend/similar?item_name=Samosa&limit=5",
+]
+
+REGRESSION_RATIO = 1.2
+
+
+@contextlib.contextmanager
+def quiet():
+    """The models print progress; keep it out of the benchmark output."""
+    with contextlib.redirect_stdout(io.StringIO()):
+        yield
+
+
+def summarize(samples):
+    ordered = sorted(samples)
+    return {
+        "runs": len(samples),
+        "median_ms": round(statistics.median(samples) * 1000, 4),
+        "p95_ms": round(ordered[max(int(len(ordered) * 0.95) - 1, 0)] * 1000, 4),
+        "min_ms": round(ordered[0] * 1000, 4),
+    }
+
+
+def measure(fn, repeat, setup=None):
+    samples = []
+    for _ in range(repeat):
+        if setup is not None:
+            setup()
+        t0 = time.perf_counter()
+        with quiet():
+            fn()
+        samples.append(time.perf_counter() - t0)
+    return summarize(samples)
+
+
+async def measure_async(fn, repeat, setup=None):
+    samples = []
+    for _ in range(repeat):
+        if setup is not None:
+            setup()
+        t0 = time.perf_counter()
+        with quiet():
+            await fn()
+        samples.append(time.perf_counter() - t0)
+    return summarize(samples)
+
+
+def prepare_data(workdir, rows, items, users):
+    """Write the synthetic dataset and menu; return paths and purchase docs."""
+    item_frame = make_items(items)
+    df = make_dataset(rows, n_users=users, items=item_frame)
+    data_csv = os.path.join(workdir, "canteen_recommendation_dataset.csv")
+    menu_csv = os.path.join(workdir, "menu.csv")
+    df.to_csv(data_csv, index=False)
+    make_menu(item_frame).to_csv(menu_csv, index=False)
+    return data_csv, menu_csv, make_purchase_docs(df)
+
+
+def configure_app(workdir, data_csv, menu_csv):
+    """Point the API modules at the scratch files and drop their lazy state."""
+    from ML.API import api_general, recommend_api, responses
+    from ML.Data import columnar_cache
+
+    columnar_cache.CACHE_DIR = os.path.join(workdir, "cache")
+
+    recommend_api.DATA_PATH = data_csv
+    recommend_api.MENU_PATH = menu_csv
+    recommend_api.LIVE_SNAPSHOT_PATH = os.path.join(workdir, "live_popularity.npz")
+    recommend_api._contextual_model = None
+    recommend_api._live_counters = None
+    recommend_api._menu_index = None
+    recommend_api._highest_rated_ranking.cache_clear()
+    recommend_api._spicy_ranking.cache_clear()
+
+    api_general.DATA_PATH = data_csv
+    api_general.MODEL_PATH = os.path.join(workdir, "item_similarity.npy")
+    api_general._recommender = None
+
+    responses.response_cache.clear()
+
+
+def bench_content(data_csv, results, repeat):
+    from ML.Model.general_recommendation import ContentBasedRecommender
+
+    holder = {}
+
+    def load():
+        holder["rec"] = ContentBasedRecommender(data_csv)
+
+    results.append({"group": "content", "name": "load", **measure(load, 1)})
+    rec = holder["rec"]
+    results.append({"group": "content", "name": "build_similarity_matrix",
+                    **measure(rec.build_similarity_matrix, max(repeat // 10, 3))})
+
+    names = rec.item_table()["item_name"].tolist()
+    picks = iter(names * (repeat // len(names) + 1))
+    results.append({"group": "content", "name": "recommend_items",
+                    **measure(lambda: rec.recommend_items(next(picks), n=5), repeat)})
+    results.append({"group": "content", "name": "get_popular_items",
+                    **measure(lambda: rec.get_popular_items(10), max(repeat // 10, 3))})
+
+
+def bench_personalized(docs, results, repeat):
+    from ML.Model.personalized_recommendation import PersonalizedRecommender
+
+    rec = PersonalizedRecommender(InMemoryMongo(docs))
+
+    def reset():
+        rec.user_item_matrix = None
+
+    results.append({"group": "personalized", "name": "train_model",
+                    **measure(lambda: asyncio.run(rec.train_model()), 3, setup=reset)})
+
+    users = iter(list(rec.user_item_matrix.index) * (repeat // len(rec.user_item_matrix) + 1))
+    results.append({"group": "personalized", "name": "recommend_for_user",
+                    **measure(lambda: rec.recommend_for_user(next(users), n=5), repeat)})
+
+
+class FakeLLM:
+    """Stands in for the Gemini client: fixed reply after an optional delay."""
+
+    def __init__(self, latency=0.0):
+        self.latency = latency
+        self.models = self
+
+    def generate_content(self, model, contents):
+        if self.latency:
+            time.sleep(self.latency)
+        return type("Reply", (), {"text": f"Sure! ({len(contents)} turns)"})()
+
+
+async def bench_routes(results, repeat, llm_latency):
+    from ML import chat_api_service
+    from ML.API.responses import response_cache
+    from main import app
+
+    chat_api_service.get_client = lambda: FakeLLM(llm_latency)
+
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        async def get(path):
+            response = await client.get(path)
+            response.raise_for_status()
+
+        for path in GET_ROUTES:
+            await get(path)    # build lazy models outside the timings
+            results.append({"group": "api", "name": f"GET {path} cold",
+                            **await measure_async(lambda: get(path), repeat,
+                                                  setup=response_cache.clear)})
+            results.append({"group": "api", "name": f"GET {path} warm",
+                            **await measure_async(lambda: get(path), repeat)})
+
+        async def order():
+            response = await client.post("/recommend/orders", json={"item_name": "Samosa"})
+            response.raise_for_status()
+
+        results.append({"group": "api", "name": "POST /recommend/orders",
+                        **await measure_async(order, repeat)})
+
+        async def chat():
+            response = await client.post("/chat/chat", json={
+                "history": [], "new_message": "What is spicy and under 50?"})
+            response.raise_for_status()
+
+        results.append({"group": "api", "name": "POST /chat/chat (fake LLM)",
+                        **await measure_async(chat, max(repeat // 5, 5))})
+
+
+def git_commit():
+    try:
+        out = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT,
+                             capture_output=True, text=True, check=True)
+        return out.stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(current, baseline_path):
+    with open(baseline_path) as f:
+        baseline = {(r["size"], r["group"], r["name"]): r for r in json.load(f)["results"]}
+
+    print(f"\ncompared with {baseline_path}:")
+    for r in current:
+        old = baseline.get((r["size"], r["group"], r["name"]))
+        if old is None or not old["median_ms"]:
+            continue
+        ratio = r["median_ms"] / old["median_ms"]
+        flag = "  <-- slower" if ratio > REGRESSION_RATIO else ""
+        print(f"  [{r['size']}] {r['group']:<12} {r['name']:<70} x{ratio:5.2f}{flag}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--sizes", nargs="+", default=["small", "medium"], choices=list(SIZES))
+    parser.add_argument("--repeat", type=int, default=100)
+    parser.add_argument("--llm-latency", type=float, default=0.0,
+                        help="seconds the fake LLM sleeps per call")
+    parser.add_argument("--skip", nargs="*", default=[],
+                        choices=["content", "personalized", "api"])
+    parser.add_argument("--out", default=None, help="write JSON results here")
+    parser.add_argument("--compare", default=None, help="baseline JSON to compare against")
+    args = parser.parse_args()
+
+    os.chdir(ROOT)
+    os.environ.setdefault("CANTEEN_LAZY_STARTUP", "1")
+
+    all_results = []
+    for size in args.sizes:
+        spec = SIZES[size]
+        workdir = tempfile.mkdtemp(prefix=f"canteen-suite-{size}-")
+        data_csv, menu_csv, docs = prepare_data(workdir, spec["rows"], spec["items"], spec["users"])
+        configure_app(workdir, data_csv, menu_csv)
+
+        results = []
+        if "content" not in args.skip:
+            bench_content(data_csv, results, args.repeat)
+        if "personalized" not in args.skip:
+            bench_personalized(docs, results, args.repeat)
+        if "api" not in args.skip:
+            asyncio.run(bench_routes(results, args.repeat, args.llm_latency))
+
+        for r in results:
+            r["size"] = size
+            print(f"[{size}] {r['group']:<12} {r['name']:<70} "
+                  f"median {r['median_ms']:>10.3f} ms  p95 {r['p95_ms']:>10.3f} ms")
+        all_results.extend(results)
+
+    report = {
+        "commit": git_commit(),
+        "python": platform.python_version(),
+        "sizes": {s: SIZES[s] for s in args.sizes},
+        "results": all_results,
+    }
+    if args.out:
+        with open(args.out, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"results written to {args.out}")
+    if args.compare:
+        compare(all_results, args.compare)
+
+
+if __name__ == "__main__":
+    main()
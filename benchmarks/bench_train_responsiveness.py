@@ -0,0 +1,126 @@
+"""
+API responsiveness while the personalized model trains.
+
+    python -m benchmarks.bench_train_responsiveness --rows 200000 --users 3000
+
+Pings GET /personal/ through an in-process ASGI client every --interval
+seconds and reports the ping latency in three phases:
+
+- idle: nothing else running
+- inline: `PersonalizedRecommender.train_model()` awaited on the event loop,
+  which is how /personal/train used to work
+- background: POST /personal/train, which runs the job in a separate process.
+  Polling continues until the job is done, and then a /personal/recommend
+  call checks that the new model was swapped in, and a second job runner on
+  the same jobs directory (another worker) checks it can see the job.
+
+Purchases come from an in-memory stand-in for the Mongo collection. Exits
+non-zero if the background phase is not clearly more responsive than inline,
+or if the trained model is not served afterwards.
+"""
+
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+import httpx
+
+from benchmarks.synthetic import InMemoryMongo, make_dataset, make_purchase_docs
+
+
+async def ping_while(client, done, interval):
+    """
+    Latency is measured from when each ping was due, so a stalled event loop
+    shows up even if the stall happens between pings.
+    """
+    latencies = []
+    due = time.perf_counter()
+    while not done():
+        await asyncio.sleep(max(due - time.perf_counter(), 0))
+        response = await client.get("/personal/")
+        response.raise_for_status()
+        latencies.append(time.perf_counter() - due)
+        due = time.perf_counter() + interval
+    return latencies
+
+
+def describe(name, latencies):
+    ms = sorted(l * 1000 for l in latencies)
+    print(f"{name:<11} pings {len(ms):>4}  median {statistics.median(ms):8.2f} ms  "
+          f"max {ms[-1]:9.2f} ms")
+    return ms[-1]
+
+
+async def run(args):
+    os.environ.setdefault("CANTEEN_LAZY_STARTUP", "1")
+    from ML.API import personal
+    from ML.Data import mongo_store
+    from ML.Model.personalized_recommendation import PersonalizedRecommender
+    from ML.Model.training_jobs import TrainingJobRunner
+    from main import app
+
+    df = make_dataset(args.rows, n_users=args.users, n_items=args.items)
+    mongo_store.set_client(InMemoryMongo(make_purchase_docs(df)))
+    workdir = tempfile.mkdtemp(prefix="canteen-train-")
+    personal.MODEL_PATH = os.path.join(workdir, "personalized_model.pkl")
+    personal._training_jobs.jobs_dir = os.path.join(workdir, "jobs")
+
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        deadline = time.perf_counter() + 1.0
+        idle = describe("idle", await ping_while(client, lambda: time.perf_counter() > deadline,
+                                                  args.interval))
+
+        async def train_inline():
+            await asyncio.sleep(0.2)
+            await PersonalizedRecommender().train_model()
+
+        inline = asyncio.create_task(train_inline())
+        inline_max = describe("inline", await ping_while(client, inline.done, args.interval))
+        await inline
+
+        response = await client.post("/personal/train")
+        response.raise_for_status()
+        job_id = response.json()["job_id"]
+        status = {"status": "queued"}
+
+        async def poll():
+            while status["status"] in ("queued", "fetching", "training", "saving"):
+                status.update((await client.get(f"/personal/train/{job_id}")).json())
+                await asyncio.sleep(0.2)
+
+        poller = asyncio.create_task(poll())
+        background_max = describe("background", await ping_while(client, poller.done, args.interval))
+        await poller
+        print(f"job {job_id}: {status['status']} in {status['elapsed_s']}s ({status['message']})")
+
+        user = str(df["user_id"].iloc[0])
+        rec = await client.post("/personal/recommend", json={"user_id": user, "top_n": 3})
+        print(f"/personal/recommend after swap: {rec.status_code} {rec.json()}")
+        other = TrainingJobRunner(jobs_dir=personal._training_jobs.jobs_dir).get(job_id)
+        print(f"job as seen by another worker: {other and other.status}")
+
+    ok = (status["status"] == "done" and rec.status_code == 200
+          and other is not None and other.status == "done"
+          and background_max < inline_max / 2)
+    print("PASS" if ok else "FAIL", f"(idle max {idle:.1f} ms, inline max {inline_max:.1f} ms, "
+          f"background max {background_max:.1f} ms)")
+    return ok
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--rows", type=int, default=200_000)
+    parser.add_argument("--users", type=int, default=3_000)
+    parser.add_argument("--items", type=int, default=200)
+    parser.add_argument("--interval", type=float, default=0.02)
+    args = parser.parse_args()
+    sys.exit(0 if asyncio.run(run(args)) else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,164 @@
+"""
+Throughput and memory of the gunicorn deployment across worker counts.
+
+    python -m benchmarks.bench_workers --workers 1 2 4 8 --seconds 10
+
+For each worker count, starts `gunicorn -c gunicorn.conf.py main:app`, waits
+for /health, drives the read endpoints with concurrent async clients and
+reports requests/sec plus per-worker RSS and PSS (proportional set size, which
+splits shared pages between the processes mapping them). PSS well below RSS
+means the workers are sharing the memory-mapped data and model.
+
+It also posts orders for a throwaway category and reads them back through
+every worker, failing unless each worker counts every order whichever worker
+received it (the order journal and live snapshot go to a temp directory).
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import signal
+import subprocess
+import sys
+import tempfile
+import time
+
+import httpx
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+PATHS = [
+    "/recommend/popular?limit=10",
+    "/recommend/category/Snacks",
+    "/recommend/similar?item_name=samosa&limit=5",
+    "/menu",
+]
+
+
+def memory_kb(pid):
+    """RSS and PSS of one process from /proc/<pid>/smaps_rollup."""
+    values = {}
+    with open(f"/proc/{pid}/smaps_rollup") as f:
+        for line in f:
+            key, _, rest = line.partition(":")
+            if key in ("Rss", "Pss"):
+                values[key] = int(rest.split()[0])
+    return values
+
+
+def worker_pids(master_pid):
+    out = subprocess.run(["ps", "-o", "pid=", "--ppid", str(master_pid)],
+                         capture_output=True, text=True)
+    return [int(pid) for pid in out.stdout.split()]
+
+
+async def wait_ready(client, workers, timeout=120):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            if (await client.get("/health")).status_code == 200:
+                return
+        except httpx.TransportError:
+            pass
+        await asyncio.sleep(0.5)
+    raise RuntimeError(f"gunicorn with {workers} workers did not become ready")
+
+
+async def drive(client, seconds, concurrency):
+    done = 0
+    errors = 0
+    deadline = time.monotonic() + seconds
+
+    async def loop(offset):
+        nonlocal done, errors
+        i = offset
+        while time.monotonic() < deadline:
+            response = await client.get(PATHS[i % len(PATHS)])
+            if response.status_code == 200:
+                done += 1
+            else:
+                errors += 1
+            i += 1
+
+    t0 = time.monotonic()
+    await asyncio.gather(*(loop(i) for i in range(concurrency)))
+    return done, errors, time.monotonic() - t0
+
+
+async def check_shared_orders(client, workers, orders=20):
+    """True when every read, on whichever worker, counts all posted orders."""
+    category = f"bench-shared-{workers}-{os.getpid()}"
+    order = {"item_name": f"Bench Item {workers}", "category": category}
+    await asyncio.gather(*(client.post("/recommend/orders", json=order)
+                           for _ in range(orders)))
+
+    reads = await asyncio.gather(*(client.get(f"/recommend/category/{category}")
+                                   for _ in range(8 * workers)))
+    counts = {r.json()[0]["purchase_count"] if r.status_code == 200 and r.json() else 0
+              for r in reads}
+    return counts == {orders}
+
+
+async def run_one(workers, port, seconds, concurrency, state_dir):
+    env = dict(os.environ, WEB_CONCURRENCY=str(workers), PORT=str(port),
+               CANTEEN_ORDER_LOG=os.path.join(state_dir, f"orders-{workers}.jsonl"),
+               CANTEEN_LIVE_SNAPSHOT=os.path.join(state_dir, f"live-{workers}.npz"))
+    server = subprocess.Popen(
+        [sys.executable, "-m", "gunicorn", "-c", "gunicorn.conf.py", "main:app"],
+        cwd=ROOT, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    limits = httpx.Limits(max_connections=concurrency)
+    try:
+        async with httpx.AsyncClient(base_url=f"http://127.0.0.1:{port}",
+                                     limits=limits, timeout=30) as client:
+            await wait_ready(client, workers)
+            await drive(client, 1, concurrency)  # warm every worker
+            done, errors, elapsed = await drive(client, seconds, concurrency)
+            shared = await check_shared_orders(client, workers)
+
+        pids = worker_pids(server.pid)
+        mem = [memory_kb(pid) for pid in pids]
+        return {
+            "workers": workers,
+            "requests": done,
+            "errors": errors,
+            "req_per_s": round(done / elapsed, 1),
+            "worker_rss_mb": [round(m["Rss"] / 1024, 1) for m in mem],
+            "worker_pss_mb": [round(m["Pss"] / 1024, 1) for m in mem],
+            "total_pss_mb": round(sum(m["Pss"] for m in mem) / 1024, 1),
+            "orders_shared": shared,
+        }
+    finally:
+        server.send_signal(signal.SIGTERM)
+        server.wait(timeout=60)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4, 8])
+    parser.add_argument("--seconds", type=float, default=10)
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--port", type=int, default=18000)
+    args = parser.parse_args()
+
+    results = []
+    with tempfile.TemporaryDirectory() as state_dir:
+        for workers in args.workers:
+            result = asyncio.run(run_one(workers, args.port, args.seconds,
+                                         args.concurrency, state_dir))
+            results.append(result)
+            print(f"{workers:>2} workers: {result['req_per_s']:>8} req/s  "
+                  f"RSS/worker {max(result['worker_rss_mb']):>6} MB  "
+                  f"PSS/worker {max(result['worker_pss_mb']):>6} MB  "
+                  f"total PSS {result['total_pss_mb']} MB  "
+                  f"orders shared: {'PASS' if result['orders_shared'] else 'FAIL'}")
+
+    print(f"(cpu count: {os.cpu_count()})")
+    print(json.dumps(results))
+    if not all(result["orders_shared"] for result in results):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,236 @@
+"""
+Load generator: replay a JSONL traffic log or synthesize a lunch-rush mix.
+
+    python -m benchmarks.loadgen --base-url http://127.0.0.1:10000 --rate 50 --duration 60
+    python -m benchmarks.loadgen --replay traffic.jsonl --speed 2
+    python -m benchmarks.loadgen --rate 20 --duration 30 --record traffic.jsonl
+
+Traffic log format, one request per line:
+
+    {"method": "GET", "path": "/recommend/menu", "route": "menu", "at": 0.25}
+    {"method": "POST", "path": "/chat/chat", "body": {...}, "route": "chat"}
+
+`at` (seconds from the start) is optional. With it, the original timing is
+replayed, divided by --speed. Without it, requests are sent as Poisson arrivals
+at --rate. `route` is optional too and defaults to the first two path segments.
+
+Arrivals are open-loop: latency is measured from the scheduled send time, so a
+saturated server shows up as latency instead of a quietly lower send rate.
+--concurrency caps the requests in flight. Reports p50/p95/p99 latency,
+throughput and error rate per route, and as JSON with --out.
+"""
+
+import argparse
+import asyncio
+import json
+import random
+import time
+from collections import defaultdict
+
+import httpx
+
+# Request mix during the lunch rush (weights, not percentages).
+LUNCH_MIX = {
+    "menu": 30,
+    "popular": 22,
+    "search": 15,
+    "similar": 15,
+    "now": 8,
+    "chat": 5,
+    "orders": 5,
+}
+
+CHAT_MESSAGES = [
+    "What's good for lunch under 60 rupees?",
+    "Anything spicy today?",
+    "Which pizza is the most popular?",
+    "Suggest a drink with a samosa",
+    "hi",
+]
+
+DEFAULT_ITEMS = ["Samosa", "Maggi", "Cold Coffee", "Veg Burger", "Masala Dosa", "Lassi"]
+
+
+def percentile(ordered, q):
+    if not ordered:
+        return None
+    rank = max(int(round(q / 100 * len(ordered) + 0.5)) - 1, 0)
+    return ordered[min(rank, len(ordered) - 1)]
+
+
+def route_of(path):
+    parts = [p for p in path.split("?")[0].split("/") if p]
+    return "/".join(parts[:2]) or "/"
+
+
+def load_traffic(path):
+    entries = []
+    with open(path) as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            entry = json.loads(line)
+            entry.setdefault("method", "GET")
+            entry.setdefault("route", route_of(entry["path"]))
+            entries.append(entry)
+    return entries
+
+
+def synthesize(items, rng, n, exclude=()):
+    """`n` lunch-rush requests (no timing) drawn from LUNCH_MIX."""
+    routes = [r for r in LUNCH_MIX if r not in exclude]
+    weights = [LUNCH_MIX[r] for r in routes]
+    entries = []
+    for route in rng.choices(routes, weights, k=n):
+        item = rng.choice(items)
+        if route == "menu":
+            entry = {"method": "GET", "path": "/recommend/menu"}
+        elif route == "popular":
+            entry = {"method": "GET", "path": f"/recommend/popular?limit={rng.choice([5, 10, 20])}"}
+        elif route == "search":
+            entry = {"method": "GET", "path": f"/recommend/search/{item[:rng.randint(2, 5)].lower()}"}
+        elif route == "similar":
+            entry = {"method": "GET", "path": f"/recommend/similar?item_name={item}&limit=5"}
+        elif route == "now":
+            entry = {"method": "GET", "path": "/recommend/now?limit=10"}
+        elif route == "chat":
+            entry = {"method": "POST", "path": "/chat/chat",
+                     "body": {"history": [], "new_message": rng.choice(CHAT_MESSAGES)}}
+        else:
+            entry = {"method": "POST", "path": "/recommend/orders",
+                     "body": {"item_name": item, "quantity": rng.randint(1, 3)}}
+        entry["route"] = route
+        entries.append(entry)
+    return entries
+
+
+def schedule(entries, rate, speed, rng):
+    """Attach a send offset to each entry (recorded `at`, else Poisson at `rate`)."""
+    if entries and all("at" in e for e in entries):
+        return [(e["at"] / speed, e) for e in entries]
+    t = 0.0
+    timed = []
+    for entry in entries:
+        t += rng.expovariate(rate)
+        timed.append((t, entry))
+    return timed
+
+
+async def fetch_items(client):
+    try:
+        response = await client.get("/recommend/menu", params={"fields": "item_name", "limit": 500})
+        response.raise_for_status()
+        return [row["item_name"] for row in response.json()] or DEFAULT_ITEMS
+    except (httpx.HTTPError, ValueError, KeyError):
+        return DEFAULT_ITEMS
+
+
+async def run(timed, client, concurrency, timeout):
+    stats = defaultdict(lambda: {"latencies": [], "errors": 0, "status": defaultdict(int)})
+    gate = asyncio.Semaphore(concurrency)
+    start = time.perf_counter()
+
+    async def one(offset, entry):
+        scheduled = start + offset
+        async with gate:
+            route = stats[entry["route"]]
+            try:
+                response = await client.request(entry["method"], entry["path"],
+                                                json=entry.get("body"), timeout=timeout)
+                route["status"][response.status_code] += 1
+                if response.status_code >= 400:
+                    route["errors"] += 1
+            except httpx.HTTPError as e:
+                route["status"][type(e).__name__] += 1
+                route["errors"] += 1
+            route["latencies"].append(time.perf_counter() - scheduled)
+
+    tasks = []
+    for offset, entry in timed:
+        delay = start + offset - time.perf_counter()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        tasks.append(asyncio.create_task(one(offset, entry)))
+    await asyncio.gather(*tasks)
+    return stats, time.perf_counter() - start
+
+
+def report(stats, elapsed):
+    rows = {}
+    for route, s in sorted(stats.items()):
+        ordered = sorted(s["latencies"])
+        count = len(ordered)
+        rows[route] = {
+            "requests": count,
+            "throughput_rps": round(count / elapsed, 2),
+            "error_rate": round(s["errors"] / count, 4) if count else 0.0,
+            "p50_ms": round(percentile(ordered, 50) * 1000, 2) if count else None,
+            "p95_ms": round(percentile(ordered, 95) * 1000, 2) if count else None,
+            "p99_ms": round(percentile(ordered, 99) * 1000, 2) if count else None,
+            "status": {str(k): v for k, v in s["status"].items()},
+        }
+    everything = sorted(l for s in stats.values() for l in s["latencies"])
+    errors = sum(s["errors"] for s in stats.values())
+    rows["ALL"] = {
+        "requests": len(everything),
+        "throughput_rps": round(len(everything) / elapsed, 2),
+        "error_rate": round(errors / len(everything), 4) if everything else 0.0,
+        "p50_ms": round(percentile(everything, 50) * 1000, 2) if everything else None,
+        "p95_ms": round(percentile(everything, 95) * 1000, 2) if everything else None,
+        "p99_ms": round(percentile(everything, 99) * 1000, 2) if everything else None,
+    }
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--base-url", default="http://127.0.0.1:10000")
+    parser.add_argument("--replay", default=None, help="JSONL traffic log to replay")
+    parser.add_argument("--rate", type=float, default=20.0, help="requests/sec when not timed")
+    parser.add_argument("--duration", type=float, default=30.0, help="seconds of synthetic traffic")
+    parser.add_argument("--speed", type=float, default=1.0, help="replay speed-up for timed logs")
+    parser.add_argument("--concurrency", type=int, default=64)
+    parser.add_argument("--timeout", type=float, default=30.0)
+    parser.add_argument("--exclude", nargs="*", default=[], choices=list(LUNCH_MIX),
+                        help="routes to leave out of the synthetic mix (e.g. chat)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--record", default=None, help="write the generated traffic as JSONL")
+    parser.add_argument("--out", default=None, help="write the report as JSON")
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+
+    async def go():
+        limits = httpx.Limits(max_connections=args.concurrency)
+        async with httpx.AsyncClient(base_url=args.base_url, limits=limits) as client:
+            if args.replay:
+                entries = load_traffic(args.replay)
+            else:
+                items = await fetch_items(client)
+                entries = synthesize(items, rng, int(args.rate * args.duration), args.exclude)
+            timed = schedule(entries, args.rate, args.speed, rng)
+
+            if args.record:
+                with open(args.record, "w") as f:
+                    for offset, entry in timed:
+                        f.write(json.dumps({**entry, "at": round(offset * args.speed, 4)}) + "\n")
+
+            print(f"sending {len(timed)} requests to {args.base_url} "
+                  f"over ~{timed[-1][0] if timed else 0:.1f}s")
+            return await run(timed, client, args.concurrency, args.timeout)
+
+    stats, elapsed = asyncio.run(go())
+    rows = report(stats, elapsed)
+
+    print(f"{'route':<22}{'reqs':>7}{'rps':>9}{'err%':>7}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}")
+    for route, r in rows.items():
+        print(f"{route:<22}{r['requests']:>7}{r['throughput_rps']:>9}{r['error_rate'] * 100:>7.1f}"
+              f"{r['p50_ms'] or 0:>10}{r['p95_ms'] or 0:>10}{r['p99_ms'] or 0:>10}")
+    if args.out:
+        with open(args.out, "w") as f:
+            json.dump({"elapsed_s": round(elapsed, 3), "routes": rows}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,175 @@
+"""
+Benchmark data from the one synthetic generator, ML/Data/generate_mock_data.py.
+
+Frames are shaped like ML/Data/raw/canteen_recommendation_dataset.csv: the
+generator's catalogue and Zipf-skewed orders, laid out with
+`recommendation_rows()`. Orders fall between START and START + SPAN_DAYS.
+"""
+
+import asyncio
+
+import numpy as np
+import pandas as pd
+
+from ML.Data import generate_mock_data as generator
+
+START = pd.Timestamp("2024-01-01")
+SPAN_DAYS = 600
+ZIPF = 1.2
+
+
+def make_items(n_items, seed=0):
+    """Catalogue (classic items first, then "Dish N") with content features."""
+    rng = np.random.default_rng(seed)
+    return generator.item_features(generator.build_catalogue(n_items, rng), rng)
+
+
+def make_dataset(n_rows, n_items=24, n_users=200, seed=0, zipf_a=ZIPF, items=None,
+                 every_item=False):
+    """
+    Vectorized transaction log with Zipf-skewed item popularity. With
+    `every_item`, the first orders cover the catalogue once each, so models
+    built from purchases see all of it rather than only the items drawn.
+    """
+    rng = np.random.default_rng(seed)
+    items = items if items is not None else make_items(n_items, seed)
+    weights = generator.zipf_weights(len(items), zipf_a, rng)
+    orders = generator.generate_chunk(rng, items, weights, n_users, START,
+                                      SPAN_DAYS * 1440, 1, n_rows)
+    if every_item:
+        k = min(len(items), n_rows)
+        for col in ("item_id", "item_name", "category"):
+            orders.loc[:k - 1, col] = items[col].to_numpy()[:k]
+        orders.loc[:k - 1, "total_price"] = items["price"].to_numpy()[:k] * orders["quantity"].to_numpy()[:k]
+    return generator.recommendation_rows(orders, items, rng)
+
+
+def write_dataset_csv(path, n_rows, chunk_rows=1_000_000, **kwargs):
+    """Write `n_rows` synthetic rows to `path` in chunks to bound memory."""
+    seed = kwargs.pop("seed", 0)
+    kwargs.setdefault("items", make_items(kwargs.pop("n_items", 24), seed))
+    written = 0
+    while written < n_rows:
+        rows = min(chunk_rows, n_rows - written)
+        chunk = make_dataset(rows, seed=seed + written, **kwargs)
+        chunk.to_csv(path, mode="w" if written == 0 else "a", header=written == 0, index=False)
+        written += rows
+    return path
+
+
+def make_menu(items, seed=0):
+    """menu.csv-shaped frame for the given items."""
+    rng = np.random.default_rng(seed)
+    return pd.DataFrame({
+        "item_name": items["item_name"],
+        "category": items["category"],
+        "price": items["price"],
+        "rating": np.round(rng.uniform(3.0, 5.0, len(items)), 1),
+    })
+
+
+def make_purchase_docs(df):
+    """Mongo `purchases` documents (one order per row, oldest first) from a synthetic frame."""
+    return [
+        {"_id": i, "userId": user, "items": [{"itemId": str(item), "totalAmount": int(price)}]}
+        for i, (user, item, price) in enumerate(zip(df["user_id"], df["item_id"], df["price"]))
+    ]
+
+
+def _field(doc, path):
+    """Value of a "$a.b" field path, mapping over arrays like Mongo does."""
+    value = doc
+    for part in path.lstrip("$").split("."):
+        if isinstance(value, list):
+            value = [v.get(part) for v in value]
+        else:
+            value = value.get(part)
+    return value
+
+
+def _match(docs, query):
+    for field, cond in (query or {}).items():
+        if isinstance(cond, dict) and "$in" in cond:
+            wanted = set(cond["$in"])
+            docs = [d for d in docs if d.get(field) in wanted]
+        else:
+            docs = [d for d in docs if d.get(field) == cond]
+    return docs
+
+
+def run_pipeline(docs, pipeline):
+    """The aggregation stages mongo_store uses: $match, $sort, $group/$push, $project/$slice."""
+    for stage in pipeline:
+        (op, spec), = stage.items()
+        if op == "$match":
+            docs = _match(docs, spec)
+        elif op == "$sort":
+            for key, direction in reversed(list(spec.items())):
+                docs = sorted(docs, key=lambda d: d.get(key), reverse=direction < 0)
+        elif op == "$group":
+            groups = {}
+            for doc in docs:
+                key = _field(doc, spec["_id"])
+                group = groups.setdefault(key, {"_id": key})
+                for name, acc in spec.items():
+                    if name != "_id":
+                        group.setdefault(name, []).append(_field(doc, acc["$push"]))
+            docs = list(groups.values())
+        elif op == "$project":
+            docs = [{"_id": d["_id"], **{name: d[name][:expr["$slice"][1]]
+                                         for name, expr in spec.items()}} for d in docs]
+        else:
+            raise NotImplementedError(op)
+    return docs
+
+
+class InMemoryMongo:
+    """
+    Just enough of the Motor client surface for PersonalizedRecommender and
+    ML.Data.mongo_store: `client[db][collection].find(filter).sort(key, dir)`
+    and `.aggregate(pipeline)` (see run_pipeline), yielding documents
+    asynchronously. Filters support equality and `$in` on top-level fields;
+    projections are ignored. `queries` counts find() and aggregate() calls.
+    """
+
+    def __init__(self, docs):
+        self.docs = docs
+        self.queries = 0
+
+    def __getitem__(self, name):
+        return self
+
+    def find(self, query=None, projection=None):
+        self.queries += 1
+        return _AsyncCursor(_match(self.docs, query))
+
+    def aggregate(self, pipeline):
+        self.queries += 1
+        return _AsyncCursor(run_pipeline(self.docs, pipeline))
+
+
+class _AsyncCursor:
+    # Motor hands documents over in batches, yielding to the loop in between.
+    batch_size = 1000
+
+    def __init__(self, docs):
+        self._list = docs
+        self._docs = iter(docs)
+        self._served = 0
+
+    def sort(self, key, direction=1):
+        self._list = sorted(self._list, key=lambda d: d.get(key), reverse=direction < 0)
+        self._docs = iter(self._list)
+        return self
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        self._served += 1
+        if self._served % self.batch_size == 0:
+            await asyncio.sleep(0)
+        try:
+            return next(self._docs)
+        except StopIteration:
+            raise StopAsyncIteration
@@ -0,0 +1,25 @@
+"""
+Multi-worker deployment: `gunicorn -c gunicorn.conf.py main:app`.
+
+The master builds the data cache, popularity artifact and similarity matrix
+once (under file locks) before forking, so workers load finished files (the
+similarity .npy is memory-mapped and shared) instead of building their own.
+
+Orders posted to any worker go through the shared order journal
+(ML.Model.order_log), which every worker folds into its live counters and
+contextual model before answering, so WEB_CONCURRENCY can be raised freely.
+"""
+
+import os
+
+bind = f"0.0.0.0:{os.getenv('PORT', '10000')}"
+workers = int(os.getenv("WEB_CONCURRENCY", "2"))
+worker_class = "uvicorn.workers.UvicornWorker"
+preload_app = True
+timeout = 120
+
+
+def on_starting(server):
+    from ML.API.app import prepare_artifacts
+
+    prepare_artifacts()